@@ -1,10 +1,9 @@
-import itertools
 import logging
 import os
-import random
 
-import ggsolver.graph as ggraph
-import ggsolver.dtptb.pgsolver as dtptb
+import mmgraph
+import simulate as sim
+import solution as sol
 
 logger = logging.getLogger(__name__)
 # CONFIG = {
@@ -29,31 +28,35 @@ P2_INIT = (0, 0)
 def load_p1_solution():
     # Load game graph
     logger.info("Loading P1 game graph...")
-    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p1.ggraph")
+    import ggsolver.graph as ggraph
+    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}.ggraph")
     game_graph = ggraph.Graph().load(fpath)
 
     # Load solution
     logger.info("Loading P1 solution...")
-    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p1.dot")
-    swin = dtptb.SWinReach(game_graph)
-    swin.load_solution_from_dot(fpath)
-
-    return swin
+    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p1.wsol")
+    return sol.load_solution(game_graph, fpath)
 
 
 def load_p2_solution():
     # Load game graph
     logger.info("Loading P2 game graph...")
-    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p2.ggraph")
+    import ggsolver.graph as ggraph
+    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}.ggraph")
     game_graph = ggraph.Graph().load(fpath)
 
     # Load solution
     logger.info("Loading P2 solution...")
-    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p2.dot")
-    swin = dtptb.SWinReach(game_graph)
-    swin.load_solution_from_dot(fpath)
+    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_p2.wsol")
+    return sol.load_solution(game_graph, fpath)
+
 
-    return swin
+def load_solution_view(name="p1"):
+    # Open the memory-mapped graph store. Nothing is decoded until it is queried.
+    logger.info(f"Opening graph store with {name} solution...")
+    fpath = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}.gstore")
+    sol_file = os.path.join(CONFIG["directory"], f"{CONFIG['filename']}_{name}.wsol")
+    return mmgraph.GraphView(fpath).attach_solution(sol_file)
 
 
 def print_init_winners(win1, winner):
@@ -68,31 +71,27 @@ def print_init_winners(win1, winner):
     print(f"{v0}: {win1.state_winner(v0)=}")
 
 
-def generate_play(win, v0, max_iter=float("inf")):
-    finals = [uid for uid in win.graph().nodes() if win.graph()["final"][uid]]
-    curr_node = win.state2node(v0)
-    path = [v0]
-    count = 0
-    print(v0)
-    while count < max_iter:
-        win_edges = win.winning_edges(curr_node)
-        win_actions = [win.graph()["input"][edge] for edge in win_edges]
-        edge = random.choice(win_edges)
-        edge = eval(input(f"Choose next: {list(zip(win_edges, win_actions))}"))
-        act = win.graph()["input"][edge]
-        path.append(act)
-        dst = win.graph()["state"][edge[1]]
-        curr_node = dst
-        path.append(curr_node)
-        curr_node = win.state2node(dst)
-        if curr_node in finals:
-            break
-        print(act, win_actions)
-        print(dst)
-        count += 1
+def generate_play(view, v0, max_iter=1000, p2_policy="random", seed=None):
+    # Simulate a single recorded play and interleave states with actions.
+    tables = sim.StrategyTables(view)
+    result = sim.simulate(tables, view.state2node(v0), num_plays=1, p2_policy=p2_policy,
+                          max_steps=max_iter, seed=seed, record=True)
+    nodes = [uid for uid in result.plays[0].tolist() if uid >= 0]
+    path = [view.state(nodes[0])]
+    for uid, vid in zip(nodes, nodes[1:]):
+        path.append(next(act for _, dst, act in view.out_edges(uid) if dst == vid))
+        path.append(view.state(vid))
     return path
 
 
+def play_statistics(view, num_plays=10000, p2_policy="adversarial", max_iter=1000, seed=None):
+    # Roll out many plays from the initial node and summarize outcomes and play lengths.
+    tables = sim.StrategyTables(view)
+    result = sim.simulate(tables, view.init_node(), num_plays=num_plays, p2_policy=p2_policy,
+                          max_steps=max_iter, seed=seed)
+    return result.summary()
+
+
 if __name__ == '__main__':
     # position_winners = dict()
     # for i, j in itertools.product(range(DIM[0]), range(DIM[1])):
@@ -131,15 +130,16 @@ if __name__ == '__main__':
     }
 
     # if i != 0 or j != 3:
-    swin_p1 = load_p1_solution()
-    init_state = swin_p1.graph()["init_state"]
-    # swin_p2 = load_p2_solution()
-    # init_state = swin_p2.graph()["init_state"]
+    view_p1 = load_solution_view("p1")
+    init_state = view_p1.state(view_p1.init_node())
+    # view_p2 = load_solution_view("p2")
+    # init_state = view_p2.state(view_p2.init_node())
     print("Start generating plays")
 
-    play = generate_play(swin_p1, init_state)
-    # play = generate_play(swin_p2, init_state, max_iter=50)
+    play = generate_play(view_p1, init_state)
+    # play = generate_play(view_p2, init_state, max_iter=50)
     for state in play:
         print(state)
 
     print(play)
+    print(play_statistics(view_p1))
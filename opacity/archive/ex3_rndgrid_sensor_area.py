@@ -16,7 +16,6 @@ import time
 
 from functools import partial
 
-from scipy.spatial.distance import cityblock
 import ggsolver.gridworld.util as util
 import ggsolver.dtptb.pgsolver as dtptb
 import ggsolver.logic as logic
@@ -25,6 +24,7 @@ import ggsolver.models as models
 import ggsolver.util
 
 import models as mod_opacity
+import sensors
 import logging
 
 # Size of gridworld
@@ -65,6 +65,7 @@ class RndGridworld(mod_opacity.Arena):
         self._actions = actions
         self._init_state = init_state
         self._sense_rng = sense_rng
+        self._sensor = sensors.RangeSensor(dim, sense_rng)
         self._goal_cells = goal_cells
         self._num_goals = len(self._goal_cells)
 
@@ -118,16 +119,9 @@ class RndGridworld(mod_opacity.Arena):
         p1r_prime, p1c_prime, p2r_prime, p2c_prime, turn_prime = next_state
 
         if turn == 1:
-            if cityblock([p2r, p2c], [p1r_prime, p1c_prime]) <= self._sense_rng:
-                return f"o1:{(p1r_prime, p1c_prime)}" + f"o2:{(p2r, p2c)}"
-            else:
-                return f"o1:{(p1r_prime,)}" + f"o2:{(p2r, p2c)}"
-
+            return self._sensor.observation((p2r, p2c), (p1r_prime, p1c_prime))
         else:
-            if cityblock([p2r_prime, p2c_prime], [p1r, p1c]) <= self._sense_rng:
-                return f"o1:{(p1r, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}"
-            else:
-                return f"o1:{(p1r,)}" + f"o2:{(p2r_prime, p2c_prime)}"
+            return self._sensor.observation((p2r_prime, p2c_prime), (p1r, p1c))
 
     @models.register_property(GRAPH_PROPERTY)
     def goal_cells(self):
@@ -12,7 +12,6 @@ Generate a random gridworld arena of size N_ROWS, N_COLS.
 import itertools
 import os
 import random
-from scipy.spatial.distance import cityblock
 
 import ggsolver.gridworld.util as util
 import ggsolver.dtptb as dtptb
@@ -21,6 +20,7 @@ import ggsolver.graph as graph
 import ggsolver.models as models
 
 import models as mod_opacity
+import sensors
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -48,6 +48,7 @@ class RndGridworld(mod_opacity.Arena):
         self._actions = actions
         self._init_state = init_state
         self._sense_rng = sense_rng
+        self._sensor = sensors.RangeSensor(dim, sense_rng, fmt=self._format_observation)
         self._goal_cells = goal_cells
         self._num_goals = len(self._goal_cells)
 
@@ -96,29 +97,20 @@ class RndGridworld(mod_opacity.Arena):
         objective = [f"Fg{idx}" for idx in range(self._num_goals)]
         return logic.ltl.ScLTL(" & ".join(objective), atoms=self.atoms())
 
+    def _format_observation(self, sensor_cell, cell, covered):
+        # Outside sensor range, P1 is observed to be in one of two cells.
+        if covered or cell[0] + 1 > self._dim[0]:
+            return f"o1:{cell}" + f"o2:{sensor_cell}"
+        return f"o1:{cell}" + f"o2:{sensor_cell}" + f"o1:{(cell[0] + 1, cell[1])}" + f"o2:{sensor_cell}"
+
     def attacker_observation(self, state, act, next_state):
         p1r, p1c, p2r, p2c, turn = state
         p1r_prime, p1c_prime, p2r_prime, p2c_prime, turn_prime = next_state
 
         if turn == 1:
-            if cityblock([p2r, p2c], [p1r_prime, p1c_prime]) <= self._sense_rng:
-                return f"o1:{(p1r_prime, p1c_prime)}" + f"o2:{(p2r, p2c)}"
-            else:
-                if p1r_prime + 1 <= self._dim[0]:
-                    return f"o1:{(p1r_prime, p1c_prime)}" + f"o2:{(p2r, p2c)}" \
-                        + f"o1:{(p1r_prime + 1, p1c_prime)}" + f"o2:{(p2r, p2c)}"
-                else:
-                    return f"o1:{(p1r_prime, p1c_prime)}" + f"o2:{(p2r, p2c)}"
-
+            return self._sensor.observation((p2r, p2c), (p1r_prime, p1c_prime))
         else:
-            if cityblock([p2r_prime, p2c_prime], [p1r, p1c]) <= self._sense_rng:
-                return f"o1:{(p1r, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}"
-            else:
-                if p1r + 1 <= self._dim[0]:
-                    return f"o1:{(p1r, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}" \
-                        + f"o1:{(p1r + 1, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}"
-                else:
-                    return f"o1:{(p1r, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}"
+            return self._sensor.observation((p2r_prime, p2c_prime), (p1r, p1c))
 
     @models.register_property(GRAPH_PROPERTY)
     def goal_cells(self):
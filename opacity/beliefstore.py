@@ -0,0 +1,281 @@
+"""
+Compact encoding and storage of beliefs of belief games.
+
+Belief elements (s, q) are interned into integer ids. A belief (a set of elements) is encoded as its sorted element
+ids, delta-encoded (first id, then differences) as LEB128 varints. Beliefs are small sets of close ids, so most
+elements take one byte, instead of a nested tuple per element.
+
+    - `encode_ids`, `decode_ids`: varint coding of sorted id lists.
+    - `StateKeys`: bytes keys of belief states (s, q, b), used as compact visited index while exploring
+      (see `explorer.BeliefExplorer.write_store`). Decoding a key gives back the state.
+    - `BeliefStore`: deduplicated beliefs, numbered in insertion order and kept in blocks of `block_size` beliefs.
+      `save` compresses every block on its own with zlib or lzma, so that `load`ed stores decompress only the
+      blocks that are accessed.
+
+Usage (from `opacity/`), to archive the beliefs of a graph store:
+    python beliefstore.py <path>.gstore [--compression lzma] [--output <file>]
+"""
+import argparse
+import array
+import collections
+import itertools
+import logging
+import lzma
+import os
+import pickle
+import struct
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BLST"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ")         # magic, version, length of pickled header
+COMPRESSORS = {
+    None: (lambda data: data, lambda data: data),
+    "zlib": (lambda data: zlib.compress(data, 9), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while data[pos] & 0x80:
+        value |= (data[pos] & 0x7F) << shift
+        shift += 7
+        pos += 1
+    return value | data[pos] << shift, pos + 1
+
+
+def read_varints(data):
+    """ Returns the list of (non-delta) varints in `data`. """
+    values = []
+    value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            values.append(value | byte << shift)
+            value = shift = 0
+    return values
+
+
+def encode_ids(ids, out=None):
+    """ Appends the delta-varint encoding of sorted, distinct ids to `out` (new bytearray by default). """
+    out = bytearray() if out is None else out
+    prev = 0
+    for uid in ids:
+        _write_varint(out, uid - prev)
+        prev = uid
+    return out
+
+
+def decode_ids(data):
+    return list(itertools.accumulate(read_varints(data)))
+
+
+class StateKeys:
+    """
+    Bytes keys of belief states. The key of (s, q, b) is the varint id of (s, q) followed by the encoding of b.
+    Keys are equal iff states are equal, and `state(key(state)) == state`.
+    """
+    def __init__(self):
+        self.elements = []          # element id -> (s, q)
+        self._element_ids = dict()
+
+    def element_id(self, element):
+        uid = self._element_ids.get(element)
+        if uid is None:
+            uid = self._element_ids[element] = len(self.elements)
+            self.elements.append(element)
+        return uid
+
+    def key(self, state):
+        s, q, b = state
+        element_id = self.element_id
+        out = bytearray()
+        _write_varint(out, element_id((s, q)))
+        return bytes(encode_ids(sorted(element_id(element) for element in b), out))
+
+    def state(self, key):
+        values = read_varints(key)
+        elements = self.elements
+        s, q = elements[values[0]]
+        b = tuple(sorted(elements[uid] for uid in itertools.accumulate(values[1:])))
+        return s, q, b
+
+
+class BeliefStore:
+    """
+    Deduplicated beliefs as delta-varint blocks. `add` returns the id of a belief, `get` decodes it.
+    Stores read by `load` are read-only.
+    """
+    def __init__(self, block_size=4096):
+        self.block_size = block_size
+        self.keys = StateKeys()
+        self._data = bytearray()
+        self._offsets = array.array("Q", [0])
+        self._index = dict()            # maps {encoded belief: id}
+
+        # Set by `load`
+        self._blocks = None             # compressed blocks
+        self._decompress = None
+        self._cache = collections.OrderedDict()
+        self._cache_size = 8
+        self._count = None
+
+    def __len__(self):
+        return self._count if self._blocks is not None else len(self._offsets) - 1
+
+    def nbytes(self):
+        """ Bytes of encoded beliefs (excluding the dedup index and element table). """
+        if self._blocks is not None:
+            return sum(len(block) for block in self._blocks)
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+    def add(self, belief):
+        if self._blocks is not None:
+            raise ValueError("Loaded belief stores are read-only.")
+
+        element_id = self.keys.element_id
+        data = bytes(encode_ids(sorted(element_id(element) for element in belief)))
+        bid = self._index.get(data)
+        if bid is None:
+            bid = self._index[data] = len(self._offsets) - 1
+            self._data.extend(data)
+            self._offsets.append(len(self._data))
+        return bid
+
+    def element_ids(self, bid):
+        if self._blocks is None:
+            return decode_ids(self._data[self._offsets[bid]:self._offsets[bid + 1]])
+        offsets, data = self._block(bid // self.block_size)
+        idx = bid % self.block_size
+        return decode_ids(data[offsets[idx]:offsets[idx + 1]])
+
+    def get(self, bid):
+        """ Returns the belief as a sorted tuple of elements, as in `models.BeliefGame` states. """
+        elements = self.keys.elements
+        return tuple(sorted(elements[uid] for uid in self.element_ids(bid)))
+
+    def _block(self, idx):
+        # Decompressed blocks of loaded stores, least recently used first.
+        if idx in self._cache:
+            self._cache.move_to_end(idx)
+            return self._cache[idx]
+
+        raw = self._decompress(self._blocks[idx])
+        num_beliefs = min(self.block_size, self._count - idx * self.block_size)
+        offsets, pos = [0], 0
+        for _ in range(num_beliefs):
+            length, pos = _read_varint(raw, pos)
+            offsets.append(offsets[-1] + length)
+        block = self._cache[idx] = (offsets, raw[pos:])
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return block
+
+    def _raw_blocks(self):
+        # Each block: varint lengths of its beliefs, followed by their data.
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            out = bytearray()
+            for bid in range(start, stop):
+                _write_varint(out, self._offsets[bid + 1] - self._offsets[bid])
+            out.extend(self._data[self._offsets[start]:self._offsets[stop]])
+            yield bytes(out)
+
+    def save(self, fpath, compression="zlib", extra=None):
+        """
+        Writes the store with every block compressed on its own.
+
+        :param compression: "zlib", "lzma" or None.
+        :param extra: dict {name: array.array or bytes} saved along (e.g. belief id of every graph node).
+        """
+        compress, _ = COMPRESSORS[compression]
+        blocks = [compress(block) for block in self._raw_blocks()]
+        header = pickle.dumps({
+            "elements": self.keys.elements,
+            "block_size": self.block_size,
+            "count": len(self),
+            "compression": compression,
+            "block_lengths": [len(block) for block in blocks],
+            "extra": {name: (getattr(values, "typecode", None), compress(bytes(values)))
+                      for name, values in (extra or dict()).items()},
+        })
+        with open(fpath, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(header)))
+            file.write(header)
+            for block in blocks:
+                file.write(block)
+        return os.path.getsize(fpath)
+
+    @classmethod
+    def load(cls, fpath):
+        """ Reads a saved store. Returns (store, extra), where extra maps names to arrays (or bytes). """
+        with open(fpath, "rb") as file:
+            magic, version, header_len = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{fpath} is not a belief store (version {VERSION}).")
+            header = pickle.loads(file.read(header_len))
+            blocks = [file.read(length) for length in header["block_lengths"]]
+
+        store = cls(block_size=header["block_size"])
+        for element in header["elements"]:
+            store.keys.element_id(element)
+        store._blocks = blocks
+        store._count = header["count"]
+        _, store._decompress = COMPRESSORS[header["compression"]]
+
+        extra = dict()
+        for name, (typecode, data) in header["extra"].items():
+            data = store._decompress(data)
+            extra[name] = array.array(typecode, data) if typecode is not None else data
+        return store, extra
+
+
+def from_view(view, block_size=4096):
+    """
+    Builds a belief store of the beliefs of a graph store.
+
+    :return: (store, node_head, node_belief), where node_head[uid] is the element id of (s, q) of node uid and
+        node_belief[uid] is the id of its belief.
+    """
+    store = BeliefStore(block_size=block_size)
+    node_head, node_belief = array.array("q"), array.array("q")
+    for uid in range(view.number_of_nodes()):
+        s, q, b = view.state(uid)
+        node_head.append(store.keys.element_id((s, q)))
+        node_belief.append(store.add(b))
+    return store, node_head, node_belief
+
+
+if __name__ == "__main__":
+    import mmgraph
+
+    parser = argparse.ArgumentParser(description="Archive the beliefs of a graph store.")
+    parser.add_argument("store", help="Graph store directory (.gstore).")
+    parser.add_argument("--compression", choices=["zlib", "lzma", "none"], default="zlib")
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--output", default=None, help="Output file (default: <store>/beliefs.blst).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    graph_view = mmgraph.GraphView(args.store)
+    belief_store, heads, beliefs = from_view(graph_view, block_size=args.block_size)
+    output = args.output or os.path.join(args.store, "beliefs.blst")
+    size = belief_store.save(output, compression=None if args.compression == "none" else args.compression,
+                             extra={"node_head": heads, "node_belief": beliefs})
+    state_bytes = 4 * graph_view._meta["state_len"] + 8 * (graph_view.number_of_nodes() + 1)
+    print(f"{graph_view.number_of_nodes()} nodes, {len(belief_store)} distinct beliefs, "
+          f"{len(belief_store.keys.elements)} elements")
+    print(f"Graph store states: {state_bytes} bytes. Encoded beliefs: {belief_store.nbytes()} bytes. "
+          f"Archive ({args.compression}): {size} bytes.")
@@ -0,0 +1,254 @@
+"""
+Scaling benchmarks for belief construction and solving.
+
+Sweeps grid size, sensor range, number of goals and formula complexity of the UAV/UGV gridworld
+(`ex14_5x5_UAV_UGV.RndGridworld`), and also runs the 4x4 wumpus world (`archive/ex13_4x4wumpus.py`)
+and the toy game (`ex1_toy.MyGame`).
+For every instance the following phases are timed separately:
+    - delta: mean time of `BeliefGame.delta` on a cold belief layer (see `time_delta`), over the (node, action)
+      pairs of the belief graph.
+    - graphify: belief graph construction.
+    - solve_p1, solve_p2: P1's and P2's `SWinReach.solve`.
+    - save_ggraph, save_gstore, save_solution: serialization.
+
+Every run appends one JSON record per instance to a history file (JSON lines). Each record is compared with
+the previous record of the same instance and slower phases are reported as regressions.
+
+Usage (from `opacity/`):
+    python bench_scaling.py [--quick] [--history out/bench/history.jsonl] [--threshold 1.25]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import ggsolver.dtptb.pgsolver as dtptb
+import ggsolver.gridworld.util as gw_util
+import ggsolver.logic as logic
+
+import ex14_5x5_UAV_UGV as ex14
+import mmgraph
+import models as opac_models
+import solution as sol
+
+logger = logging.getLogger(__name__)
+
+HISTORY = "out/bench/history.jsonl"
+
+# Sweep parameters
+GRID_DIMS = [(3, 3), (4, 4), (5, 5)]
+SENSOR_RNGS = [0, 1, 2]
+NUM_GOALS = [1, 2, 3]
+FORMULA_KINDS = ["conj", "seq"]
+DELTA_SAMPLES = 2000
+
+QUICK_SWEEP = {"dims": [(3, 3)], "sensor_rngs": [1], "num_goals": [1, 2], "formula_kinds": ["conj"]}
+
+MOVES = {gw_util.GW_ACT_N: (1, 0), gw_util.GW_ACT_E: (0, 1), gw_util.GW_ACT_S: (-1, 0), gw_util.GW_ACT_W: (0, -1)}
+
+
+def make_formula(kind, num_goals):
+    """
+    conj: Fg0 & Fg1 & ...
+    seq: F(g0 & F(g1 & F(...)))
+    """
+    if kind == "conj":
+        return " & ".join(f"F(g{idx})" for idx in range(num_goals))
+    formula = f"F(g{num_goals - 1})"
+    for idx in reversed(range(num_goals - 1)):
+        formula = f"F(g{idx} & {formula})"
+    return formula
+
+
+class BenchGridworld(ex14.RndGridworld):
+    """
+    ex14 gridworld on any grid: P2 patrols the boundary ring, goals are placed along the diagonal.
+    """
+    def __init__(self, dim, num_goals, sense_rng, formula):
+        rows, cols = dim
+        goal_cells = [(min(idx + 1, rows - 1), min(idx + 1, cols - 1)) for idx in range(num_goals)]
+        super(BenchGridworld, self).__init__(dim=dim, goal_cells=goal_cells, sense_rng=sense_rng)
+        self._formula = formula
+        self._p2_walkable = [(r, c) for r, c in itertools.product(range(rows), range(cols))
+                             if r in (0, rows - 1) or c in (0, cols - 1)]
+        ring = set(self._p2_walkable)
+        self._p2_acts = {
+            cell: [act for act, (dr, dc) in MOVES.items() if (cell[0] + dr, cell[1] + dc) in ring]
+            for cell in self._p2_walkable
+        }
+
+    def formula1(self):
+        return logic.ltl.ScLTL(self._formula, atoms=self.atoms())
+
+
+def gridworld_instances(dims, sensor_rngs, num_goals, formula_kinds):
+    for dim, rng, goals, kind in itertools.product(dims, sensor_rngs, num_goals, formula_kinds):
+        if goals == 1 and kind != "conj":
+            continue
+        formula = make_formula(kind, goals)
+        game = BenchGridworld(dim, goals, rng, formula)
+        game.initialize((dim[0] - 1, 0, 0, 0, 1))
+        params = {"arena": "gridworld", "dim": list(dim), "sensor_rng": rng, "num_goals": goals, "formula": formula}
+        yield params, game, game.formula1()
+
+
+def wumpus_instances():
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+    import ex13_4x4wumpus as wumpus
+    game = wumpus.RndGridworld(dim=wumpus.DIM, goal_cells=wumpus.GOAL_CELLS, sense_rng=wumpus.SENSOR_RNG,
+                               obs=wumpus.OBS_CELLS)
+    game.initialize((0, 1, *wumpus.P2_INIT, 1))
+    params = {"arena": "wumpus", "dim": list(wumpus.DIM), "sensor_rng": wumpus.SENSOR_RNG,
+              "num_goals": len(wumpus.GOAL_CELLS), "formula": str(game.formula1())}
+    yield params, game, game.formula1()
+
+
+def toy_instances():
+    import ex1_toy
+    game = ex1_toy.MyGame()
+    game.initialize(0)
+    params = {"arena": "toy", "formula": str(game.formula())}
+    yield params, game, game.formula()
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def time_delta(game, aut, game_graph, samples=DELTA_SAMPLES):
+    """
+    Returns the mean time of `BeliefGame.delta` on a cold belief layer, over states of `game_graph`.
+    Belief games share the layer cached on the arena (and in `models.registry`), which graphify has just filled,
+    so both are dropped first. The new layer's transition table is prefilled when it is built, before timing.
+    """
+    vars(game).pop("_belief_layer", None)
+    opac_models.registry.clear()
+    belief_game = opac_models.BeliefGame(game, aut)
+    pairs = []
+    for uid in game_graph.nodes():
+        state = game_graph["state"][uid]
+        pairs.extend((state, act) for act in belief_game.enabled_acts(state))
+        if len(pairs) >= samples:
+            break
+
+    start = time.perf_counter()
+    for state, act in pairs[:samples]:
+        belief_game.delta(state, act)
+    return (time.perf_counter() - start) / max(len(pairs[:samples]), 1)
+
+
+def run_instance(game, formula, workdir):
+    timings = dict()
+    aut, timings["translate"] = _timed(formula.translate)
+
+    belief_game = opac_models.BeliefGame(game, aut)
+    game_graph, timings["graphify"] = _timed(belief_game.graphify, pointed=True)
+    timings["delta"] = time_delta(game, aut, game_graph)
+
+    swin_p1 = dtptb.SWinReach(game_graph)
+    _, timings["solve_p1"] = _timed(swin_p1.solve)
+
+    final = {game_graph["state"][uid] for uid in game_graph.nodes() if belief_game.final_p2(game_graph["state"][uid])}
+    swin_p2 = dtptb.SWinReach(game_graph, final=final)
+    _, timings["solve_p2"] = _timed(swin_p2.solve)
+
+    _, timings["save_ggraph"] = _timed(game_graph.save, os.path.join(workdir, "game.ggraph"), overwrite=True)
+    _, timings["save_gstore"] = _timed(mmgraph.write_graph_store, game_graph, os.path.join(workdir, "game.gstore"),
+                                       overwrite=True)
+    _, timings["save_solution"] = _timed(sol.save_solution, swin_p1, os.path.join(workdir, "game_p1.wsol"))
+
+    sizes = {"nodes": game_graph.number_of_nodes(), "edges": game_graph.number_of_edges()}
+    return timings, sizes
+
+
+def instance_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def load_history(fpath):
+    last = dict()
+    if os.path.exists(fpath):
+        with open(fpath, "r") as file:
+            for line in file:
+                record = json.loads(line)
+                last[instance_key(record["params"])] = record
+    return last
+
+
+def compare(record, previous, threshold):
+    """ Returns {phase: ratio} of phases slower than `threshold` times their previous timing. """
+    if previous is None:
+        return dict()
+    slower = dict()
+    for phase, value in record["timings"].items():
+        before = previous["timings"].get(phase)
+        if before and value / before > threshold:
+            slower[phase] = value / before
+    return slower
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(quick=False, history=HISTORY, threshold=1.25):
+    # Per-transition debug logging would dominate the timings.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    sweep = QUICK_SWEEP if quick else {
+        "dims": GRID_DIMS, "sensor_rngs": SENSOR_RNGS, "num_goals": NUM_GOALS, "formula_kinds": FORMULA_KINDS
+    }
+    instances = itertools.chain(
+        toy_instances(),
+        gridworld_instances(sweep["dims"], sweep["sensor_rngs"], sweep["num_goals"], sweep["formula_kinds"]),
+        [] if quick else wumpus_instances(),
+    )
+
+    os.makedirs(os.path.dirname(history) or ".", exist_ok=True)
+    previous = load_history(history)
+    run_info = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+    }
+
+    regressions = 0
+    with open(history, "a") as file, tempfile.TemporaryDirectory() as workdir:
+        for params, game, formula in instances:
+            timings, sizes = run_instance(game, formula, workdir)
+            record = {**run_info, "params": params, "sizes": sizes, "timings": timings}
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+
+            slower = compare(record, previous.get(instance_key(params)), threshold)
+            regressions += len(slower) > 0
+            print(f"{params}: {sizes['nodes']} nodes, "
+                  + ", ".join(f"{phase}={value:.4g}s" for phase, value in timings.items()))
+            for phase, ratio in slower.items():
+                print(f"    REGRESSION {phase}: {ratio:.2f}x slower than previous run.")
+
+    print(f"Appended results to {history}. {regressions} instance(s) regressed.")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Run a small sweep.")
+    parser.add_argument("--history", default=HISTORY, help="History file (JSON lines).")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as regression.")
+    args = parser.parse_args()
+    sys.exit(1 if main(args.quick, args.history, args.threshold) else 0)
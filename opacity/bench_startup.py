@@ -0,0 +1,95 @@
+"""
+Startup benchmark for experiment entry points.
+
+Imports each module in a fresh interpreter (from an empty working directory) and reports:
+    - import time: median wall time of `python -c "import <module>"` minus the bare interpreter startup.
+    - heavy modules: which of HEAVY_MODULES were loaded by the import.
+    - files: files created in the working directory by the import.
+
+The run fails if an import creates files, loads a module listed in FORBIDDEN, or takes longer than `--max-ms`.
+
+Usage (from `opacity/`):
+    python bench_startup.py [--repeat 5] [--max-ms 1000] [module ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULES = ["models", "run_experiment", "explorer", "ex14_5x5_UAV_UGV", "ex1_toy", "analyze_experiment",
+           "mmgraph", "solution", "simulate", "retarget", "export", "dfa_cache"]
+HEAVY_MODULES = ["numpy", "scipy", "networkx", "loguru", "ggsolver.graph", "ggsolver.logic",
+                 "ggsolver.dtptb.pgsolver"]
+FORBIDDEN = ["scipy", "loguru"]
+
+PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _run(code, cwd, env):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, proc
+
+
+def measure(module, repeat, baseline):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    times = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(repeat):
+            elapsed, proc = _run(PROBE.format(module=module), cwd, env)
+            if proc.returncode != 0:
+                return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+            times.append(elapsed)
+        loaded = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+        files = sorted(os.listdir(cwd))
+
+    return {
+        "module": module,
+        "import_ms": max(statistics.median(times) - baseline, 0.0) * 1000,
+        "heavy": [name for name in HEAVY_MODULES if name in loaded],
+        "files": files,
+    }
+
+
+def main(modules, repeat=5, max_ms=1000.0):
+    with tempfile.TemporaryDirectory() as cwd:
+        baseline = statistics.median(_run("pass", cwd, None)[0] for _ in range(repeat))
+    print(f"Interpreter startup: {baseline * 1000:.1f} ms")
+
+    failures = 0
+    for module in modules:
+        result = measure(module, repeat, baseline)
+        if "error" in result:
+            print(f"{module:24s} ERROR {result['error']}")
+            failures += 1
+            continue
+
+        problems = [f"creates {result['files']}"] if result["files"] else []
+        problems += [f"loads {name}" for name in result["heavy"] if name in FORBIDDEN]
+        if result["import_ms"] > max_ms:
+            problems.append(f"slower than {max_ms:.0f} ms")
+        failures += len(problems) > 0
+        print(f"{module:24s} {result['import_ms']:8.1f} ms  heavy: {', '.join(result['heavy']) or '-'}"
+              + (f"  FAIL: {'; '.join(problems)}" if problems else ""))
+
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to import.")
+    parser.add_argument("--repeat", type=int, default=5, help="Imports per module.")
+    parser.add_argument("--max-ms", type=float, default=1000.0, help="Import time budget per module.")
+    args = parser.parse_args()
+    sys.exit(1 if main(args.modules, args.repeat, args.max_ms) else 0)
@@ -0,0 +1,124 @@
+"""
+Memory budget for experiment runs.
+
+A `MemoryBudget` is checked periodically by the belief explorer and between phases of `run_experiment`.
+When the resident set size exceeds the budget, `MemoryBudgetExceeded` is raised, so the run can record a
+partial result instead of being OOM-killed. With policy "checkpoint", the explorer first saves its partial
+exploration so that it can be resumed (e.g. on a machine with more memory). With policy "stream",
+`run_experiment` drops the in-memory belief graph and explores again into a disk-backed graph store
+(`explorer.BeliefExplorer.write_store`). The allocator rarely returns the freed graph to the OS, so the streamed
+exploration runs under a `rebased` budget, which keeps the headroom of the original budget above the RSS left
+after garbage collection. Checkpoints only exist for the in-memory graph: when the streamed exploration exceeds
+its budget, it aborts.
+
+As a backstop against a single allocation jumping past the budget between two checks, `apply_hard_limit`
+sets the address-space limit of the process, so that the allocation fails with `MemoryError` instead. It returns
+the previous limit, which `restore_limit` sets back, so that pooled workers do not keep the limit of a past job.
+"""
+import logging
+import os
+import resource
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("abort", "checkpoint", "stream")
+SUFFIXES = {"K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+
+
+class MemoryBudgetExceeded(Exception):
+    def __init__(self, msg, rss=None, checkpoint=None, partial=None):
+        super(MemoryBudgetExceeded, self).__init__(msg)
+        self.rss = rss
+        self.checkpoint = checkpoint
+        self.partial = partial if partial is not None else dict()
+
+
+def parse_size(size):
+    """ Parses sizes such as 4096, "512M" or "8G" into bytes. None stays None. """
+    if size is None or isinstance(size, int):
+        return size
+    size = str(size).strip().upper().rstrip("B")
+    if size[-1:] in SUFFIXES:
+        return int(float(size[:-1]) * SUFFIXES[size[-1]])
+    return int(float(size))
+
+
+def total_memory():
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def per_worker_budget(num_workers, fraction=0.8):
+    """ Splits `fraction` of physical memory evenly among `num_workers` processes. """
+    return int(total_memory() * fraction / max(num_workers, 1))
+
+
+def apply_hard_limit(limit):
+    """
+    Limits the address space of this process to `limit` bytes (no-op for None).
+
+    :return: The previous (soft, hard) limit to pass to `restore_limit`, or None if nothing was changed.
+    """
+    if limit is None:
+        return None
+    previous = resource.getrlimit(resource.RLIMIT_AS)
+    hard = previous[1]
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    logger.info(f"Address space limited to {limit / 2 ** 30:.2f} GB.")
+    return previous
+
+
+def restore_limit(previous):
+    """ Restores the address-space limit returned by `apply_hard_limit` (no-op for None). """
+    if previous is not None:
+        resource.setrlimit(resource.RLIMIT_AS, previous)
+
+
+class MemoryBudget:
+    def __init__(self, limit, policy="abort", checkpoint=None):
+        """
+        :param limit: Budget on resident set size (bytes or size string, see `parse_size`).
+        :param policy: "abort", "checkpoint" or "stream".
+        :param checkpoint: (str) Checkpoint file used by policy "checkpoint".
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown memory policy {policy}. Expected one of {POLICIES}.")
+        if policy == "checkpoint" and checkpoint is None:
+            raise ValueError("Memory policy 'checkpoint' requires a checkpoint file.")
+        self.limit = parse_size(limit)
+        self.policy = policy
+        self.checkpoint = checkpoint
+        self.baseline = metrics.current_rss()       # RSS when the budget was set, see `rebased`
+
+    @classmethod
+    def from_config(cls, config):
+        """ Returns the budget described by config keys "memory_budget", "memory_policy", "checkpoint". """
+        if config.get("memory_budget") is None:
+            return None
+        checkpoint = config.get("checkpoint") or os.path.join(config["directory"], f"{config['filename']}.ckpt")
+        return cls(config["memory_budget"], config.get("memory_policy", "abort"), checkpoint)
+
+    def rebased(self):
+        """
+        Returns a budget raised by the growth of RSS since this one was created, e.g. to run again after freeing
+        memory that the process keeps (see module doc).
+        """
+        budget = MemoryBudget(self.limit, self.policy, self.checkpoint)
+        budget.limit += max(budget.baseline - self.baseline, 0)
+        return budget
+
+    def exceeded(self):
+        """ Returns current RSS if it is above the budget, else None. """
+        rss = metrics.current_rss()
+        return rss if rss > self.limit else None
+
+    def check(self, where=""):
+        rss = self.exceeded()
+        if rss is not None:
+            raise MemoryBudgetExceeded(
+                f"Memory budget of {self.limit / 2 ** 20:.0f} MB exceeded {where}: RSS {rss / 2 ** 20:.0f} MB.",
+                rss=rss,
+            )
@@ -0,0 +1,228 @@
+"""
+Compact controllers compiled from P1's winning strategy, with a pure-Python runtime.
+
+`compile_controller` keeps only the part of a solved belief game (graph store with an attached `.wsol` solution)
+that P1 can reach from the initial node by following its strategy: at P1's nodes the first winning edge, at P2's
+nodes all edges. Controller states are numbered in breadth-first order from 0 (initial node). A controller holds
+    - act: action id of P1 per controller state (-1 at P2's nodes and at final nodes).
+    - next_ptr, next_sym, next_dst: CSR transition table. Symbols are ids of the next arena state, which P1
+      observes after every move; next_dst is the next controller state.
+    - final: 1 at final (target) nodes, where the controller stops.
+    - actions, arena_states: values of action and symbol ids.
+
+Controllers are saved as JSON and executed by `Controller`, which needs neither numpy nor ggsolver:
+    ctrl = Controller.load("ex14.ctrl.json")
+    act = ctrl.action()                 # P1's action, None at P2's turn
+    ctrl.step(next_arena_state)         # after every move (P1's or P2's)
+
+Usage (from `opacity/`):
+    python controller.py <path>.gstore <path>_p1.wsol [--output <file>] [--bench 100000]
+"""
+import argparse
+import collections
+import json
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def _to_tuple(value):
+    # JSON turns tuples (e.g. gridworld states and actions) into lists.
+    return tuple(_to_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+def compile_controller(view, player=1):
+    """
+    Compiles the winning strategy attached to a graph store into a controller (dict, see module doc).
+
+    :param view: (mmgraph.GraphView) Belief game with an attached solution of `player`'s reachability game.
+    :param player: (int) Player executing the controller.
+    """
+    import numpy as np
+
+    node_winner, edge_bitmap = view.solution_arrays()
+    if node_winner is None:
+        raise ValueError("Attach a solution to the graph store first (GraphView.attach_solution).")
+    v0 = view.init_node()
+    if v0 is None or node_winner[v0] != player:
+        raise ValueError(f"Player {player} does not win from the initial node {v0}.")
+
+    succ_ptr = np.asarray(view.succ_ptr).tolist()
+    succ_dst = np.asarray(view.succ_dst).tolist()
+    edge_act = np.asarray(view.edge_act).tolist()
+    turn = np.asarray(view.turn).tolist()
+    final = np.asarray(view.final).tolist()
+    winning = np.unpackbits(np.asarray(edge_bitmap))[:view.number_of_edges()].tolist()
+    state_ptr, state_data = view.state_ptr, view.state_data
+
+    # Intern actions and arena states used by the controller.
+    actions, act_ids = [], dict()
+    arena_states, arena_ids = [], dict()
+
+    def intern(table, ids, value):
+        if value not in ids:
+            ids[value] = len(table)
+            table.append(value)
+        return ids[value]
+
+    def symbol(uid):
+        return intern(arena_states, arena_ids, int(state_data[state_ptr[uid]]))
+
+    # Breadth-first over nodes reachable under the strategy.
+    node2ctrl = {v0: 0}
+    queue = collections.deque([v0])
+    act, is_final, next_ptr, next_sym, next_dst = [], [], [0], [], []
+    while queue:
+        uid = queue.popleft()
+        edges = range(succ_ptr[uid], succ_ptr[uid + 1])
+        is_final.append(int(final[uid]))
+        if final[uid]:
+            edges = []
+            act.append(-1)
+        elif turn[uid] == player:
+            eid = next((eid for eid in edges if winning[eid]), None)
+            if eid is None:
+                raise ValueError(f"Node {uid} in the winning region has no winning edge.")
+            edges = [eid]
+            act.append(intern(actions, act_ids, edge_act[eid]))
+        else:
+            act.append(-1)
+
+        transitions = dict()
+        for eid in edges:
+            vid = succ_dst[eid]
+            sym = symbol(vid)
+            if transitions.setdefault(sym, vid) != vid:
+                raise ValueError(f"Node {uid} has two successors with the same arena state; "
+                                 f"P1 cannot tell them apart.")
+            if vid not in node2ctrl:
+                node2ctrl[vid] = len(node2ctrl)
+                queue.append(vid)
+        for sym, vid in sorted(transitions.items()):
+            next_sym.append(sym)
+            next_dst.append(node2ctrl[vid])
+        next_ptr.append(len(next_sym))
+
+    codec = view.codec
+    logger.info(f"Compiled controller with {len(node2ctrl)} states from {view.number_of_nodes()} nodes.")
+    return {
+        "version": VERSION,
+        "init": 0,
+        "act": act,
+        "final": is_final,
+        "next_ptr": next_ptr,
+        "next_sym": next_sym,
+        "next_dst": next_dst,
+        "actions": [codec.actions[aid] for aid in actions],
+        "arena_states": [codec.arena_states[sid] for sid in arena_states],
+    }
+
+
+def save(data, fpath):
+    with open(fpath, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+
+
+class Controller:
+    """ Runtime of a compiled controller. Each step is a list index and a dict lookup. """
+    def __init__(self, data):
+        if data["version"] != VERSION:
+            raise ValueError(f"Unsupported controller version {data['version']}.")
+        self.actions = [_to_tuple(act) for act in data["actions"]]
+        self.arena_states = [_to_tuple(state) for state in data["arena_states"]]
+        self._symbols = {state: sym for sym, state in enumerate(self.arena_states)}
+        self._act = [self.actions[aid] if aid >= 0 else None for aid in data["act"]]
+        self._final = [bool(flag) for flag in data["final"]]
+        ptr, sym, dst = data["next_ptr"], data["next_sym"], data["next_dst"]
+        self._next = [dict(zip(sym[ptr[uid]:ptr[uid + 1]], dst[ptr[uid]:ptr[uid + 1]]))
+                      for uid in range(len(ptr) - 1)]
+        self._init = data["init"]
+        self.state = self._init
+
+    @classmethod
+    def load(cls, fpath):
+        with open(fpath, "r") as file:
+            return cls(json.load(file))
+
+    def __len__(self):
+        return len(self._act)
+
+    def reset(self):
+        self.state = self._init
+
+    def action(self):
+        """ Returns P1's action in the current state, or None at P2's turn and after reaching the objective. """
+        return self._act[self.state]
+
+    def is_final(self):
+        return self._final[self.state]
+
+    def observations(self):
+        """ Returns the arena states the controller accepts as next observation. """
+        return [self.arena_states[sym] for sym in self._next[self.state]]
+
+    def step(self, arena_state):
+        """ Advances the controller on the observed next arena state and returns the next action. """
+        nxt = self._next[self.state].get(self._symbols.get(arena_state))
+        if nxt is None:
+            raise KeyError(f"Arena state {arena_state} is not a successor of controller state {self.state}.")
+        self.state = nxt
+        return self._act[nxt]
+
+
+def benchmark(ctrl, steps=100000, seed=0):
+    """
+    Runs random plays (P2 moves at random) and returns the mean per-step latency in microseconds.
+    Plays restart from the initial state at final states and at (non-final) states without successors.
+    """
+    rng = random.Random(seed)
+    plays = []
+    dead_ends = set()
+    ctrl.reset()
+    for _ in range(steps):
+        if ctrl.is_final():
+            ctrl.reset()
+        options = ctrl.observations()
+        if not options:
+            dead_ends.add(ctrl.state)
+            ctrl.reset()
+            options = ctrl.observations()
+            if not options:
+                raise ValueError("The initial controller state has no successors.")
+        plays.append(options[rng.randrange(len(options))])
+        ctrl.step(plays[-1])
+    if dead_ends:
+        logger.warning(f"Controller states without successors: {sorted(dead_ends)}.")
+
+    ctrl.reset()
+    start = time.perf_counter()
+    for obs in plays:
+        if ctrl.is_final() or ctrl.state in dead_ends:
+            ctrl.reset()
+        ctrl.action()
+        ctrl.step(obs)
+    return (time.perf_counter() - start) / max(steps, 1) * 1e6
+
+
+if __name__ == "__main__":
+    import mmgraph
+
+    parser = argparse.ArgumentParser(description="Compile P1's winning strategy into a controller.")
+    parser.add_argument("store", help="Graph store directory (.gstore).")
+    parser.add_argument("solution", help="Solution of P1's game (.wsol).")
+    parser.add_argument("--output", default=None, help="Output file (default: <store without .gstore>.ctrl.json).")
+    parser.add_argument("--bench", type=int, default=0, help="Number of steps of the latency benchmark.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    graph_view = mmgraph.GraphView(args.store).attach_solution(args.solution)
+    output = args.output or f"{args.store.rstrip('/').removesuffix('.gstore')}.ctrl.json"
+    save(compile_controller(graph_view), output)
+    controller = Controller.load(output)
+    print(f"Controller {output}: {len(controller)} states (graph: {graph_view.number_of_nodes()} nodes).")
+    if args.bench > 0:
+        print(f"Mean step latency: {benchmark(controller, args.bench):.2f} us")
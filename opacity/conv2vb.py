@@ -1,54 +1,29 @@
-import json
-import ggsolver.graph as ggraph
-from networkx.drawing.nx_agraph import read_dot
-from loguru import logger
+import logging
+import os
 
-FILE_GGRAPH = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1_p1.ggraph"
-FILE_DOT = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1_p1.dot"
-FILE_VB = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1_p1.json"
-
-
-def gen_vb_output():
-    # Initialize output dictionary for VB
-    out = {"state": dict(), "transitions": dict(), "win": list(), "init_state": None}
-
-    # Load dot file
-    logger.info("Loading DOT file...")
-    dot_graph = read_dot(FILE_DOT)
+import export
+import mmgraph
 
-    # Load JSON ggraph file
-    logger.info("Loading ggsolver graph...")
-    graph = ggraph.Graph().load(FILE_GGRAPH)
+logger = logging.getLogger(__name__)
 
-    # Iterate over nodes to extract information
-    state2node = dict()
-    for node, data in dot_graph.nodes(data=True):
-        # Get node id
-        uid = int(node[1:])
-        state2node[graph["state"][uid]] = uid 
-
-        # Store the state information in VB output
-        out["state"][uid] = graph["state"][uid]
-
-        # If node is winning for P1, mark it.
-        if data["color"] == "green":
-            out["win"].append(uid)
+FILE_GSTORE = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1.gstore"
+FILE_SOL = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1_p1.wsol"
+FILE_VB = "out/ex14_5x5_UAV_UGV/0_1/ex14_5x5_UAV_UGV_0_1_p1.json"
 
-        # Mark edge winners
-        for _, vid, key, data in dot_graph.out_edges(f"N{uid}", keys=True, data=True):
-            vid = int(vid[1:])
-            if data["color"] == "green":
-                act = graph["input"][uid, vid, key]
-                if uid not in out["transitions"]:
-                    out["transitions"][uid] = {act: vid}
-                else:
-                    out["transitions"][uid].update({act: vid})
 
-        # Mark initial state
-        out["init_state"] = state2node[graph["init_state"]]
+def gen_vb_output(binary=False):
+    # Open graph store with P1's solution. Nothing is loaded until the exporter reads it.
+    logger.info("Opening graph store...")
+    view = mmgraph.GraphView(FILE_GSTORE).attach_solution(FILE_SOL)
 
-    with open(FILE_VB, "w") as file:
-        json.dump(out, file, indent=2)
+    # Stream winning states and transitions to VB output
+    if binary:
+        fpath = os.path.splitext(FILE_VB)[0] + ".vbin"
+        logger.info(f"Writing binary VB output to {fpath}...")
+        export.write_vbin(view, fpath)
+    else:
+        logger.info(f"Writing VB output to {FILE_VB}...")
+        export.write_json(view, FILE_VB)
 
 
 if __name__ == '__main__':
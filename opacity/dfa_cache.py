@@ -0,0 +1,187 @@
+"""
+Persistent cache of ScLTL-to-DFA translations.
+
+Every run of `run_experiment` translates P1's formula with Spot, although sweeps (e.g. the workers of
+`ex14_5x5_UAV_UGV`) solve the same formula over and over. `translate` looks the formula up by its string and atom
+set, first in memory, then in a cache directory, and only translates on a miss.
+
+A translated `logic.automata.DFA` is compiled into a `CompiledDFA`: its transition function is evaluated once for
+every state and every subset of the atoms, into a dense step table `step[q, mask]`, where bit i of mask is set iff
+`atoms[i]` holds. Missing transitions (`aut.delta` returns None) are stored as -1 and `delta` returns None for
+them, as the translated DFA does. `CompiledDFA` implements the DFA interface used by `models.BeliefGame`
+(init_state, states, delta, final, atoms) with table lookups. Cache files hold the pickled `to_dict()` (builtin
+types only), so loading them needs neither Spot nor ggsolver, nor this module's class layout.
+
+The on-disk cache is opt-in: `translate` only caches in memory unless given a directory (see "dfa_cache" in
+`run_experiment.DEFAULT_CONFIG`; e.g. `DEFAULT_DIRECTORY`).
+
+Rendering the automaton is left to the caller (see "render_automaton" in `run_experiment.DEFAULT_CONFIG`).
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = os.environ.get("OPACITY_DFA_CACHE",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "opacity", "dfa"))
+MAX_ATOMS = 10          # Step tables have 2 ** len(atoms) columns, each evaluated once per state by `compile_dfa`.
+VERSION = 2
+
+_compiled = dict()      # maps {cache key: CompiledDFA} of this process
+
+
+class CompiledDFA:
+    def __init__(self, formula, atoms, states, init_state, finals, step):
+        """
+        :param formula: (str) ScLTL formula.
+        :param atoms: list of atoms. Bit i of a label mask stands for atoms[i].
+        :param states: list of DFA states. States are referred to by their index in the step table.
+        :param init_state: Initial DFA state.
+        :param finals: list of `final(q)` (acceptance sets) per state index.
+        :param step: list of rows per state index: step[qid][mask] is the index of the next state, -1 if none.
+        """
+        import numpy as np
+
+        self.formula = formula
+        self._atoms = list(atoms)
+        self._atom_bits = {atom: 1 << idx for idx, atom in enumerate(self._atoms)}
+        self._states = list(states)
+        # Index -1 (no transition) maps to None.
+        self._targets = self._states + [None]
+        self._state2id = {q: qid for qid, q in enumerate(self._states)}
+        self._init_state = init_state
+        self._finals = [list(final) for final in finals]
+        self._step_rows = [list(row) for row in step]
+        self.step_table = np.array(self._step_rows, dtype=np.int32).reshape(len(self._states), 2 ** len(atoms))
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, data):
+        self.__init__(**{key: value for key, value in data.items() if key != "version"})
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Rebuilds a compiled DFA from `to_dict()`. """
+        if data.get("version") != VERSION:
+            raise ValueError(f"Unsupported compiled DFA version {data.get('version')}.")
+        return cls(**{key: value for key, value in data.items() if key != "version"})
+
+    def __repr__(self):
+        return f"CompiledDFA({self.formula!r}, states={len(self._states)}, atoms={self._atoms})"
+
+    def to_dict(self):
+        return {
+            "version": VERSION,
+            "formula": self.formula,
+            "atoms": self._atoms,
+            "states": self._states,
+            "init_state": self._init_state,
+            "finals": self._finals,
+            "step": self._step_rows,
+        }
+
+    def atoms(self):
+        return list(self._atoms)
+
+    def states(self):
+        return list(self._states)
+
+    def init_state(self):
+        return self._init_state
+
+    def final(self, q):
+        return self._finals[self._state2id[q]]
+
+    def label_mask(self, label):
+        """ Returns the bitmask of a label (list of true atoms). Atoms unknown to the DFA are ignored. """
+        bits = self._atom_bits
+        mask = 0
+        for atom in label:
+            mask |= bits.get(atom, 0)
+        return mask
+
+    def delta(self, q, label):
+        return self._targets[self._step_rows[self._state2id[q]][self.label_mask(label)]]
+
+    def delta_mask(self, q, mask):
+        return self._targets[self._step_rows[self._state2id[q]][mask]]
+
+
+def cache_key(formula, atoms):
+    data = json.dumps([VERSION, str(formula), sorted(map(str, atoms))])
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+def compile_dfa(aut, formula, atoms):
+    """
+    Compiles a translated DFA into a `CompiledDFA`.
+
+    :param aut: (logic.automata.DFA) Translated automaton.
+    :param formula: (str) Formula of the automaton.
+    :param atoms: list of atoms of the formula.
+    """
+    atoms = sorted(atoms)
+    if len(atoms) > MAX_ATOMS:
+        raise ValueError(f"Cannot compile a DFA over {len(atoms)} atoms (at most {MAX_ATOMS}).")
+
+    states = list(aut.states())
+    state2id = {q: qid for qid, q in enumerate(states)}
+    labels = [[atom for idx, atom in enumerate(atoms) if mask >> idx & 1] for mask in range(2 ** len(atoms))]
+    step = []
+    for q in states:
+        row = []
+        for label in labels:
+            next_q = aut.delta(q, label)
+            if next_q is not None and next_q not in state2id:
+                raise ValueError(f"DFA of {formula}: delta({q}, {label}) = {next_q} is not a state.")
+            row.append(-1 if next_q is None else state2id[next_q])
+        step.append(row)
+    return CompiledDFA(str(formula), atoms, states, aut.init_state(), [aut.final(q) for q in states], step)
+
+
+def translate(formula, directory=None):
+    """
+    Returns the compiled DFA of an ScLTL formula, translating it only if it is not cached.
+    Formulas over more than `MAX_ATOMS` atoms are translated without compiling or caching.
+
+    :param formula: (logic.ltl.ScLTL) Formula.
+    :param directory: (str) Cache directory (e.g. `DEFAULT_DIRECTORY`). None (default) only caches in memory.
+    """
+    atoms = list(formula.atoms())
+    if len(atoms) > MAX_ATOMS:
+        logger.warning(f"Not caching the DFA of {formula}: too many atoms ({len(atoms)}).")
+        return formula.translate()
+
+    key = cache_key(formula, atoms)
+    if key in _compiled:
+        return _compiled[key]
+
+    # Load the cached translation, if available
+    fpath = os.path.join(directory, f"{key}.dfa") if directory is not None else None
+    if fpath is not None and os.path.exists(fpath):
+        try:
+            with open(fpath, "rb") as file:
+                aut = CompiledDFA.from_dict(pickle.load(file))
+            if aut.formula == str(formula):
+                logger.info(f"Loaded DFA of {formula} from {fpath}.")
+                _compiled[key] = aut
+                return aut
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError, KeyError, ValueError, AttributeError) as err:
+            logger.warning(f"Ignoring unreadable DFA cache file {fpath}: {err}")
+
+    # Translate and compile
+    aut = _compiled[key] = compile_dfa(formula.translate(), str(formula), atoms)
+    logger.info(f"Translated {formula}: {len(aut.states())} states.")
+
+    # Save atomically: parallel workers may write the same key.
+    if fpath is not None:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".tmp", delete=False) as file:
+            pickle.dump(aut.to_dict(), file)
+        os.replace(file.name, fpath)
+    return aut
@@ -13,12 +13,13 @@ import os.path
 import pathlib
 import shutil
 
-from scipy.spatial.distance import cityblock
+import budget as mem_budget
+import dfa_cache
 import run_experiment as exp
+import sensors
 import models as opac_models
 import itertools
 import ggsolver.gridworld.util as gw_util
-import ggsolver.logic as logic
 import ggsolver.models as gg_models
 
 # from loguru import logger
@@ -57,13 +58,18 @@ BASE_CONFIG = {
     "filename": f"{FILENAME}",
     "force_belief_graphify": False,
     "force_resolve": False,
+    "tabular_arena": True,
+    "dfa_cache": dfa_cache.DEFAULT_DIRECTORY,
+    "memory_budget": None,
+    "metrics_csv": f"out/{FILENAME}/metrics.csv",
 }
 
 
 class RndGridworld(opac_models.Arena):
     GRAPH_PROPERTY = opac_models.Arena.GRAPH_PROPERTY.copy()
 
-    def __init__(self, dim, goal_cells, obs=None, actions=None, init_state=None, sense_rng=2):
+    def __init__(self, dim, goal_cells, obs=None, actions=None, init_state=None, sense_rng=2,
+                 formula=None, p2_walkable=None, p2_acts=None):
         """
 
         :param dim: (rows, col)
@@ -71,17 +77,22 @@ class RndGridworld(opac_models.Arena):
         :param actions: see gridworld.utils package.
         :param init_state: obvious!
         :param sense_rng: int. Manhattan distance
+        :param formula: ScLTL formula string of P1. Defaults to FORMULA.
+        :param p2_walkable: cells P2 may occupy. Defaults to P2_WALKABLE.
+        :param p2_acts: dict {cell: [actions]} of P2's enabled actions. Defaults to the 5x5 patrol.
         """
         super(RndGridworld, self).__init__()
         self._dim = dim
-        self._p2_walkable = P2_WALKABLE
+        self._p2_walkable = P2_WALKABLE if p2_walkable is None else p2_walkable
+        self._formula = FORMULA if formula is None else formula
         self._obs = obs if obs is not None else list()
         self._actions = actions
         self._init_state = init_state
         self._sense_rng = sense_rng
+        self._sensor = sensors.RangeSensor(dim, sense_rng)
         self._goal_cells = goal_cells
         self._num_goals = len(self._goal_cells)
-        self._p2_acts = {
+        self._p2_acts = p2_acts if p2_acts is not None else {
             (0, 0): [gw_util.GW_ACT_N, gw_util.GW_ACT_E],
             (0, 1): [gw_util.GW_ACT_W, gw_util.GW_ACT_E],
             (0, 2): [gw_util.GW_ACT_W, gw_util.GW_ACT_E],
@@ -171,36 +182,51 @@ class RndGridworld(opac_models.Arena):
         return []
 
     def formula1(self):
-        return logic.ltl.ScLTL(FORMULA, atoms=self.atoms())
+        import ggsolver.logic as logic
+        return logic.ltl.ScLTL(self._formula, atoms=self.atoms())
 
     def attacker_observation(self, state, act, next_state):
         p1r, p1c, p2r, p2c, turn = state
         p1r_prime, p1c_prime, p2r_prime, p2c_prime, turn_prime = next_state
 
         if turn == 1:
-            if cityblock([p2r, p2c], [p1r_prime, p1c_prime]) <= self._sense_rng:
-                return f"o1:{(p1r_prime, p1c_prime)}" + f"o2:{(p2r, p2c)}"
-            else:
-                return f"o1:{(p1r_prime,)}" + f"o2:{(p2r, p2c)}"
-
+            return self._sensor.observation((p2r, p2c), (p1r_prime, p1c_prime))
         else:
-            if cityblock([p2r_prime, p2c_prime], [p1r, p1c]) <= self._sense_rng:
-                return f"o1:{(p1r, p1c)}" + f"o2:{(p2r_prime, p2c_prime)}"
-            else:
-                return f"o1:{(p1r,)}" + f"o2:{(p2r_prime, p2c_prime)}"
+            return self._sensor.observation((p2r_prime, p2c_prime), (p1r, p1c))
 
     @gg_models.register_property(GRAPH_PROPERTY)
     def goal_cells(self):
         return self._goal_cells
 
-
-def main_single_inits_multiprocessing():
+    def tabulate(self):
+        import gridgen
+        return gridgen.tabulate(self)
+
+    def dynamics_key(self):
+        # The formula and initial state are not part of the dynamics.
+        return (
+            tuple(self._dim),
+            tuple(self.actions()),
+            tuple(map(tuple, self._obs)),
+            tuple(map(tuple, self._p2_walkable)),
+            tuple(sorted((tuple(cell), tuple(acts)) for cell, acts in self._p2_acts.items())),
+            tuple(map(tuple, self._goal_cells)),
+            self._sense_rng,
+        )
+
+
+def main_single_inits_multiprocessing(share_memory=False):
+    """
+    :param share_memory: (bool) Unless BASE_CONFIG sets a memory budget, give every worker an equal share of
+        memory (see `budget.per_worker_budget`), so that one large belief game aborts instead of killing the pool.
+    """
     # Instantiate random game here
     game = RndGridworld(dim=DIM, goal_cells=GOAL_CELLS, sense_rng=SENSOR_RNG, obs=OBS_CELLS)
 
     # Iterate over initial states. Fix P2's state, P1's state variable. P1 plays first.
     p2r, p2c = P2_INIT
-    with concurrent.futures.ProcessPoolExecutor() as executor:
+    num_workers = os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
         futures = list()
         for p1r, p1c in itertools.product(range(DIM[0]), range(DIM[1])):
             if (p1r, p1c) in OBS_CELLS:
@@ -219,6 +245,10 @@ def main_single_inits_multiprocessing():
             path_ = pathlib.Path(dirpath)
             path_.mkdir(parents=True)
 
+            # Share memory among workers, if asked to.
+            if share_memory and config["memory_budget"] is None:
+                config["memory_budget"] = mem_budget.per_worker_budget(num_workers)
+
             # Add argument
             futures.append(executor.submit(exp.run_experiment, game, {s0}, config.copy()))
 
@@ -252,7 +282,23 @@ def main_single_inits():
         exp.run_experiment(game, config=config)
 
 
+def main_objectives(formulas, init_state=(2, 0, *P2_INIT, 1)):
+    """ Solves several objectives of P1 on one arena. The arena tables and belief layer are built once. """
+    game = RndGridworld(dim=DIM, goal_cells=GOAL_CELLS, sense_rng=SENSOR_RNG, obs=OBS_CELLS)
+    game.initialize(init_state)
+    for idx, formula in enumerate(formulas):
+        config = BASE_CONFIG.copy()
+        config["formula"] = formula
+        config["filename"] = f"{FILENAME}_f{idx}"
+        config["directory"] = os.path.join(config["directory"], f"formula_{idx}")
+        os.makedirs(config["directory"], exist_ok=True)
+        exp.run_experiment(game, {init_state}, config)
+
+
 if __name__ == "__main__":
+    os.makedirs("out", exist_ok=True)
+    logging.basicConfig(filename="out/belief.log", level=logging.DEBUG)
     logger.info("loguru says hi!")
     # main_single_inits()
+    # main_objectives([FORMULA, "F(g0 & F(g1))", "F(g2)"])
     main_single_inits_multiprocessing()
@@ -9,8 +9,6 @@ import ggsolver.logic as logic
 import ggsolver.dtptb as dtptb
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
-
 
 class MyGame(mod_opacity.Arena):
     """
@@ -130,6 +128,8 @@ def solve(game: mod_opacity.BeliefGame):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+
     # Instantiate MyGame here
     game = MyGame()
     game.initialize(0)
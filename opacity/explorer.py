@@ -0,0 +1,289 @@
+"""
+Breadth-first explorer of belief games with progress reporting.
+
+`BeliefExplorer.graphify` builds the same ggsolver graph as `BeliefGame.graphify(pointed=True, init_set=...)`.
+While exploring it calls a progress hook every `interval` seconds with a record:
+    elapsed, expanded, visited, frontier, edges: counters.
+    states_per_sec: expansions per second over the last interval (avg_states_per_sec: since start).
+    avg_belief_size: mean belief size of visited states.
+    rss: resident set size in bytes.
+    eta: estimated seconds to completion, or None while the frontier is still growing.
+
+The estimate assumes that each expansion keeps discovering new states at the rate of the last interval.
+With growth g < 1 new states per expansion, the frontier drains after about frontier / (1 - g) expansions.
+
+With a `budget.MemoryBudget`, memory is checked along with the clock. When the budget is exceeded,
+exploration stops with `budget.MemoryBudgetExceeded`. Under policy "checkpoint", the explored part
+(states, edges and frontier) is first pickled so that `graphify(resume=...)` can continue it later.
+
+`BeliefExplorer.write_store` streams the explored graph into a graph store (see `mmgraph`) instead, so that
+peak memory is set by the visited index rather than by the property maps of a ggsolver graph. The index is keyed
+by compact bytes encodings of states (see `beliefstore.StateKeys`).
+"""
+import collections
+import logging
+import pickle
+import time
+
+import budget as mem_budget
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CHECK_EVERY = 256           # expansions between clock checks
+
+
+def log_progress(record):
+    logger.info(
+        f"Explored {record['expanded']} / {record['visited']} states, frontier {record['frontier']}, "
+        f"{record['states_per_sec']:.1f} states/s, avg belief {record['avg_belief_size']:.2f}, "
+        f"RSS {record['rss'] / 2 ** 20:.1f} MB, ETA "
+        + ("unknown" if record["eta"] is None else f"{record['eta']:.0f}s")
+    )
+
+
+class BeliefExplorer:
+    def __init__(self, game, progress=log_progress, interval=10.0, budget=None):
+        """
+        :param game: (BeliefGame) Game to explore.
+        :param progress: Callable receiving progress records (see module doc), or None to disable reporting.
+        :param interval: (float) Seconds between progress records.
+        :param budget: (budget.MemoryBudget) Memory budget, or None.
+        """
+        self._game = game
+        self._progress = progress
+        self._interval = interval
+        self._budget = budget
+
+        self._start = None
+        self._last = None
+        self._belief_total = 0
+
+    def graphify(self, init_set=None, resume=None):
+        """
+        Explores the belief game from `init_set` (default: game's initial state) and returns a ggsolver graph.
+
+        :param resume: (str) Checkpoint file written when a memory budget was exceeded. Exploration continues
+            from it instead of `init_set`.
+        """
+        import ggsolver.graph as ggraph
+
+        game = self._game
+        graph = ggraph.Graph()
+        graph["state"] = ggraph.NodePropertyMap(graph)
+        graph["input"] = ggraph.EdgePropertyMap(graph)
+
+        state2node = dict()
+        queue = collections.deque()
+        self._start = time.perf_counter()
+        self._last = (self._start, 0, 0)
+        self._belief_total = 0
+
+        def add_node(state):
+            uid = graph.add_node()
+            graph["state"][uid] = state
+            state2node[state] = uid
+            queue.append(uid)
+            self._belief_total += len(state[2])
+            return uid
+
+        def add_edge(uid, vid, act):
+            key = graph.add_edge(uid, vid)
+            graph["input"][uid, vid, key] = act
+
+        expanded = 0
+        if resume is not None:
+            expanded = self._load_checkpoint(resume, add_node, add_edge, queue)
+            logger.info(f"Resumed exploration from {resume}: {len(state2node)} states, {len(queue)} in frontier.")
+        else:
+            for s0 in (init_set if init_set is not None else [game.init_state()]):
+                if s0 not in state2node:
+                    add_node(s0)
+
+        while queue:
+            uid = queue.popleft()
+            state = graph["state"][uid]
+            for act, next_state in self._successors(state):
+                vid = state2node.get(next_state)
+                if vid is None:
+                    vid = add_node(next_state)
+                add_edge(uid, vid, act)
+
+            expanded += 1
+            if expanded % CHECK_EVERY == 0:
+                if self._progress is not None:
+                    self._report(expanded, len(state2node), len(queue), graph.number_of_edges(), force=False)
+                if self._budget is not None:
+                    self._check_budget(expanded, len(state2node), len(queue), graph.number_of_edges(),
+                                       save=lambda fpath: self._save_checkpoint(fpath, graph, queue, expanded))
+
+        if self._progress is not None:
+            self._report(expanded, len(state2node), 0, graph.number_of_edges(), force=True)
+
+        self._add_properties(graph)
+        return graph
+
+    def write_store(self, path, init_set=None, overwrite=False, buffer_size=2 ** 16, compact=True):
+        """
+        Explores the belief game like `graphify`, but streams nodes and edges into a graph store (see `mmgraph`)
+        instead of building a ggsolver graph, and returns a `mmgraph.GraphView` of it.
+
+        Nodes are numbered in discovery order and expanded in the same order, so each node is written with its
+        out-edges when it is expanded. Only the visited index {state: node} and the frontier stay in memory.
+        The store holds the "turn" and "final" node properties; other properties of the game are not evaluated.
+        Under a memory budget, exploration stops as with policy "abort" (there is no checkpoint to resume from).
+
+        :param path: (str) Directory of the store.
+        :param buffer_size: (int) Values buffered per store array (see `mmgraph.GraphStoreWriter`).
+        :param compact: (bool) Key the visited index and the frontier by `beliefstore.StateKeys` bytes instead of
+            state tuples.
+        """
+        import beliefstore
+        import mmgraph
+
+        game = self._game
+        if compact:
+            state_keys = beliefstore.StateKeys()
+            key, unkey = state_keys.key, state_keys.state
+        else:
+            key = unkey = lambda state: state
+        state2node = dict()
+        queue = collections.deque()
+        self._start = time.perf_counter()
+        self._last = (self._start, 0, 0)
+        self._belief_total = 0
+
+        def add_node(state, state_key):
+            uid = state2node[state_key] = len(state2node)
+            queue.append(state_key)
+            self._belief_total += len(state[2])
+            return uid
+
+        for s0 in (init_set if init_set is not None else [game.init_state()]):
+            if key(s0) not in state2node:
+                add_node(s0, key(s0))
+
+        expanded = 0
+        with mmgraph.GraphStoreWriter(path, belief=True, overwrite=overwrite, buffer_size=buffer_size) as writer:
+            while queue:
+                state = unkey(queue.popleft())
+                edges = []
+                for act, next_state in self._successors(state):
+                    next_key = key(next_state)
+                    vid = state2node.get(next_key)
+                    if vid is None:
+                        vid = add_node(next_state, next_key)
+                    edges.append((vid, act))
+                writer.add_node(state, game.turn(state), game.final(state), edges)
+
+                expanded += 1
+                if expanded % CHECK_EVERY == 0:
+                    if self._progress is not None:
+                        self._report(expanded, len(state2node), len(queue), writer.number_of_edges(), force=False)
+                    if self._budget is not None:
+                        self._check_budget(expanded, len(state2node), len(queue), writer.number_of_edges())
+
+            if self._progress is not None:
+                self._report(expanded, len(state2node), 0, writer.number_of_edges(), force=True)
+            writer.close(init_node=state2node.get(key(game.init_state())))
+
+        return mmgraph.GraphView(path)
+
+    def _successors(self, state):
+        """ Returns [(act, next state)] of `state`. Subclasses may reuse transitions of a known graph. """
+        game = self._game
+        successors = []
+        for act in game.enabled_acts(state):
+            next_state = game.delta(state, act)
+            if next_state is not None:
+                successors.append((act, next_state))
+        return successors
+
+    def _check_budget(self, expanded, visited, frontier, edges, save=None):
+        """ :param save: Callable `save(fpath)` writing a checkpoint, or None if exploration cannot be resumed. """
+        rss = self._budget.exceeded()
+        if rss is None:
+            return
+
+        partial = {"expanded": expanded, "visited": visited, "frontier": frontier, "edges": edges}
+        checkpoint = None
+        if self._budget.policy == "checkpoint" and save is not None:
+            checkpoint = self._budget.checkpoint
+            save(checkpoint)
+        raise mem_budget.MemoryBudgetExceeded(
+            f"Memory budget of {self._budget.limit / 2 ** 20:.0f} MB exceeded during exploration "
+            f"after {expanded} expansions: RSS {rss / 2 ** 20:.0f} MB.",
+            rss=rss, checkpoint=checkpoint, partial=partial
+        )
+
+    @staticmethod
+    def _save_checkpoint(fpath, graph, queue, expanded):
+        # Pickle records one by one to avoid building another copy of the graph in memory.
+        with open(fpath, "wb") as file:
+            pickle.dump((graph.number_of_nodes(), graph.number_of_edges(), len(queue), expanded), file)
+            for uid in graph.nodes():
+                pickle.dump(graph["state"][uid], file)
+            for uid, vid, key in graph.edges():
+                pickle.dump((uid, vid, graph["input"][uid, vid, key]), file)
+            pickle.dump(list(queue), file)
+        logger.warning(f"Saved exploration checkpoint to {fpath}.")
+
+    @staticmethod
+    def _load_checkpoint(fpath, add_node, add_edge, queue):
+        with open(fpath, "rb") as file:
+            num_nodes, num_edges, _, expanded = pickle.load(file)
+            for _ in range(num_nodes):
+                add_node(pickle.load(file))
+            for _ in range(num_edges):
+                add_edge(*pickle.load(file))
+            queue.clear()
+            queue.extend(pickle.load(file))
+        return expanded
+
+    def _report(self, expanded, visited, frontier, edges, force):
+        now = time.perf_counter()
+        last_time, last_expanded, last_visited = self._last
+        if not force and now - last_time < self._interval:
+            return
+
+        rate = (expanded - last_expanded) / max(now - last_time, 1e-9)
+        growth = (visited - last_visited) / max(expanded - last_expanded, 1)
+        eta = frontier / (1 - growth) / rate if growth < 1 and rate > 0 else None
+        self._last = (now, expanded, visited)
+        self._progress({
+            "elapsed": now - self._start,
+            "expanded": expanded,
+            "visited": visited,
+            "frontier": frontier,
+            "edges": edges,
+            "states_per_sec": rate,
+            "avg_states_per_sec": expanded / max(now - self._start, 1e-9),
+            "avg_belief_size": self._belief_total / max(visited, 1),
+            "rss": metrics.current_rss(),
+            "eta": 0.0 if frontier == 0 else eta,
+        })
+
+    def _add_properties(self, graph):
+        # Evaluate registered node, edge and graph properties of the game, as ggsolver's graphify does.
+        import ggsolver.graph as ggraph
+
+        game = self._game
+        for name in game.NODE_PROPERTY:
+            if name == "state":
+                continue
+            graph[name] = ggraph.NodePropertyMap(graph)
+            func = getattr(game, name)
+            for uid in graph.nodes():
+                graph[name][uid] = func(graph["state"][uid])
+
+        for name in game.EDGE_PROPERTY:
+            if name == "input":
+                continue
+            graph[name] = ggraph.EdgePropertyMap(graph)
+            func = getattr(game, name)
+            for uid, vid, key in graph.edges():
+                graph[name][uid, vid, key] = func(graph["state"][uid], graph["input"][uid, vid, key],
+                                                  graph["state"][vid])
+
+        for name in game.GRAPH_PROPERTY:
+            graph[name] = getattr(game, name)()
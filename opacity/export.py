@@ -0,0 +1,189 @@
+"""
+Streaming exporters of P1's winning strategy for the VB front-end.
+
+Both exporters read a `mmgraph.GraphView` with an attached solution and walk its nodes once, in chunks,
+so that memory use does not grow with the size of the graph.
+
+JSON output has the same layout as the historical `conv2vb` output:
+    {"state": {uid: state}, "transitions": {uid: {act: vid}}, "win": [uid], "init_state": uid}
+
+Binary output (`.vbin`) is a compact sibling. See `write_vbin` for the layout.
+"""
+import json
+import logging
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 16
+
+VBIN_MAGIC = b"VBIN"
+VBIN_VERSION = 1
+# magic, version, num_nodes, num_win_edges, init_node, state_len, offsets of sections
+# (node_winner, state_ptr, state_data, trans_ptr, trans, symbols), symbols length.
+VBIN_HEADER = struct.Struct("<4sIQQqQ6QQ")
+
+
+def _chunks(view, chunk_size):
+    num_nodes = view.number_of_nodes()
+    for start in range(0, num_nodes, chunk_size):
+        yield start, min(start + chunk_size, num_nodes)
+
+
+def _edge_mask(view, e_start, e_stop):
+    # Unpack only the part of the bitmap covering edges e_start..e_stop-1.
+    bits = np.unpackbits(np.asarray(view.solution_arrays()[1][e_start >> 3:(e_stop + 7) >> 3]))
+    offset = e_start & 7
+    return bits[offset:offset + e_stop - e_start].astype(bool)
+
+
+def iter_winning_transitions(view, chunk_size=CHUNK_SIZE):
+    """
+    Yields (uid, [(act_id, vid), ...]) for every node with at least one winning edge, in node order.
+    """
+    succ_ptr, succ_dst, edge_act = view.succ_ptr, view.succ_dst, view.edge_act
+    for start, stop in _chunks(view, chunk_size):
+        e_start, e_stop = int(succ_ptr[start]), int(succ_ptr[stop])
+        mask = _edge_mask(view, e_start, e_stop)
+        ptr = np.asarray(succ_ptr[start:stop + 1]) - e_start
+        acts, dsts = np.asarray(edge_act[e_start:e_stop]), np.asarray(succ_dst[e_start:e_stop])
+        for idx in range(stop - start):
+            lo, hi = ptr[idx], ptr[idx + 1]
+            sel = np.flatnonzero(mask[lo:hi]) + lo
+            if len(sel) > 0:
+                yield start + idx, list(zip(acts[sel].tolist(), dsts[sel].tolist()))
+
+
+def write_json(view, fpath, chunk_size=CHUNK_SIZE):
+    """
+    Streams P1's winning strategy to a JSON file.
+
+    States are written directly to `fpath` while transitions are spooled to a temporary file,
+    which is appended once all nodes have been visited.
+    """
+    actions = view.codec.actions
+    with open(fpath, "w") as file, tempfile.TemporaryFile("w+") as spool:
+        file.write('{"state": {')
+        for start, stop in _chunks(view, chunk_size):
+            file.write(",".join(f'"{uid}": {json.dumps(view.state(uid))}' for uid in range(start, stop)))
+            if stop < view.number_of_nodes():
+                file.write(",")
+
+        sep = ""
+        for uid, trans in iter_winning_transitions(view, chunk_size):
+            # Multiple winning edges with same action keep the last one, as before.
+            entry = {actions[act]: vid for act, vid in trans}
+            spool.write(f'{sep}"{uid}": {json.dumps(entry)}')
+            sep = ","
+
+        file.write('}, "transitions": {')
+        spool.seek(0)
+        shutil.copyfileobj(spool, file)
+
+        file.write('}, "win": [')
+        file.write(",".join(str(uid) for uid in view.winning_nodes(1).tolist()))
+        file.write(f'], "init_state": {json.dumps(view.init_node())}}}')
+
+    logger.info(f"Exported winning strategy to {fpath}.")
+
+
+def write_vbin(view, fpath, chunk_size=CHUNK_SIZE):
+    """
+    Streams P1's winning strategy to a binary `.vbin` file.
+
+    Layout after the header (all little-endian):
+        - node_winner (int8, n)
+        - state_ptr (int64, n+1), state_data (int32, state_len): encoded states, see `mmgraph.StateCodec`.
+        - trans_ptr (int64, n+1): offsets into trans.
+        - trans (int32 pairs (act_id, vid), w): winning transitions.
+        - symbols (utf-8 JSON): {"arena_states", "aut_states", "actions"}.
+    """
+    num_nodes, state_len = view.number_of_nodes(), len(view.state_data)
+    off_winner = VBIN_HEADER.size
+    off_state_ptr = off_winner + num_nodes
+    off_state_data = off_state_ptr + 8 * (num_nodes + 1)
+    off_trans_ptr = off_state_data + 4 * state_len
+    off_trans = off_trans_ptr + 8 * (num_nodes + 1)
+
+    with open(fpath, "wb") as file:
+        # Fixed-size sections are copied chunk by chunk from the memory-mapped store.
+        file.seek(off_winner)
+        for start, stop in _chunks(view, chunk_size):
+            file.write(np.asarray(view.solution_arrays()[0][start:stop], dtype=np.int8).tobytes())
+        for start, stop in _chunks(view, chunk_size):
+            file.write(np.asarray(view.state_ptr[start:stop], dtype=np.int64).tobytes())
+        file.write(np.asarray(view.state_ptr[num_nodes:], dtype=np.int64).tobytes())
+        for start in range(0, state_len, chunk_size):
+            file.write(np.asarray(view.state_data[start:start + chunk_size], dtype=np.int32).tobytes())
+
+        # Winning transitions are appended at the end; trans_ptr is buffered and flushed one chunk at a time.
+        num_win = 0
+        trans_ptr = np.zeros(chunk_size, dtype=np.int64)
+
+        def set_ptr(uid_):
+            trans_ptr[uid_ % chunk_size] = num_win
+            if uid_ % chunk_size == chunk_size - 1 or uid_ == num_nodes:
+                first = uid_ - uid_ % chunk_size
+                file.seek(off_trans_ptr + 8 * first)
+                file.write(trans_ptr[:uid_ - first + 1].tobytes())
+
+        next_uid = 0
+        for uid, trans in iter_winning_transitions(view, chunk_size):
+            while next_uid <= uid:
+                set_ptr(next_uid)
+                next_uid += 1
+            file.seek(off_trans + 8 * num_win)
+            file.write(np.asarray(trans, dtype=np.int32).tobytes())
+            num_win += len(trans)
+        while next_uid <= num_nodes:
+            set_ptr(next_uid)
+            next_uid += 1
+
+        # Symbols and header
+        off_symbols = off_trans + 8 * num_win
+        symbols = json.dumps(view.codec.symbols()).encode("utf-8")
+        file.seek(off_symbols)
+        file.write(symbols)
+        init_node = view.init_node()
+        file.seek(0)
+        file.write(VBIN_HEADER.pack(
+            VBIN_MAGIC, VBIN_VERSION, num_nodes, num_win, -1 if init_node is None else init_node, state_len,
+            off_winner, off_state_ptr, off_state_data, off_trans_ptr, off_trans, off_symbols, len(symbols)
+        ))
+
+    logger.info(f"Exported winning strategy to {fpath}.")
+
+
+def read_vbin(fpath):
+    """
+    Memory-maps a `.vbin` file.
+
+    :return: (dict) Arrays "node_winner", "state_ptr", "state_data", "trans_ptr", "trans" (w x 2),
+        the decoded "symbols" and "init_node".
+    """
+    with open(fpath, "rb") as file:
+        (magic, version, num_nodes, num_win, init_node, state_len, off_winner, off_state_ptr, off_state_data,
+         off_trans_ptr, off_trans, off_symbols, len_symbols) = VBIN_HEADER.unpack(file.read(VBIN_HEADER.size))
+        if magic != VBIN_MAGIC or version != VBIN_VERSION:
+            raise ValueError(f"{fpath} is not a version {VBIN_VERSION} VB strategy file.")
+        file.seek(off_symbols)
+        symbols = json.loads(file.read(len_symbols).decode("utf-8"))
+
+    def _memmap(dtype, offset, shape):
+        if np.prod(shape) == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(fpath, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    return {
+        "node_winner": _memmap(np.int8, off_winner, (num_nodes,)),
+        "state_ptr": _memmap(np.int64, off_state_ptr, (num_nodes + 1,)),
+        "state_data": _memmap(np.int32, off_state_data, (state_len,)),
+        "trans_ptr": _memmap(np.int64, off_trans_ptr, (num_nodes + 1,)),
+        "trans": _memmap(np.int32, off_trans, (num_win, 2)),
+        "symbols": symbols,
+        "init_node": None if init_node < 0 else init_node,
+    }
@@ -0,0 +1,196 @@
+"""
+Vectorized table generator for the two-robot gridworlds (`ex14_5x5_UAV_UGV.RndGridworld` and the archived
+gridworld and wumpus examples).
+
+`grid_tables` computes transition, enabled-action, turn and label tables for all states at once with NumPy,
+following `RndGridworld`:
+    - State (p1r, p1c, p2r, p2c, turn) with P1 anywhere on the grid and P2 on its walkable cells.
+    - Collision (both robots on one cell) is a self-loop.
+    - P1 plays N, E, S, W only (as in `RndGridworld.enabled_acts`); moves off the grid are disabled, moves into
+      obstacles bounce.
+    - P2 moves are given by the P2 action map, bounce off obstacles and off cells outside the walkable region.
+    - Turn alternates between P1 and P2.
+
+`tabulate(game)` builds a `models.TabularArena` of a `RndGridworld`-like game from these tables.
+If the game observes through a `sensors.Sensor` (attribute `_sensor`), observations are looked up in the sensor's
+table at P2's and P1's cells after the move. Otherwise, `attacker_observation` is evaluated per transition.
+
+Moves are given as {action: (dr, dc)}. They default to ggsolver's gridworld moves, which is the only use of ggsolver
+here: with explicit moves, `grid_tables` runs on NumPy alone.
+"""
+import logging
+import time
+
+import numpy as np
+
+import sensors
+
+logger = logging.getLogger(__name__)
+
+# Unit moves of N, E, S, W, as in ggsolver.gridworld.util.
+UNIT_MOVES = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def default_moves(actions=None):
+    """
+    Returns {action: (dr, dc)} from ggsolver's gridworld moves.
+
+    :param actions: list of actions. Defaults to N, E, S, W.
+    """
+    import ggsolver.gridworld.util as gw_util
+
+    if actions is None:
+        actions = [gw_util.GW_ACT_N, gw_util.GW_ACT_E, gw_util.GW_ACT_S, gw_util.GW_ACT_W]
+    return {act: tuple(gw_util.move((0, 0), act)) for act in actions}
+
+
+def p1_actions(moves=None):
+    """
+    Returns P1's moves in the order of `RndGridworld.enabled_acts`: N, E, S, W.
+
+    :param moves: dict {action: (dr, dc)}. Defaults to `default_moves()`.
+    """
+    moves = default_moves() if moves is None else moves
+    return [act for step in UNIT_MOVES for act, move in moves.items() if tuple(move) == step]
+
+
+def grid_tables(dim, obstacles, p2_walkable, p2_acts, goal_cells, actions=None, moves=None):
+    """
+    :param dim: (rows, cols)
+    :param obstacles: list of obstacle cells.
+    :param p2_walkable: list of cells P2 may occupy. States are ordered as in `RndGridworld.states()`.
+    :param p2_acts: dict {cell: [actions]} of P2's enabled actions.
+    :param goal_cells: list of goal cells. Cell `goal_cells[i]` is labeled with "g{i}".
+    :param actions: list of actions (columns of the tables). Defaults to N, E, S, W. P1 plays those of N, E, S, W
+        that are listed and whose move stays on the grid; other actions are P2's only.
+    :param moves: dict {action: (dr, dc)} of every action. Defaults to `default_moves(actions)`.
+    :return: (dict) Tables in the format accepted by `models.TabularArena`, except observations.
+        "p1", "p2" and "turn" give the state components as arrays.
+    """
+    moves = default_moves(actions) if moves is None else moves
+    rows, cols = dim
+    actions = p1_actions(moves) if actions is None else list(actions)
+    act2id = {act: aid for aid, act in enumerate(actions)}
+    num_walk, num_cells = len(p2_walkable), rows * cols
+
+    # State components. State id = (p1 cell * num_walk + p2 walkable index) * 2 + turn - 1.
+    p1_cell, p2_idx, turn = (arr.ravel() for arr in np.meshgrid(
+        np.arange(num_cells), np.arange(num_walk), np.arange(2), indexing="ij"))
+    p1r, p1c = np.divmod(p1_cell, cols)
+    walk = np.array(p2_walkable, dtype=np.int64).reshape(num_walk, 2)
+    p2r, p2c = walk[p2_idx, 0], walk[p2_idx, 1]
+    turn = turn + 1
+    sids = np.arange(len(turn))
+
+    # Cell maps, padded by one cell so that moves off the grid can be looked up.
+    blocked = np.ones((rows + 2, cols + 2), dtype=bool)
+    blocked[1:-1, 1:-1] = False
+    for r, c in obstacles:
+        if 0 <= r < rows and 0 <= c < cols:
+            blocked[r + 1, c + 1] = True
+    walk_idx = np.full((rows + 2, cols + 2), -1, dtype=np.int64)
+    walk_idx[walk[:, 0] + 1, walk[:, 1] + 1] = np.arange(num_walk)
+    walk_idx[blocked] = -1
+
+    collision = (p1r == p2r) & (p1c == p2c)
+    delta_table = np.full((len(sids), len(actions)), -1, dtype=np.int32)
+    for aid, act in enumerate(actions):
+        dr, dc = moves[act]
+
+        # P1 moves
+        nr, nc = p1r + dr, p1c + dc
+        stay = blocked[nr + 1, nc + 1]
+        nr, nc = np.where(stay, p1r, nr), np.where(stay, p1c, nc)
+        p1_next = ((nr * cols + nc) * num_walk + p2_idx) * 2 + 1
+
+        # P2 moves
+        widx = walk_idx[p2r + dr + 1, p2c + dc + 1]
+        p2_next = (p1_cell * num_walk + np.where(widx < 0, p2_idx, widx)) * 2
+
+        next_sid = np.where(turn == 1, p1_next, p2_next)
+        delta_table[:, aid] = np.where(collision, sids, next_sid)
+
+    # Enabled actions: P1's moves N, E, S, W that stay on the grid (as in RndGridworld.enabled_acts).
+    p1_acts = [act for act in p1_actions(moves) if act in act2id]
+    p1_enabled = np.empty((len(sids), len(p1_acts)), dtype=bool)
+    for idx, act in enumerate(p1_acts):
+        dr, dc = moves[act]
+        p1_enabled[:, idx] = (0 <= p1r + dr) & (p1r + dr < rows) & (0 <= p1c + dc) & (p1c + dc < cols)
+    p1_lists = {key: [act for act, on in zip(p1_acts, key) if on]
+                for key in set(map(tuple, p1_enabled.tolist()))}
+    p2_lists = [list(p2_acts[cell]) for cell in map(tuple, walk.tolist())]
+    enabled = [p1_lists[key] if t == 1 else p2_lists[w]
+               for key, t, w in zip(map(tuple, p1_enabled.tolist()), turn.tolist(), p2_idx.tolist())]
+    enabled_table = np.zeros_like(delta_table, dtype=bool)
+    for idx, act in enumerate(p1_acts):
+        enabled_table[turn == 1, act2id[act]] = p1_enabled[turn == 1, idx]
+    for w, acts in enumerate(p2_lists):
+        enabled_table[np.ix_((turn == 2) & (p2_idx == w), [act2id[act] for act in acts])] = True
+    delta_table[~enabled_table] = -1
+
+    # Labels: first goal at P1's cell.
+    labels = [[]] + [[f"g{idx}"] for idx in range(len(goal_cells))]
+    goal_map = np.zeros(num_cells, dtype=np.int32)
+    for idx, (r, c) in reversed(list(enumerate(goal_cells))):
+        goal_map[r * cols + c] = idx + 1
+
+    return {
+        "states": list(zip(p1r.tolist(), p1c.tolist(), p2r.tolist(), p2c.tolist(), turn.tolist())),
+        "enabled": enabled,
+        "delta_table": delta_table,
+        "turn_table": turn.astype(np.int8),
+        "labels": labels,
+        "label_table": goal_map[p1_cell],
+        "p1": np.stack([p1r, p1c], axis=1),
+        "p2": np.stack([p2r, p2c], axis=1),
+        "turn": turn,
+    }
+
+
+def observation_table(game, tables):
+    """ Evaluates `game.attacker_observation` on every transition of the tables. """
+    states, actions = tables["states"], list(game.actions())
+    delta_table = tables["delta_table"]
+    obs_table = np.full(delta_table.shape, -1, dtype=np.int32)
+    observations, obs2id = [], dict()
+    for sid, aid in zip(*np.nonzero(delta_table >= 0)):
+        obs = game.attacker_observation(states[sid], actions[aid], states[delta_table[sid, aid]])
+        if obs not in obs2id:
+            obs2id[obs] = len(observations)
+            observations.append(obs)
+        obs_table[sid, aid] = obs2id[obs]
+    return obs_table, observations
+
+
+def sensor_observation_table(sensor, tables):
+    """ Looks up the observation of every transition at (P2's next cell, P1's next cell). """
+    delta_table = tables["delta_table"]
+    cols = sensor.dim[1]
+    p1_cell = tables["p1"][:, 0] * cols + tables["p1"][:, 1]
+    p2_cell = tables["p2"][:, 0] * cols + tables["p2"][:, 1]
+    next_sid = np.where(delta_table >= 0, delta_table, 0)
+    # Only the rows of P2's cells are built.
+    sensor_cells, p2_row = np.unique(p2_cell, return_inverse=True)
+    obs_table = sensor.obs_ids(sensor_cells)[p2_row[next_sid], p1_cell[next_sid]]
+    return np.where(delta_table >= 0, obs_table, -1).astype(np.int32), sensor.observations
+
+
+def tabulate(game, moves=None):
+    """
+    Builds a `models.TabularArena` of a `RndGridworld`-like game (attributes `_dim`, `_obs`, `_p2_walkable`,
+    `_p2_acts`, `_goal_cells`).
+
+    :param moves: dict {action: (dr, dc)}. Defaults to `default_moves(game.actions())`.
+    """
+    import models as opac_models
+
+    start = time.perf_counter()
+    tables = grid_tables(game._dim, game._obs, game._p2_walkable, game._p2_acts, game._goal_cells,
+                         actions=game.actions(), moves=moves)
+    sensor = getattr(game, "_sensor", None)
+    if isinstance(sensor, sensors.Sensor):
+        tables["obs_table"], tables["observations"] = sensor_observation_table(sensor, tables)
+    else:
+        tables["obs_table"], tables["observations"] = observation_table(game, tables)
+    logger.info(f"Generated grid tables of {len(tables['states'])} states in {time.perf_counter() - start:.3f} seconds.")
+    return opac_models.TabularArena(game, tables=tables)
@@ -0,0 +1,143 @@
+"""
+Structured metrics of experiment runs.
+
+`RunMetrics` records, per phase, wall time, CPU time, the change of resident set size over the phase
+(`rss_delta`), the process peak RSS so far (`max_rss_so_far`, ru_maxrss is not resettable per phase) and,
+optionally, the tracemalloc peak of the phase.
+Phases entered more than once accumulate. The record is written as JSON and can be appended to a CSV table
+for aggregation across runs.
+"""
+import contextlib
+import csv
+import fcntl
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+PHASES = ["translate", "base_graphify", "belief_graphify", "solve_p1", "solve_p2", "save"]
+
+
+def current_rss():
+    """ Returns resident set size of this process in bytes (0 if unavailable). """
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss():
+    """ Returns peak resident set size of this process in bytes. """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def belief_size_stats(sizes):
+    sizes = sorted(sizes)
+    if len(sizes) == 0:
+        return dict()
+    return {
+        "min": sizes[0],
+        "max": sizes[-1],
+        "mean": statistics.fmean(sizes),
+        "p50": sizes[len(sizes) // 2],
+        "p90": sizes[min(int(0.9 * len(sizes)), len(sizes) - 1)],
+    }
+
+
+def flatten(record):
+    """ Flattens a metrics record: nested dicts become "key.sub" columns, phases become "phase.stat" columns. """
+    row = {key: value for key, value in record.items() if not isinstance(value, dict)}
+    for key, value in record.items():
+        if isinstance(value, dict) and key != "phases":
+            row.update({f"{key}.{sub}": sub_value for sub, sub_value in value.items()})
+    phases = record.get("phases", dict())
+    for phase in PHASES + sorted(set(phases) - set(PHASES)):
+        for stat, value in phases.get(phase, dict()).items():
+            row[f"{phase}.{stat}"] = value
+    return row
+
+
+class RunMetrics:
+    def __init__(self, name, trace_memory=False):
+        """
+        :param name: (str) Identifier of the experiment, e.g. config filename.
+        :param trace_memory: (bool) Track Python allocation peaks with tracemalloc. Slows down allocation by a
+            large factor; meant for capacity-planning runs.
+        """
+        self.record = {
+            "name": name,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "status": "running",
+            "phases": dict(),
+        }
+        self._trace_memory = trace_memory
+        self._start = time.perf_counter()
+        # Only stop tracing in `finish` if it was started here.
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stats = self.record["phases"].setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        wall, cpu, rss = time.perf_counter(), time.process_time(), current_rss()
+        try:
+            yield stats
+        finally:
+            stats["wall"] += time.perf_counter() - wall
+            stats["cpu"] += time.process_time() - cpu
+            stats["calls"] += 1
+            stats["rss_delta"] = stats.get("rss_delta", 0) + current_rss() - rss
+            stats["max_rss_so_far"] = peak_rss()
+            if self._trace_memory:
+                stats["tracemalloc_peak"] = max(stats.get("tracemalloc_peak", 0), tracemalloc.get_traced_memory()[1])
+
+    def set(self, **kwargs):
+        self.record.update(kwargs)
+
+    def finish(self, status="done"):
+        self.record["status"] = status
+        self.record["wall"] = time.perf_counter() - self._start
+        self.record["peak_rss"] = peak_rss()
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._started_tracing = False
+        return self.record
+
+    def flat(self):
+        """ Flattens the record into a single-level dict for CSV output. """
+        return flatten(self.record)
+
+    def save_json(self, fpath):
+        with open(fpath, "w") as file:
+            json.dump(self.record, file, indent=2, default=str)
+
+    def append_csv(self, fpath):
+        """
+        Appends the record to a CSV table shared by many runs (file-locked).
+        If the record has columns missing from the header, the table is rewritten with the extended header.
+        """
+        row = self.flat()
+        with open(fpath, "a+", newline="") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            reader = csv.DictReader(file)
+            fields = list(reader.fieldnames or [])
+            missing = [key for key in row if key not in fields]
+            if fields and not missing:
+                csv.DictWriter(file, fieldnames=fields).writerow(row)
+                return
+
+            rows = list(reader)
+            file.seek(0)
+            file.truncate()
+            writer = csv.DictWriter(file, fieldnames=fields + missing)
+            writer.writeheader()
+            writer.writerows(rows + [row])
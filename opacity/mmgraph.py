@@ -0,0 +1,367 @@
+"""
+Memory-mapped, read-only access to graphified (belief) games.
+
+A graph store is a directory holding flat little-endian arrays plus `meta.json` and `symbols.pkl`:
+    - succ_ptr.bin (int64, n+1): CSR offsets of out-edges of each node.
+    - succ_dst.bin (int32, m): destination node of each edge.
+    - edge_act.bin (int32, m): action id of each edge (index into symbols["actions"]).
+    - turn.bin (int8, n), final.bin (uint8, n): node properties.
+    - state_ptr.bin (int64, n+1), state_data.bin (int32): node states encoded by `StateCodec`.
+    - state_index.bin: fingerprint index of node states (see `stateindex`), used by `GraphView.state2node`.
+
+Solutions are kept in `.wsol` files (see `solution`) and attached to a view with `GraphView.attach_solution`.
+
+Arrays are opened with `numpy.memmap` on first access, so opening a store costs only the `meta.json` read.
+Node states are decoded on demand.
+
+Stores are written by `GraphStoreWriter`, either from a ggsolver graph (`write_graph_store`) or while exploring
+(`explorer.BeliefExplorer.write_store`).
+"""
+import json
+import logging
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+import solution as sol
+import stateindex
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+ARRAYS = {
+    "succ_ptr": np.int64,
+    "succ_dst": np.int32,
+    "edge_act": np.int32,
+    "turn": np.int8,
+    "final": np.uint8,
+    "state_ptr": np.int64,
+    "state_data": np.int32,
+}
+
+
+class StateCodec:
+    """
+    Interns arena states, automaton states and actions so that node states can be stored as integer sequences.
+
+    A belief state (s, q, ((s1, q1), ...)) is encoded as [s, q, s1, q1, ...].
+    A plain arena state s (e.g. base graph) is encoded as [s].
+    """
+    def __init__(self, belief=True, arena_states=None, aut_states=None, actions=None):
+        self.belief = belief
+        self.arena_states = list(arena_states) if arena_states is not None else list()
+        self.aut_states = list(aut_states) if aut_states is not None else list()
+        self.actions = list(actions) if actions is not None else list()
+        self._arena_ids = {st: idx for idx, st in enumerate(self.arena_states)}
+        self._aut_ids = {q: idx for idx, q in enumerate(self.aut_states)}
+        self._act_ids = {act: idx for idx, act in enumerate(self.actions)}
+
+    @staticmethod
+    def _intern(table, ids, value, intern=True):
+        uid = ids.get(value)
+        if uid is None:
+            if not intern:
+                raise KeyError(value)
+            uid = ids[value] = len(table)
+            table.append(value)
+        return uid
+
+    def arena_id(self, state, intern=True):
+        return self._intern(self.arena_states, self._arena_ids, state, intern)
+
+    def aut_id(self, q, intern=True):
+        return self._intern(self.aut_states, self._aut_ids, q, intern)
+
+    def act_id(self, act):
+        return self._intern(self.actions, self._act_ids, act)
+
+    def encode(self, state, intern=True):
+        """ :param intern: (bool) Intern unknown symbols. If False, unknown symbols raise KeyError. """
+        if not self.belief:
+            return [self.arena_id(state, intern)]
+
+        s, q, b = state
+        seq = [self.arena_id(s, intern), self.aut_id(q, intern)]
+        for s_b, q_b in b:
+            seq.append(self.arena_id(s_b, intern))
+            seq.append(self.aut_id(q_b, intern))
+        return seq
+
+    def decode(self, seq):
+        if not self.belief:
+            return self.arena_states[seq[0]]
+
+        arena, aut = self.arena_states, self.aut_states
+        b = tuple((arena[seq[i]], aut[seq[i + 1]]) for i in range(2, len(seq), 2))
+        return arena[seq[0]], aut[seq[1]], b
+
+    def symbols(self):
+        return {"arena_states": self.arena_states, "aut_states": self.aut_states, "actions": self.actions}
+
+
+def _is_belief_state(state):
+    return isinstance(state, tuple) and len(state) == 3 and isinstance(state[2], tuple)
+
+
+class GraphStoreWriter:
+    """
+    Writes a graph store incrementally, node by node in id order, with bounded buffers.
+
+    Nodes must be added in the order of their ids, each with all its out-edges (destinations may be nodes that are
+    added later), as in a breadth-first exploration where nodes are numbered in discovery order.
+    `meta.json` is written by `close`, so a store that was not closed (e.g. after an error) cannot be opened.
+    """
+    def __init__(self, path, belief=True, overwrite=False, buffer_size=2 ** 16):
+        """
+        :param path: (str) Directory of the store.
+        :param belief: (bool) Whether node states are belief states (see `StateCodec`).
+        :param overwrite: (bool) Replace an existing store.
+        :param buffer_size: (int) Number of values buffered per array before writing to disk.
+        """
+        if os.path.exists(path):
+            if not overwrite:
+                raise FileExistsError(f"Graph store {path} exists. Use overwrite=True to replace it.")
+            shutil.rmtree(path)
+        os.makedirs(path)
+
+        self._path = path
+        self._buffer_size = buffer_size
+        self.codec = StateCodec(belief=belief)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in ARRAYS}
+        self._buffers = {name: [] for name in ARRAYS}
+        self._buffers["succ_ptr"].append(0)
+        self._buffers["state_ptr"].append(0)
+        self._num_nodes = 0
+        self._num_edges = 0
+        self._state_len = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            return
+        for file in self._files.values():
+            file.close()
+
+    def number_of_nodes(self):
+        return self._num_nodes
+
+    def number_of_edges(self):
+        return self._num_edges
+
+    def add_node(self, state, turn, final, edges):
+        """
+        Appends the next node (id `number_of_nodes()`) and its out-edges.
+
+        :param edges: list of (vid, act) of out-edges, in order.
+        """
+        buffers = self._buffers
+        for vid, act in edges:
+            buffers["succ_dst"].append(vid)
+            buffers["edge_act"].append(self.codec.act_id(act))
+        self._num_edges += len(edges)
+        buffers["succ_ptr"].append(self._num_edges)
+
+        buffers["turn"].append(turn)
+        buffers["final"].append(bool(final))
+
+        seq = self.codec.encode(state)
+        buffers["state_data"].extend(seq)
+        self._state_len += len(seq)
+        buffers["state_ptr"].append(self._state_len)
+
+        self._num_nodes += 1
+        if len(buffers["state_data"]) >= self._buffer_size or len(buffers["succ_dst"]) >= self._buffer_size:
+            self.flush()
+        return self._num_nodes - 1
+
+    def flush(self):
+        for name, values in self._buffers.items():
+            if values:
+                np.asarray(values, dtype=ARRAYS[name]).tofile(self._files[name])
+                values.clear()
+
+    def close(self, init_node=None):
+        """ Flushes buffers, writes the symbols and meta data, and returns the path of the store. """
+        self.flush()
+        for file in self._files.values():
+            file.close()
+
+        with open(os.path.join(self._path, "symbols.pkl"), "wb") as file:
+            pickle.dump(self.codec.symbols(), file)
+
+        meta = {
+            "version": STORE_VERSION,
+            "num_nodes": self._num_nodes,
+            "num_edges": self._num_edges,
+            "state_len": self._state_len,
+            "belief": self.codec.belief,
+            "init_node": init_node,
+        }
+        with open(os.path.join(self._path, "meta.json"), "w") as file:
+            json.dump(meta, file, indent=2)
+
+        # Index node states for GraphView.state2node
+        view = GraphView(self._path)
+        stateindex.build(view.state_ptr, view.state_data, os.path.join(self._path, stateindex.FILENAME))
+
+        logger.info(f"Wrote graph store {self._path} with {self._num_nodes} nodes and {self._num_edges} edges.")
+        return self._path
+
+
+def write_graph_store(graph, path, overwrite=False):
+    """
+    Writes a ggsolver graph into a graph store directory.
+
+    :param graph: (ggsolver.graph.Graph) Graph with node properties "state", "turn", "final" and edge property "input".
+        Node ids are expected to be 0..n-1.
+    :param path: (str) Directory of the store.
+    :param overwrite: (bool) Replace an existing store.
+    """
+    num_nodes = graph.number_of_nodes()
+    belief = num_nodes > 0 and _is_belief_state(graph["state"][0])
+    with GraphStoreWriter(path, belief=belief, overwrite=overwrite) as writer:
+        for uid in range(num_nodes):
+            edges = [(vid, graph["input"][uid, vid, key]) for _, vid, key in graph.out_edges(uid)]
+            writer.add_node(graph["state"][uid], graph["turn"][uid], graph["final"][uid], edges)
+
+        init_state = graph["init_state"]
+        writer.close(init_node=None if init_state is None else _find_node(graph, init_state))
+
+
+def _find_node(graph, state):
+    for uid in graph.nodes():
+        if graph["state"][uid] == state:
+            return uid
+
+
+class GraphView:
+    """
+    Read-only view of a graph store. Arrays are memory-mapped, states and actions are decoded on demand.
+    """
+    def __init__(self, path):
+        self._path = path
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            self._meta = json.load(file)
+        if self._meta["version"] != STORE_VERSION:
+            raise ValueError(f"Unsupported graph store version {self._meta['version']} in {path}.")
+
+        self._arrays = dict()
+        self._codec = None
+        self._state_index = None
+        self._node_winner = None
+        self._edge_winner = None
+
+    def __getattr__(self, name):
+        # Lazily memory-map the store arrays on first access, e.g. `view.succ_ptr`.
+        if name not in ARRAYS:
+            raise AttributeError(name)
+        if name not in self._arrays:
+            self._arrays[name] = self._memmap(name, ARRAYS[name], self._length(name))
+        return self._arrays[name]
+
+    def _length(self, name):
+        n, m = self._meta["num_nodes"], self._meta["num_edges"]
+        return {
+            "succ_ptr": n + 1, "state_ptr": n + 1, "turn": n, "final": n,
+            "succ_dst": m, "edge_act": m, "state_data": self._meta["state_len"],
+        }[name]
+
+    def _memmap(self, name, dtype, length):
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self._path, f"{name}.bin"), dtype=dtype, mode="r", shape=(length,))
+
+    @property
+    def codec(self):
+        if self._codec is None:
+            with open(os.path.join(self._path, "symbols.pkl"), "rb") as file:
+                symbols = pickle.load(file)
+            self._codec = StateCodec(belief=self._meta["belief"], **symbols)
+        return self._codec
+
+    def path(self):
+        return self._path
+
+    def number_of_nodes(self):
+        return self._meta["num_nodes"]
+
+    def number_of_edges(self):
+        return self._meta["num_edges"]
+
+    def init_node(self):
+        return self._meta["init_node"]
+
+    def state(self, uid):
+        return self.codec.decode(self.state_data[self.state_ptr[uid]:self.state_ptr[uid + 1]].tolist())
+
+    def node_aut_states(self):
+        """ Returns array of automaton state of every node of a belief graph, without decoding beliefs. """
+        aut_ids = np.asarray(self.state_data[np.asarray(self.state_ptr[:-1]) + 1])
+        return np.asarray(self.codec.aut_states)[aut_ids]
+
+    def node_turn(self, uid):
+        return int(self.turn[uid])
+
+    def is_final(self, uid):
+        return bool(self.final[uid])
+
+    def edge_range(self, uid):
+        """ Returns (start, stop) such that edges of `uid` are the store edges start..stop-1. """
+        return int(self.succ_ptr[uid]), int(self.succ_ptr[uid + 1])
+
+    def successors(self, uid):
+        start, stop = self.edge_range(uid)
+        return self.succ_dst[start:stop].tolist()
+
+    def out_edges(self, uid):
+        """ Returns list of (edge, vid, act) for out-edges of `uid`, where edge is the store edge index. """
+        start, stop = self.edge_range(uid)
+        actions = self.codec.actions
+        return [(eid, int(self.succ_dst[eid]), actions[self.edge_act[eid]]) for eid in range(start, stop)]
+
+    def state_index(self):
+        """ Returns the fingerprint index of node states (see `stateindex`), built on first use if missing. """
+        if self._state_index is None:
+            self._state_index = stateindex.open_index(self._path, self.state_ptr, self.state_data)
+        return self._state_index
+
+    def state2node(self, state):
+        uid = self.state_index().lookup(self.codec.encode(state, intern=False))
+        if uid is None:
+            raise KeyError(state)
+        return uid
+
+    # ============================================================================================
+    # Solution access
+    # ============================================================================================
+    def attach_solution(self, fpath):
+        """ Memory-maps the winners stored in a `.wsol` file of this graph. """
+        self._node_winner, self._edge_winner = sol.read_arrays(fpath)
+        if len(self._node_winner) != self.number_of_nodes():
+            raise ValueError(f"Solution {fpath} does not match graph store {self._path}.")
+        return self
+
+    def solution_arrays(self):
+        """ Returns (node_winner, edge_bitmap) arrays of the attached solution. """
+        return self._node_winner, self._edge_winner
+
+    def node_winner(self, uid):
+        return int(self._node_winner[uid])
+
+    def winning_nodes(self, player):
+        return np.flatnonzero(self._node_winner == player)
+
+    def is_winning_edge(self, eid):
+        return sol.is_set(self._edge_winner, eid)
+
+    def winning_edges(self, uid):
+        """ Returns list of (edge, vid, act) for winning out-edges of `uid`. """
+        return [edge for edge in self.out_edges(uid) if self.is_winning_edge(edge[0])]
+
+    def winning_actions(self, uid):
+        return list({act for _, _, act in self.winning_edges(uid)})
@@ -1,16 +1,21 @@
 """
 Models implementing paper on Opacity, CDC'23.
+
+Importing this module does no work beyond defining classes: NumPy is loaded by `TabularArena` when it is used,
+and logging is configured by the entry points.
 """
-import itertools
+import array
+import collections
 import logging
+import time
+import typing
 # import loguru
 
-import ggsolver.util as util
 import ggsolver.dtptb as dtptb
-import ggsolver.logic as logic
 import ggsolver.models as models
 
-logging.basicConfig(filename="out/belief.log", level=logging.DEBUG)
+if typing.TYPE_CHECKING:
+    import ggsolver.logic as logic
 
 
 class Arena(dtptb.DTPTBGame):
@@ -25,13 +30,472 @@ class Arena(dtptb.DTPTBGame):
     def attacker_observation(self, state, act, next_state):
         raise NotImplementedError("Marked Abstract")
 
+    def dynamics_key(self):
+        """
+        Returns a hashable key of the arena's states, actions, transitions, labels and attacker observations, or
+        None. Arenas with equal keys share their tables and belief layer (see `ArenaRegistry`), so that
+        experiments on separate arena objects of the same dynamics (e.g. different initial states) warm up once.
+        Default: None, the tables and belief layer are only shared by the arena object itself.
+        """
+        return None
+
+
+class TabularArena(Arena):
+    """
+    Arena enumerated once into NumPy tables.
+    Wraps any `Arena` and serves delta, enabled_acts, turn, label and attacker_observation by table lookups.
+    Other attributes (e.g. graph properties of the example) are delegated to the wrapped arena.
+
+    When enumerated, states are numbered in the order of `game.states()`, followed by any successor outside it.
+    Actions are numbered in the order of `game.actions()`. Tables:
+        delta_table: int32 [num_states, num_actions]. Successor id, -1 if act is disabled or delta is None.
+        enabled_table: bool [num_states, num_actions].
+        turn_table: int8 [num_states].
+        label_table: int32 [num_states]. Index into `labels`.
+        obs_table: int32 [num_states, num_actions]. Index into `observations`, -1 without successor.
+    """
+    def __init__(self, game: Arena, tables=None):
+        """
+        :param game: (Arena) Arena to tabulate.
+        :param tables: (dict) Precomputed tables (e.g. from `gridgen`) with keys "states", "enabled" (list of
+            enabled actions per state), "delta_table", "obs_table", "observations", "turn_table", "labels",
+            "label_table". Actions are those of `game.actions()`. If None, the arena is enumerated.
+        """
+        import numpy as np
+
+        super(TabularArena, self).__init__()
+        start = time.perf_counter()
+        self._game = game
+        if tables is None:
+            tables = self.enumerate(game)
+
+        self.actions_list = list(game.actions())
+        self.act2id = {act: aid for aid, act in enumerate(self.actions_list)}
+        self.states_list = list(tables["states"])
+        self.state2id = {state: sid for sid, state in enumerate(self.states_list)}
+        self.observations = list(tables["observations"])
+        self.labels = list(tables["labels"])
+
+        # Tables
+        self.delta_table = np.asarray(tables["delta_table"], dtype=np.int32)
+        self.enabled_table = np.zeros(self.delta_table.shape, dtype=bool)
+        for sid, acts in enumerate(tables["enabled"]):
+            self.enabled_table[sid, [self.act2id[act] for act in acts]] = True
+        self.obs_table = np.asarray(tables["obs_table"], dtype=np.int32)
+        self.turn_table = np.asarray(tables["turn_table"], dtype=np.int8)
+        self.label_table = np.asarray(tables["label_table"], dtype=np.int32)
+
+        # Row-wise views as Python lists for scalar lookups (faster than indexing NumPy scalars).
+        self._enabled = [list(acts) for acts in tables["enabled"]]
+        self._delta_rows = self.delta_table.tolist()
+        self._obs_rows = self.obs_table.tolist()
+        self._successors = [
+            [(aid, tid, oid) for aid, (tid, oid) in enumerate(zip(delta_row, obs_row)) if tid >= 0]
+            for delta_row, obs_row in zip(self._delta_rows, self._obs_rows)
+        ]
+        self._label_ids = self.label_table.tolist()
+
+        logging.info(f"TabularArena: {len(self.states_list)} states, {len(self.actions_list)} actions, "
+                     f"{len(self.observations)} observations in {time.perf_counter() - start:.3f} seconds.")
+
+    @staticmethod
+    def enumerate(game):
+        """ Enumerates the tables of `game` by calling its methods (see `__init__` for the keys). """
+        import numpy as np
+
+        actions = list(game.actions())
+        act2id = {act: aid for aid, act in enumerate(actions)}
+        states = list(game.states())
+        state2id = {state: sid for sid, state in enumerate(states)}
+
+        # Fill transitions. Successors outside game.states() are appended to the state list.
+        delta_rows, obs_rows, enabled = [], [], []
+        observations, obs2id = [], dict()
+        sid = 0
+        while sid < len(states):
+            state = states[sid]
+            delta_row = [-1] * len(actions)
+            obs_row = [-1] * len(actions)
+            enabled.append(list(game.enabled_acts(state)))
+            for act in enabled[-1]:
+                next_state = game.delta(state, act)
+                if next_state is None:
+                    continue
+                if next_state not in state2id:
+                    state2id[next_state] = len(states)
+                    states.append(next_state)
+                obs = game.attacker_observation(state, act, next_state)
+                if obs not in obs2id:
+                    obs2id[obs] = len(observations)
+                    observations.append(obs)
+                delta_row[act2id[act]] = state2id[next_state]
+                obs_row[act2id[act]] = obs2id[obs]
+            delta_rows.append(delta_row)
+            obs_rows.append(obs_row)
+            sid += 1
+
+        # Labels
+        labels, label2id, label_ids = [], dict(), []
+        for state in states:
+            label = game.label(state)
+            key = tuple(label)
+            if key not in label2id:
+                label2id[key] = len(labels)
+                labels.append(label)
+            label_ids.append(label2id[key])
+
+        return {
+            "states": states,
+            "enabled": enabled,
+            "delta_table": np.array(delta_rows, dtype=np.int32).reshape(len(states), len(actions)),
+            "obs_table": np.array(obs_rows, dtype=np.int32).reshape(len(states), len(actions)),
+            "observations": observations,
+            "turn_table": np.array([game.turn(state) for state in states], dtype=np.int8),
+            "labels": labels,
+            "label_table": np.array(label_ids, dtype=np.int32),
+        }
+
+    def __getattr__(self, item):
+        # Only called when normal lookup fails.
+        if item == "_game":
+            raise AttributeError(item)
+        return getattr(self._game, item)
+
+    def game(self):
+        return self._game
+
+    def dynamics_key(self):
+        return self._game.dynamics_key()
+
+    def rebind(self, game: Arena):
+        """ Returns a `TabularArena` of `game` sharing the tables of this one. `game` must have the same dynamics. """
+        arena = TabularArena.__new__(TabularArena)
+        arena.__dict__.update({key: value for key, value in vars(self).items() if key != "_belief_layer"})
+        arena._game = game
+        return arena
+
+    def initialize(self, state):
+        self._game.initialize(state)
+
+    def init_state(self):
+        return self._game.init_state()
+
+    def states(self):
+        return self.states_list
+
+    def actions(self):
+        return self.actions_list
+
+    def turn(self, state):
+        return int(self.turn_table[self.state2id[state]])
+
+    def enabled_acts(self, state):
+        return self._enabled[self.state2id[state]]
+
+    def delta(self, state, act):
+        tid = self._delta_rows[self.state2id[state]][self.act2id[act]]
+        return self.states_list[tid] if tid >= 0 else None
+
+    def label(self, state):
+        return self.labels[self._label_ids[self.state2id[state]]]
+
+    def attacker_observation(self, state, act, next_state):
+        sid, aid = self.state2id[state], self.act2id[act]
+        tid = self._delta_rows[sid][aid]
+        if tid < 0 or self.states_list[tid] != next_state:
+            return self._game.attacker_observation(state, act, next_state)
+        return self.observations[self._obs_rows[sid][aid]]
+
+    # Id-based queries used by BeliefGame
+    def state_id(self, state):
+        return self.state2id[state]
+
+    def successors(self, sid):
+        """ Returns [(action id, successor id, observation id)] of enabled actions of `sid` with a successor. """
+        return self._successors[sid]
+
+    def next_id(self, sid, aid):
+        return self._delta_rows[sid][aid]
+
+    def obs_id(self, sid, aid):
+        return self._obs_rows[sid][aid]
+
+    def label_id(self, sid):
+        return self._label_ids[sid]
+
+
+def tabulate(game: Arena):
+    """
+    Returns the `TabularArena` of the arena, creating it on first use. Arenas may provide a faster generator of
+    their tables as `game.tabulate()` (e.g. `gridgen.tabulate`).
+    """
+    if isinstance(game, TabularArena):
+        return game
+    arena = vars(game).get("_tabular_arena")
+    if arena is None:
+        shared = registry.get("tabular_arena", game)
+        if shared is not None:
+            arena = shared.rebind(game)
+        else:
+            arena = game.tabulate() if hasattr(game, "tabulate") else TabularArena(game)
+            registry.put("tabular_arena", game, arena)
+        game.__dict__["_tabular_arena"] = arena
+    return arena
+
+
+class ArenaRegistry:
+    """
+    Tables and belief layers of recently used arenas, keyed by `Arena.dynamics_key`, so that they survive across
+    arena objects, belief games, formulas and initial states. Holds at most `maxsize` entries (least recently used
+    first out); arenas without a dynamics key are never registered.
+    """
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def _key(kind, arena):
+        key = arena.dynamics_key()
+        return None if key is None else (kind, type(arena).__name__, key)
+
+    def get(self, kind, arena):
+        """ Returns the `kind` object ("tabular_arena" or "belief_layer") of an arena with the same dynamics. """
+        key = self._key(kind, arena)
+        if key is None or key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        logging.info(f"Reusing the {kind} of an arena with the same dynamics.")
+        return self._entries[key]
+
+    def put(self, kind, arena, value):
+        key = self._key(kind, arena)
+        if key is None:
+            return
+        self._entries[key] = value
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+registry = ArenaRegistry()
+
+
+class TransitionCache:
+    """
+    Cache of arena transitions `arena.delta(s, act)`.
+
+    Arenas with at most `dense_limit` state-action pairs are enumerated once, in bulk, into a dense int32 array
+    `table[state id * num_actions + action id]` of successor ids. A `TabularArena` already serves transitions from
+    its tables and needs no cache (see `BeliefLayer`).
+    Disabled actions and missing successors point to a trailing None in the state list, so a lookup is two dict
+    lookups and two array indexings, without branches. Larger arenas (or arenas without `states()`) use an LRU of
+    at most `maxsize` transitions. Either way, memory use is bounded by the size chosen at construction.
+    """
+    DENSE_LIMIT = 2 ** 22
+    MAXSIZE = 2 ** 20
+
+    def __init__(self, arena: Arena, dense_limit=DENSE_LIMIT, maxsize=MAXSIZE):
+        self._arena = arena
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._table = None
+        self._lru = collections.OrderedDict()
+        self._prefill(dense_limit)
+        self.get = self._get_dense if self._table is not None else self._get_lru
+
+    def _set_table(self, states, actions, table):
+        self._states = list(states) + [None]
+        self._state2id = {state: sid for sid, state in enumerate(states)}
+        self._act2id = {act: aid for aid, act in enumerate(actions)}
+        self._num_actions = len(actions)
+        self._table = array.array("i", table)
+
+    def _prefill(self, dense_limit):
+        # Enumerate states (and successors outside `states()`) while the table fits the limit.
+        try:
+            states = list(self._arena.states())
+        except NotImplementedError:
+            return
+        actions = list(self._arena.actions())
+        if len(states) * len(actions) > dense_limit:
+            return
+        state2id = {state: sid for sid, state in enumerate(states)}
+        table = []
+        sid = 0
+        while sid < len(states):
+            if len(states) * len(actions) > dense_limit:
+                return
+            enabled = set(self._arena.enabled_acts(states[sid]))
+            for act in actions:
+                t = self._arena.delta(states[sid], act) if act in enabled else None
+                if t is not None and t not in state2id:
+                    state2id[t] = len(states)
+                    states.append(t)
+                table.append(-1 if t is None else state2id[t])
+            sid += 1
+        self._misses += len(table)
+        self._set_table(states, actions, table)
+
+    def _get_dense(self, s, act):
+        try:
+            t = self._states[self._table[self._state2id[s] * self._num_actions + self._act2id[act]]]
+        except KeyError:
+            # State or action outside the enumerated arena.
+            self._misses += 1
+            return self._arena.delta(s, act)
+        self._hits += 1
+        return t
+
+    def _get_lru(self, s, act):
+        key = (s, act)
+        lru = self._lru
+        if key in lru:
+            self._hits += 1
+            lru.move_to_end(key)
+            return lru[key]
+        self._misses += 1
+        t = lru[key] = self._arena.delta(s, act)
+        if len(lru) > self._maxsize:
+            lru.popitem(last=False)
+        return t
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        dense = self._table is not None
+        return {
+            "mode": "dense" if dense else "lru",
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups > 0 else None,
+            "size": len(self._table) if dense else len(self._lru),
+            "capacity": len(self._table) if dense else self._maxsize,
+        }
+
+
+class BeliefLayer:
+    """
+    Formula-independent part of the belief game of an arena: transitions, labels, attacker observations and,
+    for every arena state, its successors grouped by attacker observation (`post`).
+
+    The layer is filled lazily, once per arena state, and is shared by all belief games of the arena
+    (see `BeliefLayer.of`), so that solving several objectives on one arena explores the arena only once.
+    With a `TabularArena`, the index holds state/observation ids instead (`post_ids`).
+    """
+    def __init__(self, arena: Arena):
+        self._arena = arena
+        self._tabular = arena if isinstance(arena, TabularArena) else None
+        # next(s, act) returns arena.delta(s, act). A TabularArena serves transitions from its tables (and
+        # `BeliefGame` uses its ids instead), so only other arenas go through a `TransitionCache`.
+        self._transitions = TransitionCache(arena) if self._tabular is None else None
+        self.next = arena.delta if self._tabular is not None else self._transitions.get
+        self._obs = dict()          # maps {(s, act): o}
+        self._labels = dict()       # maps {t: label}
+        self._post = dict()         # maps {s: {o: [(t, label), ...]}}
+        self._post_ids = dict()     # maps {sid: {oid: [tid, ...]}}, used with TabularArena
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def of(arena: Arena):
+        """
+        Returns the belief layer of the arena, creating it on first use, or reusing that of an arena with the same
+        dynamics (see `ArenaRegistry`).
+        """
+        # Look up the instance dict: TabularArena delegates missing attributes to the arena it wraps.
+        layer = vars(arena).get("_belief_layer")
+        if layer is None:
+            layer = registry.get("belief_layer", arena)
+            if layer is None:
+                layer = BeliefLayer(arena)
+                registry.put("belief_layer", arena, layer)
+            arena.__dict__["_belief_layer"] = layer
+        return layer
+
+    def arena(self):
+        return self._arena
+
+    def label(self, t):
+        if t not in self._labels:
+            self._labels[t] = self._arena.label(t)
+        return self._labels[t]
+
+    def observation(self, s, act):
+        """ Returns the attacker's observation of the transition `(s, act, delta(s, act))`. """
+        self._index(s)
+        return self._obs.get((s, act))
+
+    def post(self, s, o):
+        """ Returns [(t, label(t))] of distinct successors t of s whose transition is observed as o. """
+        return self._index(s).get(o, ())
+
+    def _index(self, s):
+        index = self._post.get(s)
+        if index is not None:
+            self._hits += 1
+            return index
+
+        self._misses += 1
+        index = self._post[s] = dict()
+        for act in self._arena.enabled_acts(s):
+            t = self.next(s, act)
+            if t is None:
+                continue
+            o = self._obs[s, act] = self._arena.attacker_observation(s, act, t)
+            successors = index.setdefault(o, [])
+            if all(t_b != t for t_b, _ in successors):
+                successors.append((t, self.label(t)))
+        return index
+
+    def post_ids(self, sid, oid):
+        """ Returns distinct successor ids of arena state id `sid` whose transition has observation id `oid`. """
+        index = self._post_ids.get(sid)
+        if index is not None:
+            self._hits += 1
+        else:
+            self._misses += 1
+            index = self._post_ids[sid] = dict()
+            for _, tid, obs_id in self._tabular.successors(sid):
+                successors = index.setdefault(obs_id, [])
+                if tid not in successors:
+                    successors.append(tid)
+        return index.get(oid, ())
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups > 0 else None,
+            "indexed_states": len(self._post) + len(self._post_ids),
+            **({f"transitions_{key}": value for key, value in self._transitions.stats().items()}
+               if self._transitions is not None else dict()),
+        }
+
+
+def belief_key(element):
+    """ Sort key of belief elements (s, q): the automaton sink None (see `BeliefGame`) sorts after other states. """
+    s, q = element
+    return s, q is None, q
+
 
 class BeliefGame(dtptb.DTPTBGame):
-    def __init__(self, game: Arena, aut: logic.automata.DFA):
+    """
+    Product of the arena's belief layer (see `BeliefLayer`) with P1's automaton.
+    Only the automaton steps are specific to a belief game; arena transitions and observations come from the
+    layer shared by all belief games of the arena.
+    A missing transition of the automaton (`aut.delta` returns None) leads to a rejecting sink, kept as automaton
+    state None.
+    """
+    def __init__(self, game: Arena, aut: "logic.automata.DFA"):
         super(BeliefGame, self).__init__()
         self._game = game
         self._aut = aut
-        self._cache = dict()        # maps {state, {act: n_state}}
+        self._layer = BeliefLayer.of(game)
+        self._tabular = game if isinstance(game, TabularArena) else None
+        self._aut_cache = dict()    # maps {(q, label id): p}, used with TabularArena
 
     # def states(self):
     #     T = itertools.product(self._game.states(), self._aut.states())
@@ -51,45 +515,69 @@ class BeliefGame(dtptb.DTPTBGame):
         s, q, b = state
         return self._game.enabled_acts(s)
 
+    def layer(self):
+        return self._layer
+
     def delta(self, state, act):
         s, q, b = state
-        if 0 in self._aut.final(q):
+        if self._accepts(q):
             return state
 
-        # Check cache. If unavailable, use game.delta
-        if s in self._cache and act in self._cache[s]:
-            t = self._cache[s][act]
-        else:
-            t = self._game.delta(s, act)
-            if s in self._cache:
-                self._cache[s][act] = t
-            else:
-                self._cache[s] = {act: t}
-
-        p = self._aut.delta(q, self._game.label(t))
+        if self._tabular is not None:
+            return self._delta_tabular(state, act)
 
+        # Arena transition and its observation come from the belief layer.
+        layer = self._layer
+        t = layer.next(s, act)
         if t is None:
             return
+        p = self._aut_delta(q, layer.label(t))
 
+        # Belief update: successors of belief states with the same observation.
         c = set()
-        o = self._game.attacker_observation(s, act, t)
-        for (s_b, q_b), a_b in itertools.product(b, self.actions()):
-            if a_b not in self._game.enabled_acts(s_b):
-                continue
+        o = layer.observation(s, act)
+        for s_b, q_b in b:
+            for t_b, label_b in layer.post(s_b, o):
+                c.add((t_b, self._aut_delta(q_b, label_b)))
+
+        self._log_belief(state, act, c)
+        return t, p, tuple(sorted(c, key=belief_key))
+
+    def _delta_tabular(self, state, act):
+        # Same as delta, but with integer lookups in the arena tables.
+        s, q, b = state
+        arena = self._tabular
+        sid, aid = arena.state_id(s), arena.act2id[act]
+        tid = arena.next_id(sid, aid)
+        if tid < 0:
+            return
+
+        states = arena.states_list
+        o = arena.obs_id(sid, aid)
+        p = self._aut_step(q, arena.label_id(tid))
+        c = set()
+        for s_b, q_b in b:
+            for tid_b in self._layer.post_ids(arena.state_id(s_b), o):
+                c.add((states[tid_b], self._aut_step(q_b, arena.label_id(tid_b))))
+
+        self._log_belief(state, act, c)
+        return states[tid], p, tuple(sorted(c, key=belief_key))
+
+    def _aut_step(self, q, label_id):
+        key = (q, label_id)
+        p = self._aut_cache.get(key)
+        if p is None:
+            p = self._aut_cache[key] = self._aut_delta(q, self._tabular.labels[label_id])
+        return p
 
-            if s_b in self._cache and a_b in self._cache[s_b]:
-                t_b = self._cache[s_b][a_b]
-            else:
-                t_b = self._game.delta(s_b, a_b)
-                if s_b in self._cache:
-                    self._cache[s_b][a_b] = t_b
-                else:
-                    self._cache[s_b] = {a_b: t_b}
+    def _aut_delta(self, q, label):
+        return None if q is None else self._aut.delta(q, label)
 
-            p_b = self._aut.delta(q_b, self._game.label(t_b))
-            if o == self._game.attacker_observation(s_b, a_b, t_b):
-                c.add((t_b, p_b))
+    def _accepts(self, q):
+        return q is not None and 0 in self._aut.final(q)
 
+    @staticmethod
+    def _log_belief(state, act, c):
         # PATCH
         if len(c) > 10:
             with open("belief.log", "a") as file:
@@ -98,19 +586,21 @@ class BeliefGame(dtptb.DTPTBGame):
             #     f"\nGame({self._game.init_state()}) {state=} {act=} belief:{c}")
             # )
 
-        return t, p, tuple(sorted(list(c)))
+    def cache_stats(self):
+        """ Lookup statistics of the arena's belief layer (shared by all belief games of the arena). """
+        return self._layer.stats()
 
     def final(self, state):
         s, q, b = state
-        if_final = 0 in self._aut.final(q)
-        if any(0 not in self._aut.final(q_b) for s_b, q_b in b):
+        if_final = self._accepts(q)
+        if any(not self._accepts(q_b) for s_b, q_b in b):
             return if_final
         return False
 
     def final_p2(self, state):
         s, q, b = state
-        if_final = 0 in self._aut.final(q)
-        if all(0 in self._aut.final(q_b) for s_b, q_b in b):
+        if_final = self._accepts(q)
+        if all(self._accepts(q_b) for s_b, q_b in b):
             return if_final
         return False
 
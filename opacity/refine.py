@@ -0,0 +1,279 @@
+"""
+Incremental re-solve of belief games across neighboring sensor configurations.
+
+Changing the sensor changes the observation partition of `attacker_observation`. The transition of a belief
+state (s, q, b) is computed from the arena transitions of the states in b: a candidate transition joins the next
+belief iff its observation equals the observation of the actual transition. If the old and new observation ids of
+all transitions out of s and the states of b are in one-to-one correspondence, both sensors make the same
+comparisons, so the state keeps its old out-edges. Such states are "unsplit". Automaton steps depend on the labels
+of the successors, so a state whose belief reaches a relabeled arena state (e.g. after changing the goal set) is
+never unsplit.
+
+`RefineExplorer` explores the new belief game like `explorer.BeliefExplorer`, but copies the out-edges of unsplit
+states from the old graph store instead of recomputing their beliefs. Only states where the new sensor splits
+(or merges) beliefs are expanded with `BeliefGame.delta`.
+
+A node whose forward closure contains only copied states plays the same subgame as in the old graph, so it keeps
+its old winner, rank and winning edges. The remaining nodes (those that can reach a recomputed state) are
+re-solved with `retarget.ReachSolver`, starting from the known winners at their old ranks (saved next to the
+solution as `<prefix>_<name>.rank.npy`), so that winners and winning edges are those of a fresh solve.
+
+Both arenas must be `models.TabularArena`s of the same states and transitions, and the automaton must be the same.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+import dfa_cache
+import explorer
+import mmgraph
+import models as opac_models
+import retarget
+import solution as sol
+
+logger = logging.getLogger(__name__)
+
+
+def observation_pairs(old_arena, new_arena):
+    """ Returns, for each arena state id, the set of (old observation id, new observation id) of its transitions. """
+    if old_arena.states_list != new_arena.states_list or old_arena.actions_list != new_arena.actions_list:
+        raise ValueError("Arenas must have the same states and actions.")
+    enabled = old_arena.delta_table >= 0
+    if not np.array_equal(enabled, new_arena.delta_table >= 0):
+        raise ValueError("Arenas must have the same transitions.")
+    return [frozenset(zip(old_row[mask].tolist(), new_row[mask].tolist()))
+            for old_row, new_row, mask in zip(old_arena.obs_table, new_arena.obs_table, enabled)]
+
+
+def relabeled_successors(old_arena, new_arena):
+    """ Returns, for each arena state id, whether the label of one of its successors differs between the arenas. """
+    relabeled = np.array([set(old_arena.label(state)) != set(new_arena.label(state))
+                          for state in new_arena.states_list] + [False])
+    return relabeled[new_arena.delta_table].any(axis=1).tolist()
+
+
+def rank_path(prefix, name):
+    return f"{prefix}_{name}.rank.npy"
+
+
+class RefineExplorer(explorer.BeliefExplorer):
+    def __init__(self, game, old_arena, old_view, **kwargs):
+        """
+        :param game: (BeliefGame) New belief game over a `TabularArena`.
+        :param old_arena: (TabularArena) Arena with the old sensor.
+        :param old_view: (mmgraph.GraphView) Graph store of the old belief game.
+        """
+        super(RefineExplorer, self).__init__(game, **kwargs)
+        self._arena = game._tabular
+        self._pairs = observation_pairs(old_arena, self._arena)
+        self._relabeled = relabeled_successors(old_arena, self._arena)
+        self.reused = dict()         # maps {state: old uid} of states whose out-edges were copied
+
+        # Old graph as Python lists (decoded once; cheaper than per-edge store lookups).
+        self._old_states = [old_view.state(uid) for uid in range(old_view.number_of_nodes())]
+        self._old_node = {state: uid for uid, state in enumerate(self._old_states)}
+        self._old_ptr = old_view.succ_ptr.tolist()
+        self._old_dst = old_view.succ_dst.tolist()
+        actions = old_view.codec.actions
+        self._old_act = [actions[aid] for aid in old_view.edge_act.tolist()]
+
+    def is_unsplit(self, state):
+        s, q, b = state
+        state_id = self._arena.state_id
+        old2new, new2old = dict(), dict()
+        for s_b in {s, *(s_b for s_b, _ in b)}:
+            if self._relabeled[state_id(s_b)]:
+                return False
+            for old, new in self._pairs[state_id(s_b)]:
+                if old2new.setdefault(old, new) != new or new2old.setdefault(new, old) != old:
+                    return False
+        return True
+
+    def _successors(self, state):
+        uid = self._old_node.get(state)
+        if uid is None or not self.is_unsplit(state):
+            return super(RefineExplorer, self)._successors(state)
+
+        self.reused[state] = uid
+        states, acts = self._old_states, self._old_act
+        return [(acts[eid], states[self._old_dst[eid]]) for eid in range(self._old_ptr[uid], self._old_ptr[uid + 1])]
+
+
+def affected_nodes(view, changed):
+    """ Returns mask of nodes that can reach a node in `changed` (backward closure). """
+    succ_ptr = np.asarray(view.succ_ptr, dtype=np.int64)
+    succ_dst = np.asarray(view.succ_dst, dtype=np.int64)
+    edge_src = np.repeat(np.arange(view.number_of_nodes(), dtype=np.int64), np.diff(succ_ptr))
+
+    affected = np.asarray(changed, dtype=bool).copy()
+    while True:
+        grow = np.zeros_like(affected)
+        grow[edge_src[affected[succ_dst]]] = True
+        grow &= ~affected
+        if not grow.any():
+            return affected
+        affected |= grow
+
+
+def carry_edge_winners(view, old_view, old_uid, old_bitmap):
+    """ Maps old edge winner bits onto edges of nodes with old ids (old_uid >= 0), by position in out-edges. """
+    succ_ptr = np.asarray(view.succ_ptr, dtype=np.int64)
+    old_ptr = np.asarray(old_view.succ_ptr, dtype=np.int64)
+    edge_src = np.repeat(np.arange(view.number_of_nodes(), dtype=np.int64), np.diff(succ_ptr))
+    carried = old_uid[edge_src] >= 0
+    old_eid = old_ptr[old_uid[edge_src[carried]]] + (np.flatnonzero(carried) - succ_ptr[edge_src[carried]])
+    old_bits = np.unpackbits(np.asarray(old_bitmap))[:old_view.number_of_edges()].astype(bool)
+    bits = np.zeros(len(edge_src), dtype=bool)
+    bits[carried] = old_bits[old_eid]
+    return bits
+
+
+def refine(belief_game, old_arena, old_prefix, new_prefix, targets, init_set=None, progress=None):
+    """
+    Builds and solves the belief game with a new sensor from the solution of the old one.
+
+    :param belief_game: (BeliefGame) Belief game over a `TabularArena` with the new sensor.
+    :param old_arena: (TabularArena) Arena with the old sensor.
+    :param old_prefix: (str) Path prefix of the old run: `<prefix>.gstore`, `<prefix>_<name>.wsol` and ranks
+        `<prefix>_<name>.rank.npy` (see `solve`).
+    :param new_prefix: (str) Path prefix for the graph store and solutions of the new run.
+    :param targets: dict {name: predicate(state) -> bool}, e.g. {"p1": game.final, "p2": game.final_p2}.
+    :param init_set: Initial belief states (default: belief game's initial state).
+    :return: (game_graph, view, {name: ReachSolver}, stats)
+    """
+    start = time.perf_counter()
+    old_view = mmgraph.GraphView(f"{old_prefix}.gstore")
+
+    # Explore, copying out-edges of unsplit states
+    refine_explorer = RefineExplorer(belief_game, old_arena, old_view, progress=progress)
+    game_graph = refine_explorer.graphify(init_set=init_set)
+    num_nodes = game_graph.number_of_nodes()
+    mmgraph.write_graph_store(game_graph, f"{new_prefix}.gstore", overwrite=True)
+    view = mmgraph.GraphView(f"{new_prefix}.gstore")
+    explored = time.perf_counter()
+
+    # Nodes that keep their old subgame
+    old_uid = np.full(num_nodes, -1, dtype=np.int64)
+    for uid in range(num_nodes):
+        old_uid[uid] = refine_explorer.reused.get(game_graph["state"][uid], -1)
+    affected = affected_nodes(view, old_uid < 0)
+    fixed = ~affected
+
+    # Re-solve affected nodes, starting from old winners
+    solver_stats, solvers = dict(), dict()
+    for name, predicate in targets.items():
+        old_winner, old_bitmap = sol.read_arrays(f"{old_prefix}_{name}.wsol")
+        solver = retarget.ReachSolver(view, player=1)
+        carried_win = fixed & (np.asarray(old_winner)[np.maximum(old_uid, 0)] == 1)
+        carried_rank = None
+        if os.path.exists(rank_path(old_prefix, name)):
+            carried_rank = np.load(rank_path(old_prefix, name))[np.maximum(old_uid, 0)]
+        else:
+            logger.warning(f"No ranks of {old_prefix}_{name}: winning edges may differ from a fresh solve.")
+        target = np.fromiter((bool(predicate(game_graph["state"][uid])) for uid in range(num_nodes)),
+                             dtype=bool, count=num_nodes)
+        solver.solve(target | carried_win, fixed=fixed, rank=carried_rank)
+
+        # Winning edges: old bits for fixed nodes, solver's for re-solved ones.
+        edge_src = np.repeat(np.arange(num_nodes), np.diff(np.asarray(view.succ_ptr, dtype=np.int64)))
+        edge_winner = np.where(fixed[edge_src],
+                               carry_edge_winners(view, old_view, np.where(fixed, old_uid, -1), old_bitmap),
+                               solver.edge_winners())
+        sol.write_arrays(f"{new_prefix}_{name}.wsol", solver.node_winners(), edge_winner)
+        np.save(rank_path(new_prefix, name), solver.ranks().astype(np.int32))
+        solvers[name] = solver
+        solver_stats[name] = int(np.count_nonzero(solver.winning_region()))
+
+    stats = {
+        "nodes": num_nodes,
+        "edges": game_graph.number_of_edges(),
+        "reused": len(refine_explorer.reused),
+        "affected": int(np.count_nonzero(affected)),
+        "winning": solver_stats,
+        "explore_time": explored - start,
+        "solve_time": time.perf_counter() - explored,
+    }
+    logger.info(f"Refined {old_prefix} -> {new_prefix}: {stats}")
+    return game_graph, view, solvers, stats
+
+
+def solve(belief_game, prefix, targets, init_set=None, progress=None):
+    """ Builds and solves a belief game from scratch, writing the files `refine` starts from. """
+    start = time.perf_counter()
+    game_graph = explorer.BeliefExplorer(belief_game, progress=progress).graphify(init_set=init_set)
+    mmgraph.write_graph_store(game_graph, f"{prefix}.gstore", overwrite=True)
+    view = mmgraph.GraphView(f"{prefix}.gstore")
+    explored = time.perf_counter()
+
+    solvers, solver_stats = dict(), dict()
+    for name, predicate in targets.items():
+        solver = retarget.ReachSolver(view)
+        solver.solve(predicate)
+        solver.save(f"{prefix}_{name}.wsol")
+        np.save(rank_path(prefix, name), solver.ranks().astype(np.int32))
+        solvers[name] = solver
+        solver_stats[name] = int(np.count_nonzero(solver.winning_region()))
+
+    stats = {
+        "nodes": game_graph.number_of_nodes(),
+        "edges": game_graph.number_of_edges(),
+        "winning": solver_stats,
+        "explore_time": explored - start,
+        "solve_time": time.perf_counter() - explored,
+    }
+    return game_graph, view, solvers, stats
+
+
+def sweep_sensor_ranges(make_game, ranges, directory, name, init_state=None):
+    """
+    Solves the belief game for each sensor range, refining the solution of the previous range.
+
+    :param make_game: Callable `make_game(sensor_range) -> Arena`.
+    :param ranges: list of sensor ranges, neighbors first.
+    :param init_state: Initial arena state (default: game's initial state).
+    :return: list of stats per range.
+    """
+    os.makedirs(directory, exist_ok=True)
+    aut = None
+    results = []
+    prev_arena, prev_prefix = None, None
+    for rng in ranges:
+        game = make_game(rng)
+        if init_state is not None:
+            game.initialize(init_state)
+        arena = opac_models.tabulate(game)
+        aut = aut if aut is not None else dfa_cache.translate(game.formula1())
+        belief_game = opac_models.BeliefGame(arena, aut)
+        targets = {"p1": belief_game.final, "p2": belief_game.final_p2}
+
+        prefix = os.path.join(directory, f"{name}_rng{rng}")
+        if prev_prefix is None:
+            _, view, solvers, stats = solve(belief_game, prefix, targets)
+        else:
+            _, view, solvers, stats = refine(belief_game, prev_arena, prev_prefix, prefix, targets)
+        v0 = view.init_node()
+        stats.update(sensor_range=rng, p1_init_winner=solvers["p1"].node_winner(v0),
+                     p2_game_init_winner=solvers["p2"].node_winner(v0))
+        results.append(stats)
+        logger.info(f"Sensor range {rng}: {stats}")
+        prev_arena, prev_prefix = arena, prefix
+    return results
+
+
+if __name__ == "__main__":
+    import ex14_5x5_UAV_UGV as ex14
+
+    parser = argparse.ArgumentParser(description="Sensor range sweep of ex14 with incremental re-solve.")
+    parser.add_argument("--ranges", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--init", type=int, nargs=5, default=[2, 0, *ex14.P2_INIT, 1], help="p1r p1c p2r p2c turn")
+    parser.add_argument("--directory", default=f"out/{ex14.FILENAME}/refine")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    for result in sweep_sensor_ranges(
+            lambda rng: ex14.RndGridworld(dim=ex14.DIM, goal_cells=ex14.GOAL_CELLS, sense_rng=rng, obs=ex14.OBS_CELLS),
+            args.ranges, args.directory, ex14.FILENAME, init_state=tuple(args.init)):
+        print(result)
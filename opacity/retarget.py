@@ -0,0 +1,186 @@
+"""
+Sure-win reachability solver on a graph store, with a cached predecessor index for re-solving new targets.
+
+`ReachSolver` computes the attractor of a target set layer by layer with numpy.
+The predecessor index and, between calls, the attractor counters are kept in memory.
+When a new target contains the previous one, the previous attractor is extended instead of recomputed.
+"""
+import logging
+import time
+
+import numpy as np
+
+import solution as sol
+
+logger = logging.getLogger(__name__)
+
+
+class ReachSolver:
+    def __init__(self, view, player=1):
+        """
+        :param view: (mmgraph.GraphView) Graph store.
+        :param player: (int) Player trying to reach the target.
+        """
+        self._view = view
+        self._player = player
+        num_nodes = view.number_of_nodes()
+
+        # Successor and predecessor indices (built once).
+        self._succ_ptr = np.asarray(view.succ_ptr, dtype=np.int64)
+        self._succ_dst = np.asarray(view.succ_dst, dtype=np.int64)
+        self._edge_src = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(self._succ_ptr))
+        order = np.argsort(self._succ_dst, kind="stable")
+        self._pred_src = self._edge_src[order]
+        self._pred_ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._succ_dst, minlength=num_nodes), out=self._pred_ptr[1:])
+        self._is_player = np.asarray(view.turn) == player
+
+        # Solution state
+        self._fixed = np.zeros(num_nodes, dtype=bool)
+        self._target = None
+        self._attr = None
+        self._rank = None
+        self._counter = None
+
+    def view(self):
+        return self._view
+
+    def target_mask(self, target):
+        """
+        Converts a target into a boolean node mask.
+
+        :param target: boolean mask over nodes, iterable of node ids, or predicate `target(state) -> bool`
+            evaluated on every decoded node state.
+        """
+        num_nodes = self._view.number_of_nodes()
+        if callable(target):
+            return np.fromiter((bool(target(self._view.state(uid))) for uid in range(num_nodes)),
+                               dtype=bool, count=num_nodes)
+        target = np.asarray(target)
+        if target.dtype == bool:
+            return target.copy()
+        mask = np.zeros(num_nodes, dtype=bool)
+        mask[target.astype(np.int64)] = True
+        return mask
+
+    def solve(self, target=None, fixed=None, rank=None):
+        """
+        Solves the reachability game for `target` (see `target_mask`). Defaults to the "final" node property.
+        If the previous target is a subset of the new one, the previous attractor is extended.
+
+        :param fixed: boolean mask of nodes whose winner is known, e.g. from a solution of the same subgame.
+            Winning fixed nodes must be in `target`. Fixed nodes are not re-solved; only the nodes that can reach
+            nodes outside `fixed` are. Requires a full solve.
+        :param rank: (np.ndarray of int) Ranks (see `ranks`) of the winning fixed nodes in that solution. Winning
+            fixed nodes then join the attractor at their rank instead of 0, so that ranks and winning edges are
+            those of a full solve. Only used with `fixed`.
+        :return: (np.ndarray of bool) Winning region of the player.
+        """
+        start = time.perf_counter()
+        target = np.asarray(self._view.final, dtype=bool) if target is None else self.target_mask(target)
+
+        if fixed is not None:
+            # Only fixed targets with a predecessor to be solved start the propagation.
+            self._fixed = np.asarray(fixed, dtype=bool)
+            self._attr = target.copy()
+            self._rank = np.where(target, 0, -1).astype(np.int64)
+            if rank is not None:
+                known = self._fixed & target
+                self._rank[known] = np.maximum(np.asarray(rank, dtype=np.int64)[known], 0)
+            self._counter = np.diff(self._succ_ptr).copy()
+            open_pred = np.zeros(len(target), dtype=bool)
+            open_pred[self._succ_dst[~self._fixed[self._edge_src]]] = True
+            seeds = np.flatnonzero(target & (~self._fixed | open_pred))
+            frontier, pending = seeds[self._rank[seeds] == 0], seeds[self._rank[seeds] > 0]
+            next_rank = 1
+            mode = "partial"
+        elif self._target is not None and not np.any(self._target & ~target) and not self._fixed.any():
+            # Incremental: new target nodes form the first layer, ranks continue after the previous maximum.
+            frontier = np.flatnonzero(target & ~self._attr)
+            pending = frontier[:0]
+            next_rank = int(self._rank.max()) + 1 if self._attr.any() else 1
+            self._rank[frontier] = 0
+            mode = "incremental"
+        else:
+            self._fixed = np.zeros(len(target), dtype=bool)
+            self._attr = np.zeros(len(target), dtype=bool)
+            self._rank = np.full(len(target), -1, dtype=np.int64)
+            self._counter = np.diff(self._succ_ptr).copy()
+            frontier = np.flatnonzero(target)
+            pending = frontier[:0]
+            self._rank[frontier] = 0
+            next_rank = 1
+            mode = "full"
+
+        self._target = target
+        self._attr[frontier] = True
+        while len(frontier) > 0 or len(pending) > 0:
+            frontier = self._step(frontier, next_rank)
+            # Fixed nodes of this rank join the next layer.
+            joining = self._rank[pending] == next_rank
+            frontier, pending = np.union1d(frontier, pending[joining]), pending[~joining]
+            next_rank += 1
+
+        logger.info(f"{mode.capitalize()} solve: {np.count_nonzero(self._attr)} winning nodes "
+                    f"in {time.perf_counter() - start:.3f} seconds.")
+        return self._attr
+
+    def _step(self, frontier, rank):
+        # Collect predecessor edges of the frontier.
+        lo, hi = self._pred_ptr[frontier], self._pred_ptr[frontier + 1]
+        counts = hi - lo
+        idx = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        preds = self._pred_src[idx]
+        preds = preds[~self._attr[preds] & ~self._fixed[preds]]
+
+        # Player's nodes need one edge into the attractor, opponent's nodes need all edges.
+        own = np.unique(preds[self._is_player[preds]])
+        opp = preds[~self._is_player[preds]]
+        np.subtract.at(self._counter, opp, 1)
+        opp = np.unique(opp)
+        opp = opp[self._counter[opp] == 0]
+
+        new = np.union1d(own, opp)
+        self._attr[new] = True
+        self._rank[new] = rank
+        return new
+
+    # ============================================================================================
+    # Queries
+    # ============================================================================================
+    def winning_region(self):
+        return self._attr
+
+    def ranks(self):
+        """ Returns the attractor layer of each node (0 for targets, -1 outside the winning region). """
+        return self._rank
+
+    def node_winner(self, uid):
+        return self._player if self._attr[uid] else 3 - self._player
+
+    def node_winners(self):
+        return np.where(self._attr, self._player, 3 - self._player).astype(np.int8)
+
+    def edge_winners(self, start=0, stop=None):
+        """
+        Boolean array over store edges start..stop-1.
+        In the winning region, player's edges must decrease the rank (all edges of rank 0 nodes are winning);
+        opponent's edges are all winning. Outside it, opponent's edges must stay outside; player's edges are all
+        (losing) edges. Fixed winning nodes solved without their ranks have rank 0.
+        """
+        src, dst = self._edge_src[start:stop], self._succ_dst[start:stop]
+        in_src, in_dst = self._attr[src], self._attr[dst]
+        own = self._is_player[src]
+        progress = in_dst & (self._rank[dst] < self._rank[src])
+        win = np.where(own, progress | (self._rank[src] == 0), True)
+        lose = np.where(own, True, ~in_dst)
+        return np.where(in_src, win, lose)
+
+    def winning_edges(self, uid):
+        """ Returns store edge indices of winning out-edges of `uid`. """
+        start, stop = int(self._succ_ptr[uid]), int(self._succ_ptr[uid + 1])
+        return (np.flatnonzero(self.edge_winners(start, stop)) + start).tolist()
+
+    def save(self, fpath):
+        """ Saves the current solution as a `.wsol` file. """
+        sol.write_arrays(fpath, self.node_winners(), self.edge_winners())
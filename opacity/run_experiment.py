@@ -1,11 +1,22 @@
 import datetime
-import time
+import gc
 import logging
 from functools import partial
-import ggsolver.dtptb.pgsolver as dtptb
-import ggsolver.graph as graph
+import budget as mem_budget
+import dfa_cache
+import explorer
 import models as opac_models
+import metrics
+import mmgraph
+import retarget
+import solution as sol
 import os
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import ggsolver.graph as graph
 
 LOGGER = logging.getLogger(__name__)
 
@@ -16,31 +27,57 @@ DEFAULT_CONFIG = {
     "sensor_range": 1,
     "force_belief_graphify": False,
     "force_resolve": False,
+    "trace_memory": False,          # tracemalloc peaks per phase; slows down allocation (capacity planning only)
+    "formula": None,                # P1's ScLTL formula over game.atoms(). None uses game.formula1().
+    "dfa_cache": None,              # Directory of translated formulas (e.g. dfa_cache.DEFAULT_DIRECTORY). None: off
+    "render_automaton": False,      # Render P1's automaton to <filename>_aut.png (needs Graphviz).
+    "stream_graph": False,          # Explore into <filename>.gstore and solve with retarget (no belief .ggraph)
+    "tabular_arena": False,         # Serve arena queries from tables (see models.TabularArena)
+    "progress_interval": 10.0,
+    "memory_budget": None,          # e.g. "8G". None disables the budget.
+    "memory_policy": "abort",       # "abort", "checkpoint" or "stream" (see budget.MemoryBudget). Checkpoints are
+                                    # only written by the in-memory graph; "stream" re-explores into a .gstore.
+    "memory_hard_limit": None,      # Address-space limit of the process during the run, e.g. "12G".
+    "metrics_csv": None,
 }
 
 
-def solve_p1game(game_graph: graph.Graph, path: str, filename: str, dot_file: str = None, logger=LOGGER):
+def objective(game, config):
+    """ P1's ScLTL objective: `config["formula"]` over the game's atoms if set, else `game.formula1()`. """
+    if config.get("formula") is None:
+        return game.formula1()
+    import ggsolver.logic as logic
+    return logic.ltl.ScLTL(config["formula"], atoms=game.atoms())
+
+
+def solve_p1game(game_graph: "graph.Graph", sol_file: str = None, logger=LOGGER):
     # Extract game init state. That's ID of process.
     init_state = game_graph["init_state"][0]
 
+    # Load the solution, if available
+    if sol_file:
+        logger.info(f"Game({init_state}):: Loading solution of P1's game from {sol_file}.")
+        return sol.load_solution(game_graph, sol_file)
+
     # Define a reachability solver
-    swin_reach_p1 = dtptb.SWinReach(game_graph, save_output=True, path=path, filename=filename + "_p1")
+    import ggsolver.dtptb.pgsolver as dtptb
+    swin_reach_p1 = dtptb.SWinReach(game_graph)
     logger.info(f"Game({init_state}):: P1's SWinReach object created...")
 
     # Solve the reachability game
-    if dot_file:
-        logger.info(f"Game({init_state}):: Loading solution of P1's game from {dot_file}.")
-        swin_reach_p1.load_solution_from_dot(dot_file)
-    else:
-        swin_reach_p1.solve()
-
+    swin_reach_p1.solve()
     return swin_reach_p1
 
 
-def solve_p2game(game_graph: graph.Graph, p2final, path: str, filename: str, dot_file: str = None, logger=LOGGER):
+def solve_p2game(game_graph: "graph.Graph", p2final, sol_file: str = None, logger=LOGGER):
     # Extract game init state. That's ID of process.
     init_state = game_graph["init_state"][0]
 
+    # Load the solution, if available
+    if sol_file:
+        logger.info(f"Game({init_state}):: Loading solution of P2's game from {sol_file}.")
+        return sol.load_solution(game_graph, sol_file)
+
     # Generate final states
     # final = set(map(p2final, (game_graph["state"][uid] for uid in game_graph.nodes())))
     final = {game_graph["state"][uid] for uid in game_graph.nodes() if p2final(game_graph["state"][uid])}
@@ -50,38 +87,72 @@ def solve_p2game(game_graph: graph.Graph, p2final, path: str, filename: str, dot
         logger.info(f"Game({init_state}):: There is no revealing winning states")
 
     # Create P2's solver
-    swin_reach_p2 = dtptb.SWinReach(game_graph, final=final, save_output=True, path=path, filename=filename + "_p2")
+    import ggsolver.dtptb.pgsolver as dtptb
+    swin_reach_p2 = dtptb.SWinReach(game_graph, final=final)
 
     # Solve P2's game
-    if dot_file:
-        logger.info(f"Game({init_state}):: Loading solution of P2's game from {dot_file}.")
-        swin_reach_p2.load_solution_from_dot(dot_file)
-    else:
-        swin_reach_p2.solve()
-
+    swin_reach_p2.solve()
     return swin_reach_p2
 
 
-def run_experiment(game, game_init_set=None, config=None, logger=LOGGER):
-    # Extract initial state of game. This defines the process.
-    init_state = game.init_state()
+def run_experiment(game, game_init_set=None, config=None, logger=LOGGER, progress=explorer.log_progress):
+    """
+    Runs the experiment and returns its metrics record.
+    When the memory budget is exceeded, the run stops cleanly and the record has status "aborted:memory"
+    with partial results, instead of raising.
+
+    :param progress: Callable receiving progress records of belief graph exploration (see `explorer`).
+    """
     if config is None:
         config = DEFAULT_CONFIG
     logger.info(f"Config: {config}")
+    run_metrics = metrics.RunMetrics(config["filename"], trace_memory=config.get("trace_memory", False))
+    budget = mem_budget.MemoryBudget.from_config(config)
+    previous_limit = mem_budget.apply_hard_limit(mem_budget.parse_size(config.get("memory_hard_limit")))
+
+    try:
+        return _run_experiment(game, game_init_set, config, logger, progress, run_metrics, budget)
+    except (mem_budget.MemoryBudgetExceeded, MemoryError) as err:
+        logger.error(f"Game({game.init_state()}):: Memory exhausted: {err}")
+        run_metrics.set(
+            init_state=str(game.init_state()),
+            error=str(err) or type(err).__name__,
+            partial=getattr(err, "partial", dict()),
+            checkpoint=getattr(err, "checkpoint", None),
+        )
+        return save_metrics(run_metrics, config, status="aborted:memory", logger=logger)
+    finally:
+        # Pooled workers run further jobs after this one.
+        mem_budget.restore_limit(previous_limit)
+
+
+def _run_experiment(game, game_init_set, config, logger, progress, run_metrics, budget):
+    # Extract initial state of game. This defines the process.
+    init_state = game.init_state()
 
     # Generate objective automaton
-    aut = game.formula1().translate()
-    aut_graph = aut.graphify()
-    aut_graph.to_png(os.path.join(config["directory"], f"{config['filename']}_aut.png"),
-                     nlabel=["state", "final"], elabel=["input"])
-    logger.info(f"Game({init_state}):: ScLTL({game.formula1()}) translated successfully...")
+    with run_metrics.phase("translate"):
+        formula = objective(game, config)
+        aut = dfa_cache.translate(formula, directory=config.get("dfa_cache"))
+    if config.get("render_automaton", False):
+        with run_metrics.phase("render"):
+            aut_graph = formula.translate().graphify()
+            aut_graph.to_png(os.path.join(config["directory"], f"{config['filename']}_aut.png"),
+                             nlabel=["state", "final"], elabel=["input"])
+    logger.info(f"Game({init_state}):: ScLTL({formula}) translated successfully...")
 
     # Generate and save the base game
-    base_graph = game.graphify(pointed=True)
-    base_graph.save(os.path.join(config["directory"], f"{config['filename']}_base.ggraph"), overwrite=True)
+    with run_metrics.phase("base_graphify"):
+        base_graph = game.graphify(pointed=True)
+    with run_metrics.phase("save"):
+        base_graph.save(os.path.join(config["directory"], f"{config['filename']}_base.ggraph"), overwrite=True)
     logger.info(f"Game({game.init_state()}):: Base graph graphified successfully...")
 
     # Define the belief game
+    if config.get("tabular_arena", False):
+        with run_metrics.phase("tabulate"):
+            # Tabulated once per arena, so that runs on the same arena share its belief layer.
+            game = opac_models.tabulate(game)
     belief_game = opac_models.BeliefGame(game, aut)
     belief_game_init_set = set()
     if game_init_set is None:
@@ -97,58 +168,172 @@ def run_experiment(game, game_init_set=None, config=None, logger=LOGGER):
     # Define P2's final state function
     p2final = partial(belief_game.final_p2)
 
+    # Stream the belief game into a graph store and solve it there, without a ggsolver graph.
+    if config.get("stream_graph", False):
+        return _run_streamed(belief_game, belief_game_init_set, config, logger, progress, run_metrics, budget)
+
     # If game is saved, load it. Else graphify it.
     fpath = os.path.join(config["directory"], f"{config['filename']}.ggraph")
     if os.path.exists(fpath) and not config["force_belief_graphify"]:
-        game_graph = graph.Graph.load(fpath)
+        with run_metrics.phase("load_belief_graph"):
+            import ggsolver.graph as graph
+            game_graph = graph.Graph.load(fpath)
         logger.info(f"Game({init_state}):: Loaded existing game graph from {fpath}...")
 
     else:
         # Graphify belief fame
-        start = time.perf_counter()
-        print(f"belief_game.graphify(pointed=True, init_set={belief_game_init_set})")
-        game_graph = belief_game.graphify(pointed=True, init_set=belief_game_init_set)
-        end = time.perf_counter()
-        logger.info(f"Game({init_state}):: Time for graphification: {end - start} seconds.")
+        logger.info(f"Game({init_state}):: Exploring belief game from {belief_game_init_set}...")
+        belief_explorer = explorer.BeliefExplorer(belief_game, progress=progress, budget=budget,
+                                                  interval=config.get("progress_interval", 10.0))
+        resume = budget.checkpoint if budget is not None and budget.policy == "checkpoint" \
+            and os.path.exists(budget.checkpoint) else None
+        try:
+            with run_metrics.phase("belief_graphify") as stats:
+                game_graph = belief_explorer.graphify(init_set=belief_game_init_set, resume=resume)
+        except mem_budget.MemoryBudgetExceeded as err:
+            if budget.policy != "stream":
+                raise
+            logger.warning(f"Game({init_state}):: {err} Switching to a disk-backed graph store.")
+            run_metrics.set(stream_fallback=str(err))
+            game_graph = None
+        if game_graph is None:
+            # Outside the except block, so that the partial graph can be freed before exploring again.
+            del belief_explorer
+            gc.collect()
+            budget = budget.rebased()
+            logger.info(f"Game({init_state}):: Streaming under a budget of {budget.limit / 2 ** 20:.0f} MB.")
+            return _run_streamed(belief_game, belief_game_init_set, config, logger, progress, run_metrics, budget)
+        logger.info(f"Game({init_state}):: Time for graphification: {stats['wall']} seconds.")
+        if resume is not None:
+            os.remove(resume)
 
         # Save the game.
-        game_graph.save(fpath)
+        with run_metrics.phase("save"):
+            game_graph.save(fpath)
         logger.info(f"Game({init_state}):: Saved the graphified belief game graph at {fpath}...")
 
+    if budget is not None:
+        budget.check("after belief graph construction")
+
     # Solve P1's game
-    fpath = os.path.join(config["directory"], f"{config['filename']}_p1.dot")
+    fpath = os.path.join(config["directory"], f"{config['filename']}_p1.wsol")
     if os.path.exists(fpath) and not config["force_resolve"]:
-        logger.info(f"Game({init_state}):: Loading P1's game solution from {fpath}...")
-        swin_reach_p1 = solve_p1game(game_graph, dot_file=fpath,
-                                     path=config["directory"], filename=config["filename"], logger=logger)
+        with run_metrics.phase("load_p1"):
+            swin_reach_p1 = solve_p1game(game_graph, sol_file=fpath, logger=logger)
         logger.info(f"Game({init_state}):: Loaded P1's game solution from {fpath}.")
     else:
         logger.info(f"Game({init_state}):: Solving P1 game from scratch...")
-        start = time.perf_counter()
-        swin_reach_p1 = solve_p1game(game_graph, path=config["directory"], filename=config["filename"], logger=logger)
-        end = time.perf_counter()
-        logger.info(f"Game({init_state}):: Solution time for P1's game: {end - start} seconds.")
+        with run_metrics.phase("solve_p1") as stats:
+            swin_reach_p1 = solve_p1game(game_graph, logger=logger)
+        logger.info(f"Game({init_state}):: Solution time for P1's game: {stats['wall']} seconds.")
+
+        with run_metrics.phase("save"):
+            sol.save_solution(swin_reach_p1, fpath)
+        logger.info(f"Game({init_state}):: Saved P1's game solution in '{fpath}'")
+
+    if budget is not None:
+        budget.check("after solving P1's game")
 
     # Solve P2's game
-    fpath = os.path.join(config["directory"], f"{config['filename']}_p2.dot")
+    fpath = os.path.join(config["directory"], f"{config['filename']}_p2.wsol")
     if os.path.exists(fpath) and not config["force_resolve"]:
-        logger.info(f"Game({init_state}):: Loading P2's game solution from {fpath}...")
-        swin_reach_p2 = solve_p2game(game_graph, p2final, dot_file=fpath,
-                                     path=config["directory"], filename=config["filename"], logger=logger)
+        with run_metrics.phase("load_p2"):
+            swin_reach_p2 = solve_p2game(game_graph, p2final, sol_file=fpath, logger=logger)
         logger.info(f"Game({init_state}):: Loaded P2's game solution from {fpath}.")
     else:
         logger.info(f"Game({init_state}):: Solving P2 game from scratch...")
-        start = time.perf_counter()
-        swin_reach_p2 = solve_p2game(game_graph, p2final,
-                                     path=config["directory"], filename=config["filename"], logger=logger)
-        end = time.perf_counter()
-        logger.info(f"Game({init_state}):: Solution time for P2's game: {end - start} seconds.")
-
-    # Save the generated solutions
-    fpath = os.path.join(config["directory"], f"{config['filename']}_p1.solution")
-    swin_reach_p1.solution().save(fpath, overwrite=True)
-    logger.info(f"Game({init_state}):: Saved P1's game solution in '{fpath}'")
-
-    fpath = os.path.join(config["directory"], f"{config['filename']}_p2.solution")
-    swin_reach_p2.solution().save(fpath, overwrite=True)
-    logger.info(f"Game({init_state}):: Saved P2's game solution in '{fpath}'")
+        with run_metrics.phase("solve_p2") as stats:
+            swin_reach_p2 = solve_p2game(game_graph, p2final, logger=logger)
+        logger.info(f"Game({init_state}):: Solution time for P2's game: {stats['wall']} seconds.")
+
+        with run_metrics.phase("save"):
+            sol.save_solution(swin_reach_p2, fpath)
+        logger.info(f"Game({init_state}):: Saved P2's game solution in '{fpath}'")
+
+    # Save the memory-mapped graph store for analysis scripts
+    fpath = os.path.join(config["directory"], f"{config['filename']}.gstore")
+    with run_metrics.phase("save"):
+        mmgraph.write_graph_store(game_graph, fpath, overwrite=True)
+    logger.info(f"Game({init_state}):: Saved graph store in '{fpath}'")
+
+    # Emit metrics record
+    return emit_metrics(run_metrics, game_graph, belief_game, swin_reach_p1, swin_reach_p2, config, logger)
+
+
+def _run_streamed(belief_game, belief_game_init_set, config, logger, progress, run_metrics, budget):
+    init_state = belief_game.init_state()
+
+    # If the graph store exists, open it. Else explore the belief game into it.
+    fpath = os.path.join(config["directory"], f"{config['filename']}.gstore")
+    if os.path.exists(os.path.join(fpath, "meta.json")) and not config["force_belief_graphify"]:
+        view = mmgraph.GraphView(fpath)
+        logger.info(f"Game({init_state}):: Opened existing graph store {fpath}...")
+    else:
+        logger.info(f"Game({init_state}):: Exploring belief game from {belief_game_init_set} into {fpath}...")
+        belief_explorer = explorer.BeliefExplorer(belief_game, progress=progress, budget=budget,
+                                                  interval=config.get("progress_interval", 10.0))
+        with run_metrics.phase("belief_graphify") as stats:
+            view = belief_explorer.write_store(fpath, init_set=belief_game_init_set, overwrite=True)
+        logger.info(f"Game({init_state}):: Time for graphification: {stats['wall']} seconds.")
+
+    if budget is not None:
+        budget.check("after belief graph construction")
+
+    # Solve P1's and P2's games on the store
+    node_winners = dict()
+    for name, target in [("p1", None), ("p2", belief_game.final_p2)]:
+        fpath = os.path.join(config["directory"], f"{config['filename']}_{name}.wsol")
+        if os.path.exists(fpath) and not config["force_resolve"]:
+            with run_metrics.phase(f"load_{name}"):
+                node_winners[name], _ = sol.read_arrays(fpath)
+            logger.info(f"Game({init_state}):: Loaded {name.upper()}'s game solution from {fpath}.")
+            continue
+
+        with run_metrics.phase(f"solve_{name}") as stats:
+            solver = retarget.ReachSolver(view)
+            solver.solve(target)
+        logger.info(f"Game({init_state}):: Solution time for {name.upper()}'s game: {stats['wall']} seconds.")
+        with run_metrics.phase("save"):
+            solver.save(fpath)
+        node_winners[name] = solver.node_winners()
+
+        if budget is not None:
+            budget.check(f"after solving {name.upper()}'s game")
+
+    # Emit metrics record
+    init_node = view.init_node()
+    belief_len = (np.diff(np.asarray(view.state_ptr, dtype=np.int64)) - 2) // 2
+    run_metrics.set(
+        init_state=str(init_state),
+        nodes=view.number_of_nodes(),
+        edges=view.number_of_edges(),
+        belief_size=metrics.belief_size_stats(belief_len.tolist()),
+        cache=belief_game.cache_stats(),
+        p1_init_winner=None if init_node is None else int(node_winners["p1"][init_node]),
+        p2_game_init_winner=None if init_node is None else int(node_winners["p2"][init_node]),
+    )
+    return save_metrics(run_metrics, config, logger=logger)
+
+
+def emit_metrics(run_metrics, game_graph, belief_game, swin_reach_p1, swin_reach_p2, config, logger=LOGGER):
+    init_state = game_graph["init_state"]
+    run_metrics.set(
+        init_state=str(init_state),
+        nodes=game_graph.number_of_nodes(),
+        edges=game_graph.number_of_edges(),
+        belief_size=metrics.belief_size_stats(len(game_graph["state"][uid][2]) for uid in game_graph.nodes()),
+        cache=belief_game.cache_stats(),
+        p1_init_winner=swin_reach_p1.state_winner(init_state),
+        p2_game_init_winner=swin_reach_p2.state_winner(init_state),
+    )
+    return save_metrics(run_metrics, config, logger=logger)
+
+
+def save_metrics(run_metrics, config, status="done", logger=LOGGER):
+    record = run_metrics.finish(status)
+    fpath = os.path.join(config["directory"], f"{config['filename']}_metrics.json")
+    run_metrics.save_json(fpath)
+    if config.get("metrics_csv"):
+        run_metrics.append_csv(config["metrics_csv"])
+    logger.info(f"Game({record.get('init_state')}):: Saved metrics ({status}) in '{fpath}'")
+    return record
@@ -0,0 +1,150 @@
+"""
+Sensor models of the attacker (P2) in gridworld examples.
+
+A sensor's coverage mask tells for a sensor cell which cells of the grid it sees (cells are numbered row-major,
+`r * cols + c`): the attacker's sensor at `sensor cell` sees P1 at `cell` iff `mask(sensor cell)[cell]` is True.
+    - RangeSensor: cells within a Manhattan distance of the sensor (moves with P2).
+    - AreaSensor: a fixed set of cells, independent of P2's position.
+    - MultiCellSensor: several cells at fixed offsets from P2 (e.g. a sensor footprint), each with a range.
+
+Masks are computed with NumPy for many sensor cells at once. Observations are formatted once per (sensor cell,
+cell) pair, or once per distinct observation with the default format, and numbered, so that `observation` and `observation_id` are table lookups. Rows of the tables are
+built on first use of a sensor cell and cached: P2 usually visits few cells of the grid, so a sensor costs
+O(cells) per visited sensor cell instead of O(cells ** 2) up front. The default format is the one of
+`ex14_5x5_UAV_UGV`: P1's cell if covered, else only P1's row, followed by P2's cell.
+"""
+import numpy as np
+
+
+def format_observation(sensor_cell, cell, covered):
+    if covered:
+        return f"o1:{tuple(cell)}" + f"o2:{tuple(sensor_cell)}"
+    return f"o1:{(cell[0],)}" + f"o2:{tuple(sensor_cell)}"
+
+
+class Sensor:
+    def __init__(self, dim, fmt=format_observation):
+        """
+        :param dim: (rows, cols)
+        :param fmt: Callable `fmt(sensor_cell, cell, covered) -> observation`.
+        """
+        self.dim = dim
+        self._fmt = fmt
+        rows, cols = dim
+        self._cells = [(r, c) for r in range(rows) for c in range(cols)]
+        self._rc = np.indices((rows, cols)).reshape(2, rows * cols)       # [row, col] of every cell
+
+        # Rows of the tables, by sensor cell index. Observations are numbered in the order they are built.
+        self.observations = []
+        self._obs2id = dict()
+        self._mask_rows = dict()
+        self._obs_rows = dict()
+
+    def coverage(self, sr, sc):
+        """
+        Returns the coverage masks of sensors at cells (sr[i], sc[i]).
+
+        :param sr, sc: (np.ndarray of int, k x 1) Sensor rows and columns.
+        :return: (np.ndarray of bool, k x cells) Entry [i, j] is True iff the sensor at i covers cell j.
+        """
+        raise NotImplementedError("Marked Abstract")
+
+    def cell_index(self, cell):
+        return cell[0] * self.dim[1] + cell[1]
+
+    def _build_rows(self, sidx):
+        # Masks of the missing rows at once, then their observations.
+        missing = [idx for idx in dict.fromkeys(sidx) if idx not in self._obs_rows]
+        if len(missing) == 0:
+            return
+        sr, sc = self._rc[:, missing, None]
+        masks = self.coverage(sr, sc)
+        num_cells = len(self._cells)
+        for idx, mask in zip(missing, masks):
+            if self._fmt is format_observation:
+                # The default observation depends on the cell if covered, else only on its row:
+                # format one representative cell per distinct observation.
+                keys = np.where(mask, np.arange(num_cells), num_cells + self._rc[0])
+                _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+                oids = np.array([self._intern(idx, cidx, mask[cidx]) for cidx in first.tolist()], dtype=np.int32)
+                row = oids[inverse].tolist()
+            else:
+                row = [self._intern(idx, cidx, covered) for cidx, covered in enumerate(mask.tolist())]
+            self._mask_rows[idx] = mask
+            self._obs_rows[idx] = row
+
+    def _intern(self, sidx, cidx, covered):
+        """ Returns the id of the observation of the sensor at cell `sidx` of P1 at cell `cidx`. """
+        obs = self._fmt(self._cells[sidx], self._cells[cidx], bool(covered))
+        oid = self._obs2id.get(obs)
+        if oid is None:
+            oid = self._obs2id[obs] = len(self.observations)
+            self.observations.append(obs)
+        return oid
+
+    def mask(self, sensor_cell):
+        """ Returns the coverage mask (np.ndarray of bool over cells) of the sensor at `sensor_cell`. """
+        sidx = self.cell_index(sensor_cell)
+        self._build_rows([sidx])
+        return self._mask_rows[sidx]
+
+    def obs_ids(self, sidx):
+        """ Returns the observation ids (np.ndarray of int32, len(sidx) x cells) of sensor cell indices `sidx`. """
+        sidx = [int(idx) for idx in sidx]
+        self._build_rows(sidx)
+        return np.array([self._obs_rows[idx] for idx in sidx], dtype=np.int32).reshape(len(sidx), len(self._cells))
+
+    def covers(self, sensor_cell, cell):
+        return bool(self.mask(sensor_cell)[self.cell_index(cell)])
+
+    def observation_id(self, sensor_cell, cell):
+        sidx = self.cell_index(sensor_cell)
+        row = self._obs_rows.get(sidx)
+        if row is None:
+            self._build_rows([sidx])
+            row = self._obs_rows[sidx]
+        return row[self.cell_index(cell)]
+
+    def observation(self, sensor_cell, cell):
+        return self.observations[self.observation_id(sensor_cell, cell)]
+
+
+class RangeSensor(Sensor):
+    def __init__(self, dim, rng, fmt=format_observation):
+        """ :param rng: (int) Manhattan distance covered around the sensor. """
+        self.rng = rng
+        super(RangeSensor, self).__init__(dim, fmt)
+
+    def coverage(self, sr, sc):
+        r, c = self._rc
+        return np.abs(sr - r) + np.abs(sc - c) <= self.rng
+
+
+class AreaSensor(Sensor):
+    def __init__(self, dim, cells, fmt=format_observation):
+        """ :param cells: list of covered cells. """
+        self.cells = list(cells)
+        super(AreaSensor, self).__init__(dim, fmt)
+
+    def coverage(self, sr, sc):
+        area = np.zeros(len(self._cells), dtype=bool)
+        area[[self.cell_index(cell) for cell in self.cells]] = True
+        return np.broadcast_to(area, (len(sr), len(area)))
+
+
+class MultiCellSensor(Sensor):
+    def __init__(self, dim, offsets, rng=0, fmt=format_observation):
+        """
+        :param offsets: list of (dr, dc) offsets of sensing cells from the sensor position.
+        :param rng: (int) Manhattan distance covered around each sensing cell.
+        """
+        self.offsets = list(offsets)
+        self.rng = rng
+        super(MultiCellSensor, self).__init__(dim, fmt)
+
+    def coverage(self, sr, sc):
+        r, c = self._rc
+        mask = np.zeros((len(sr), len(self._cells)), dtype=bool)
+        for dr, dc in self.offsets:
+            mask |= np.abs(sr + dr - r) + np.abs(sc + dc - c) <= self.rng
+        return mask
@@ -0,0 +1,264 @@
+"""
+Strategy query server for solved belief games.
+
+Solved games (graph store + `.wsol` solution, see `mmgraph`) are opened once, memory-mapped, and served over a
+Unix socket or local TCP. The protocol is JSON lines: each request line is a query object or a list of queries
+(a batch), and the server answers with one line holding the response object or the list of responses.
+    query:    {"id": 1, "op": "winner" | "actions" | "successors" | "next", "game": "ex14", "state": [...],
+               "act": [...]}    ("game" may be omitted when one game is served; "act" only for "next")
+    response: {"id": 1, "result": ...} or {"id": 1, "error": "..."}
+    - winner: winning player of P1's game in the state.
+    - actions: P1's winning actions in the state.
+    - successors: list of [act, next state, winning] of the out-edges of the state.
+    - next: successor state under "act".
+States and actions are JSON arrays (tuples become arrays). Two LRU caches per game avoid repeated work for hot
+states: state -> node and node -> decoded state.
+
+Usage (from `opacity/`):
+    python server.py serve --game ex14=out/ex14.gstore:out/ex14_p1.wsol [--unix /tmp/opacity.sock | --port 8765]
+    python server.py bench --game ex14=out/ex14.gstore:out/ex14_p1.wsol [--unix ... | --port ...]
+        [--clients 4] [--batch 64] [--requests 100000]
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import statistics
+import threading
+import time
+
+import mmgraph
+
+logger = logging.getLogger(__name__)
+
+LRU_SIZE = 2 ** 16
+
+
+def _to_tuple(value):
+    # JSON turns tuples (states, actions) into lists.
+    return tuple(_to_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+class StrategyService:
+    """ Answers queries on solved games. Thread-safe for concurrent queries. """
+    def __init__(self, games, lru_size=LRU_SIZE):
+        """
+        :param games: dict {name: (graph store path, solution path)}.
+        :param lru_size: (int) Entries of each LRU cache.
+        """
+        self._views = dict()
+        self._node = dict()
+        self._state = dict()
+        for name, (store, solution) in games.items():
+            view = mmgraph.GraphView(store).attach_solution(solution)
+            view.state2node(view.state(view.init_node() or 0))      # build the index before serving
+            self._views[name] = view
+            self._node[name] = functools.lru_cache(maxsize=lru_size)(view.state2node)
+            self._state[name] = functools.lru_cache(maxsize=lru_size)(view.state)
+            logger.info(f"Serving game {name}: {view.number_of_nodes()} nodes from {store}.")
+
+    def games(self):
+        return list(self._views)
+
+    def view(self, game):
+        return self._views[game]
+
+    def query(self, request):
+        qid = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise TypeError(f"expected a query object, got {json.dumps(request)}")
+            return {"id": qid, "result": self._answer(request)}
+        except Exception as err:
+            return {"id": qid, "error": f"{type(err).__name__}: {err}"}
+
+    def _answer(self, request):
+        game = request.get("game")
+        if game is None and len(self._views) == 1:
+            game = next(iter(self._views))
+        view = self._views[game]
+        uid = self._node[game](_to_tuple(request["state"]))
+
+        op = request["op"]
+        if op == "winner":
+            return view.node_winner(uid)
+        if op == "actions":
+            return view.winning_actions(uid)
+        if op == "successors":
+            return [[act, self._state[game](vid), view.is_winning_edge(eid)] for eid, vid, act in view.out_edges(uid)]
+        if op == "next":
+            act = _to_tuple(request["act"])
+            vid = next((vid for _, vid, act_ in view.out_edges(uid) if act_ == act), None)
+            if vid is None:
+                raise ValueError(f"unknown action {request['act']!r} in state {request['state']!r}")
+            return self._state[game](vid)
+        raise ValueError(f"Unknown op {op!r}.")
+
+    def handle_line(self, line):
+        """
+        Answers a request line (query or batch) and returns the response line. Malformed lines and queries are
+        answered with an error, so that they do not drop the connection.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as err:       # JSONDecodeError, or bytes that are not UTF-8
+            response = {"id": None, "error": f"{type(err).__name__}: {err}"}
+        else:
+            if isinstance(request, list):
+                response = [self.query(item) for item in request]
+            else:
+                response = self.query(request)
+        return (json.dumps(response, separators=(",", ":")) + "\n").encode()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write(service.handle_line(line))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(service, unix=None, host="127.0.0.1", port=8765):
+    """ Returns a threading server for the service on a Unix socket (if given) or on local TCP. """
+    if unix is not None:
+        if os.path.exists(unix):
+            os.remove(unix)
+        server = _UnixServer(unix, _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.service = service
+    return server
+
+
+class StrategyClient:
+    def __init__(self, unix=None, host="127.0.0.1", port=8765):
+        if unix is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(unix)
+        else:
+            self._sock = socket.create_connection((host, port))
+        self._rfile = self._sock.makefile("rb")
+        self._next_id = 0
+
+    def close(self):
+        self._rfile.close()
+        self._sock.close()
+
+    def batch(self, queries):
+        """ Sends a list of queries (dicts without "id") and returns the list of responses. """
+        for query in queries:
+            query["id"] = self._next_id
+            self._next_id += 1
+        self._sock.sendall((json.dumps(queries, separators=(",", ":")) + "\n").encode())
+        return json.loads(self._rfile.readline())
+
+    def query(self, op, state, game=None, act=None):
+        query = {"op": op, "state": state}
+        if game is not None:
+            query["game"] = game
+        if act is not None:
+            query["act"] = act
+        response = self.batch([query])[0]
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+
+def load_generator(service, address, game=None, clients=4, batch=64, requests=100000, seed=0):
+    """
+    Sends `requests` random queries in batches from `clients` connections and returns throughput and latency.
+    States are sampled from the nodes of the served game.
+    """
+    game = game or service.games()[0]
+    view = service.view(game)
+    rng = random.Random(seed)
+    states = [view.state(rng.randrange(view.number_of_nodes())) for _ in range(min(4096, requests))]
+    ops = ["winner", "actions", "successors"]
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(num_batches, worker_seed):
+        client = StrategyClient(**address)
+        worker_rng = random.Random(worker_seed)
+        local = []
+        for _ in range(num_batches):
+            queries = [{"op": worker_rng.choice(ops), "game": game, "state": worker_rng.choice(states)}
+                       for _ in range(batch)]
+            start = time.perf_counter()
+            responses = client.batch(queries)
+            local.append(time.perf_counter() - start)
+            errors.extend(resp for resp in responses if "error" in resp)
+        client.close()
+        with lock:
+            latencies.extend(local)
+
+    num_batches = max(1, requests // (batch * clients))
+    threads = [threading.Thread(target=worker, args=(num_batches, seed + idx)) for idx in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = num_batches * batch * clients
+    return {
+        "queries": total,
+        "errors": len(errors),
+        "queries_per_sec": total / elapsed,
+        "batch_latency_ms_p50": statistics.median(latencies) * 1000,
+        "batch_latency_ms_p99": latencies[min(int(0.99 * len(latencies)), len(latencies) - 1)] * 1000,
+    }
+
+
+def _parse_games(specs):
+    games = dict()
+    for spec in specs:
+        name, paths = spec.split("=", 1)
+        store, solution = paths.rsplit(":", 1)
+        games[name] = (store, solution)
+    return games
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--game", action="append", required=True, help="name=<store>.gstore:<solution>.wsol")
+    parser.add_argument("--unix", default=None, help="Unix socket path (default: local TCP).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--lru-size", type=int, default=LRU_SIZE)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    strategy_service = StrategyService(_parse_games(args.game), lru_size=args.lru_size)
+    strategy_server = make_server(strategy_service, unix=args.unix, host=args.host, port=args.port)
+    if args.command == "serve":
+        logger.info(f"Listening on {args.unix or f'{args.host}:{args.port}'}.")
+        strategy_server.serve_forever()
+    else:
+        # Benchmark against an in-process server.
+        threading.Thread(target=strategy_server.serve_forever, daemon=True).start()
+        connect = {"unix": args.unix} if args.unix else {"host": args.host, "port": args.port}
+        print(load_generator(strategy_service, connect, clients=args.clients, batch=args.batch,
+                             requests=args.requests))
+        strategy_server.shutdown()
@@ -0,0 +1,175 @@
+"""
+Batch Monte Carlo simulation of plays under P1's winning strategy.
+
+Plays are rolled out in lock-step on the successor arrays of a `mmgraph.GraphView` with an attached solution.
+At P1's nodes, P1 picks a winning edge uniformly at random (any edge if the node is not winning).
+At P2's nodes, the edge is chosen by a P2 policy:
+    - "random": uniformly among all out-edges.
+    - "adversarial": uniformly among edges leading outside P1's winning region, if any, else random.
+    - callable `policy(view, nodes, rng) -> edges`: scripted policy returning one store edge index per node.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_REACHED = 0
+OUTCOME_DEADLOCK = 1
+OUTCOME_TIMEOUT = 2
+OUTCOMES = {OUTCOME_REACHED: "reached", OUTCOME_DEADLOCK: "deadlock", OUTCOME_TIMEOUT: "timeout"}
+
+
+def _sub_csr(succ_ptr, edge_mask):
+    """ Restricts a CSR edge table to the edges selected by `edge_mask`. Returns (ptr, edges). """
+    count = np.zeros(len(edge_mask) + 1, dtype=np.int64)
+    np.cumsum(edge_mask, out=count[1:])
+    return count[succ_ptr], np.flatnonzero(edge_mask)
+
+
+def _pick(ptr, edges, nodes, rng):
+    """ Picks uniformly one of the edges of each node. Returns -1 for nodes without edges. """
+    lo, hi = ptr[nodes], ptr[nodes + 1]
+    deg = hi - lo
+    choice = np.full(len(nodes), -1, dtype=np.int64)
+    has = deg > 0
+    idx = lo[has] + (rng.random(np.count_nonzero(has)) * deg[has]).astype(np.int64)
+    choice[has] = edges[idx]
+    return choice
+
+
+class StrategyTables:
+    """
+    Array-backed successor tables of a solved graph, prepared once and shared by many simulations.
+    """
+    def __init__(self, view, player=1, target=None):
+        """
+        :param view: (mmgraph.GraphView) Graph store with attached solution.
+        :param player: (int) Player whose winning strategy is simulated.
+        :param target: (np.ndarray of bool) Nodes that end a play. Defaults to the "final" node property.
+        """
+        self.view = view
+        self.player = player
+        self.succ_ptr = np.asarray(view.succ_ptr, dtype=np.int64)
+        self.succ_dst = np.asarray(view.succ_dst, dtype=np.int64)
+        self.turn = np.asarray(view.turn)
+        self.target = np.asarray(view.final, dtype=bool) if target is None else np.asarray(target, dtype=bool)
+
+        num_edges = len(self.succ_dst)
+        node_winner, edge_bitmap = view.solution_arrays()
+        self.node_winner = np.asarray(node_winner)
+        win_edge = np.unpackbits(np.asarray(edge_bitmap))[:num_edges].astype(bool)
+        escape = self.node_winner[self.succ_dst] != player
+
+        self.all = (self.succ_ptr, np.arange(num_edges, dtype=np.int64))
+        self.win = _sub_csr(self.succ_ptr, win_edge)
+        self.escape = _sub_csr(self.succ_ptr, escape)
+
+
+class SimulationResult:
+    def __init__(self, outcomes, lengths, plays=None):
+        self.outcomes = outcomes
+        self.lengths = lengths
+        self.plays = plays
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def outcome_counts(self):
+        return {name: int(np.count_nonzero(self.outcomes == code)) for code, name in OUTCOMES.items()}
+
+    def length_histogram(self, outcome=OUTCOME_REACHED):
+        return np.bincount(self.lengths[self.outcomes == outcome])
+
+    def summary(self):
+        counts = self.outcome_counts()
+        reached = self.lengths[self.outcomes == OUTCOME_REACHED]
+        stats = {
+            "num_plays": len(self),
+            "outcomes": counts,
+            "reach_rate": counts["reached"] / max(len(self), 1),
+        }
+        if len(reached) > 0:
+            stats["length"] = {
+                "mean": float(reached.mean()),
+                "min": int(reached.min()),
+                "max": int(reached.max()),
+                "p50": float(np.percentile(reached, 50)),
+                "p90": float(np.percentile(reached, 90)),
+                "p99": float(np.percentile(reached, 99)),
+            }
+        return stats
+
+
+def simulate(tables, init_nodes, num_plays=1000, p2_policy="random", max_steps=1000, seed=None, record=False):
+    """
+    Rolls out `num_plays` plays at once.
+
+    :param tables: (StrategyTables) Prepared successor tables.
+    :param init_nodes: (int or array) Initial node(s). Plays are distributed round-robin over them.
+    :param num_plays: (int) Number of plays.
+    :param p2_policy: "random", "adversarial" or callable `policy(view, nodes, rng) -> edges`.
+    :param max_steps: (int) Plays not ending within this many steps time out.
+    :param seed: Seed of numpy random generator.
+    :param record: (bool) If True, keep the node sequence of every play (-1 padded) in `result.plays`.
+    :return: (SimulationResult)
+    """
+    rng = np.random.default_rng(seed)
+    init_nodes = np.atleast_1d(np.asarray(init_nodes, dtype=np.int64))
+    curr = init_nodes[np.arange(num_plays) % len(init_nodes)]
+
+    outcomes = np.full(num_plays, OUTCOME_TIMEOUT, dtype=np.int8)
+    lengths = np.full(num_plays, max_steps, dtype=np.int64)
+    alive = np.ones(num_plays, dtype=bool)
+    plays = np.full((num_plays, max_steps + 1), -1, dtype=np.int64) if record else None
+    if record:
+        plays[:, 0] = curr
+
+    for step in range(max_steps + 1):
+        # Finish plays that reached the target.
+        done = alive & tables.target[curr]
+        outcomes[done] = OUTCOME_REACHED
+        lengths[done] = step
+        alive &= ~done
+        if step == max_steps or not alive.any():
+            break
+
+        idx = np.flatnonzero(alive)
+        nodes = curr[idx]
+        edges = np.empty(len(idx), dtype=np.int64)
+
+        # P1 (simulated player) follows its winning strategy, falls back to any edge when not winning.
+        p1 = tables.turn[nodes] == tables.player
+        edges[p1] = _pick(*tables.win, nodes[p1], rng)
+        lost = p1.copy()
+        lost[p1] = edges[p1] < 0
+        edges[lost] = _pick(*tables.all, nodes[lost], rng)
+
+        # Opponent
+        p2 = ~p1
+        if callable(p2_policy):
+            edges[p2] = p2_policy(tables.view, nodes[p2], rng)
+        elif p2_policy == "adversarial":
+            edges[p2] = _pick(*tables.escape, nodes[p2], rng)
+            stay = p2.copy()
+            stay[p2] = edges[p2] < 0
+            edges[stay] = _pick(*tables.all, nodes[stay], rng)
+        elif p2_policy == "random":
+            edges[p2] = _pick(*tables.all, nodes[p2], rng)
+        else:
+            raise ValueError(f"Unknown P2 policy: {p2_policy}.")
+
+        # Plays without any out-edge are deadlocked.
+        stuck = edges < 0
+        outcomes[idx[stuck]] = OUTCOME_DEADLOCK
+        lengths[idx[stuck]] = step
+        alive[idx[stuck]] = False
+
+        moving = idx[~stuck]
+        curr[moving] = tables.succ_dst[edges[~stuck]]
+        if record:
+            plays[moving, step + 1] = curr[moving]
+
+    result = SimulationResult(outcomes, lengths, plays)
+    logger.info(f"Simulated {num_plays} plays: {result.outcome_counts()}")
+    return result
@@ -0,0 +1,133 @@
+"""
+Native binary format for solutions of reachability games.
+
+A `.wsol` file holds a fixed header followed by
+    - node winner array (int8, n): winning player of each node, 0 if undetermined.
+    - edge winner bitmap (packed bits, ceil(m / 8) bytes): winning flag of each edge.
+
+Edges are ordered by source node and, within a node, in `graph.out_edges(uid)` order.
+This is the same edge order as the graph store in `mmgraph`.
+"""
+import logging
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSOL"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")        # magic, version, num_nodes, num_edges
+
+
+def save_solution(swin, fpath):
+    """
+    Saves winners of a solved `SWinReach` (or `Solution`) into a `.wsol` file.
+
+    :param swin: Solved solver. Must provide `graph()`, `state_winner(state)` and `winning_edges(uid)`.
+    :param fpath: (str) Output file.
+    """
+    graph = swin.graph()
+    num_nodes = graph.number_of_nodes()
+    node_winner = np.zeros(num_nodes, dtype=np.int8)
+    edge_winner = []
+    for uid in range(num_nodes):
+        winner = swin.state_winner(graph["state"][uid])
+        node_winner[uid] = winner if winner is not None else 0
+        win_edges = set(swin.winning_edges(uid))
+        edge_winner.extend((uid, vid, key) in win_edges for _, vid, key in graph.out_edges(uid))
+
+    write_arrays(fpath, node_winner, np.asarray(edge_winner, dtype=bool))
+
+
+def write_arrays(fpath, node_winner, edge_winner):
+    """
+    Writes a `.wsol` file from a node winner array and a boolean (unpacked) edge winner array.
+    """
+    with open(fpath, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(node_winner), len(edge_winner)))
+        file.write(np.asarray(node_winner, dtype=np.int8).tobytes())
+        file.write(np.packbits(np.asarray(edge_winner, dtype=bool)).tobytes())
+
+
+def read_arrays(fpath):
+    """
+    Memory-maps a `.wsol` file.
+
+    :return: (node_winner, edge_bitmap) Arrays of int8 node winners and packed uint8 edge flags.
+    """
+    with open(fpath, "rb") as file:
+        magic, version, num_nodes, num_edges = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{fpath} is not a version {VERSION} solution file.")
+
+    node_winner = np.memmap(fpath, dtype=np.int8, mode="r", offset=HEADER.size, shape=(num_nodes,)) \
+        if num_nodes > 0 else np.zeros(0, dtype=np.int8)
+    num_bytes = (num_edges + 7) // 8
+    edge_bitmap = np.memmap(fpath, dtype=np.uint8, mode="r", offset=HEADER.size + num_nodes, shape=(num_bytes,)) \
+        if num_bytes > 0 else np.zeros(0, dtype=np.uint8)
+    return node_winner, edge_bitmap
+
+
+def is_set(bitmap, eid):
+    return bool((bitmap[eid >> 3] >> (7 - (eid & 7))) & 1)
+
+
+class Solution:
+    """
+    Solution of a game graph loaded from a `.wsol` file.
+    Answers the same queries as a solved `SWinReach` used in this project.
+    """
+    def __init__(self, graph, fpath):
+        self._graph = graph
+        self._node_winner, self._edge_bitmap = read_arrays(fpath)
+        if len(self._node_winner) != graph.number_of_nodes():
+            raise ValueError(f"Solution {fpath} has {len(self._node_winner)} nodes, "
+                             f"graph has {graph.number_of_nodes()}.")
+        self._edge_offset = None
+        self._state2node = None
+
+    def graph(self):
+        return self._graph
+
+    def _offsets(self):
+        # Global index of first out-edge of each node, computed once.
+        if self._edge_offset is None:
+            self._edge_offset = np.zeros(self._graph.number_of_nodes() + 1, dtype=np.int64)
+            np.cumsum([len(self._graph.out_edges(uid)) for uid in range(self._graph.number_of_nodes())],
+                      out=self._edge_offset[1:])
+        return self._edge_offset
+
+    def state2node(self, state):
+        if self._state2node is None:
+            self._state2node = {self._graph["state"][uid]: uid for uid in self._graph.nodes()}
+        return self._state2node[state]
+
+    def node2state(self, uid):
+        return self._graph["state"][uid]
+
+    def node_winner(self, uid):
+        winner = int(self._node_winner[uid])
+        return winner if winner != 0 else None
+
+    def state_winner(self, state):
+        return self.node_winner(self.state2node(state))
+
+    def winning_nodes(self, player):
+        return np.flatnonzero(self._node_winner == player).tolist()
+
+    def winning_states(self, player):
+        return [self.node2state(uid) for uid in self.winning_nodes(player)]
+
+    def winning_edges(self, uid):
+        offset = int(self._offsets()[uid])
+        return [(uid, vid, key) for idx, (_, vid, key) in enumerate(self._graph.out_edges(uid))
+                if is_set(self._edge_bitmap, offset + idx)]
+
+    def winning_actions(self, state):
+        return list({self._graph["input"][edge] for edge in self.winning_edges(self.state2node(state))})
+
+
+def load_solution(graph, fpath):
+    logger.info(f"Loading solution from {fpath}.")
+    return Solution(graph, fpath)
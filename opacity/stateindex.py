@@ -0,0 +1,170 @@
+"""
+Fingerprint index from node states to node ids of a graph store.
+
+Every node state is fingerprinted by a 64-bit hash of its `mmgraph.StateCodec` encoding. The index stores the
+fingerprints sorted, the node id of each, and a radix directory over the top `bits` bits of the fingerprints:
+    - directory (int64, 2 ** bits + 1): offsets of the fingerprints with each prefix.
+    - fingerprints (uint64, n), nodes (int32, n): sorted by fingerprint.
+A lookup hashes the encoded state, reads one directory bucket (a few entries on average) and compares the stored
+encoding of the candidate node with the query, so that fingerprint collisions cannot return a wrong node.
+
+The index is written to `state_index.bin` in the store directory when the store is written, and memory-mapped
+by `mmgraph.GraphView.state2node`. It takes 12 bytes per node, instead of a dict over decoded state tuples.
+"""
+import logging
+import os
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FILENAME = "state_index.bin"
+MAGIC = b"SIDX"
+VERSION = 1
+HEADER = struct.Struct("<4sIQI")            # magic, version, num_nodes, bits
+MASK = (1 << 64) - 1
+PRIME = 0x100000001B3
+MIX1, MIX2 = 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53
+CHUNK_SIZE = 2 ** 20                        # nodes hashed at once while building
+
+
+def fingerprint(seq):
+    """ Returns the 64-bit fingerprint of an encoded state (sequence of ints). """
+    h = len(seq)
+    for value in seq:
+        h = (h * PRIME + value + 1) & MASK
+    h ^= h >> 33
+    h = (h * MIX1) & MASK
+    h ^= h >> 33
+    h = (h * MIX2) & MASK
+    return h ^ (h >> 33)
+
+
+def fingerprints(state_ptr, state_data):
+    """ Returns the fingerprints (uint64) of all encoded states of a graph store, as `fingerprint` does. """
+    state_ptr = np.asarray(state_ptr, dtype=np.int64)
+    num_nodes = len(state_ptr) - 1
+    lengths = np.diff(state_ptr)
+    max_len = int(lengths.max()) if num_nodes > 0 else 0
+
+    # powers[k] = PRIME ** k mod 2 ** 64 (uint64 arithmetic wraps).
+    powers = np.ones(max_len + 1, dtype=np.uint64)
+    for k in range(1, max_len + 1):
+        powers[k] = np.uint64((int(powers[k - 1]) * PRIME) & MASK)
+
+    result = np.empty(num_nodes, dtype=np.uint64)
+    for start in range(0, num_nodes, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, num_nodes)
+        lo, hi = int(state_ptr[start]), int(state_ptr[stop])
+        data = np.asarray(state_data[lo:hi], dtype=np.int64).astype(np.uint64) + np.uint64(1)
+
+        # h = len * P^len + sum_k (x_k + 1) * P^(len - 1 - k), over the elements k of each state.
+        ends = np.repeat(state_ptr[start + 1:stop + 1], lengths[start:stop]) - lo
+        terms = data * powers[ends - 1 - np.arange(hi - lo)]
+        # reduceat gives an element instead of 0 for empty segments, so empty states are left out.
+        nonempty = lengths[start:stop] > 0
+        h = np.zeros(stop - start, dtype=np.uint64)
+        if hi > lo:
+            h[nonempty] = np.add.reduceat(terms, state_ptr[start:stop][nonempty] - lo)
+        h += lengths[start:stop].astype(np.uint64) * powers[lengths[start:stop]]
+
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(MIX1)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(MIX2)
+        h ^= h >> np.uint64(33)
+        result[start:stop] = h
+    return result
+
+
+def build(state_ptr, state_data, fpath=None):
+    """
+    Builds the index of a graph store's states and writes it to `fpath`, if given.
+
+    :return: (StateIndex) The index (memory-mapped from `fpath` if written).
+    """
+    fps = fingerprints(state_ptr, state_data)
+    num_nodes = len(fps)
+    bits = min(max(num_nodes - 1, 1).bit_length(), 24)
+    order = np.argsort(fps, kind="stable")
+    fps = fps[order]
+    nodes = order.astype(np.int32)
+    directory = np.zeros(2 ** bits + 1, dtype=np.int64)
+    np.cumsum(np.bincount((fps >> np.uint64(64 - bits)).astype(np.int64), minlength=2 ** bits),
+              out=directory[1:])
+
+    if fpath is None:
+        return StateIndex(directory, fps, nodes, bits, state_ptr, state_data)
+    with open(fpath, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, num_nodes, bits))
+        file.write(directory.tobytes())
+        file.write(fps.tobytes())
+        file.write(nodes.tobytes())
+    logger.info(f"Wrote state index {fpath} for {num_nodes} nodes.")
+    return StateIndex.load(fpath, state_ptr, state_data)
+
+
+class StateIndex:
+    def __init__(self, directory, fps, nodes, bits, state_ptr, state_data):
+        """ :param state_ptr, state_data: Encoded states of the graph store, to verify candidates. """
+        # Plain ndarray views of memory maps: slicing a np.memmap costs more than the lookup itself.
+        self._directory = np.asarray(directory)
+        self._fps = np.asarray(fps)
+        self._nodes = np.asarray(nodes)
+        self._shift = 64 - bits
+        self._state_ptr = np.asarray(state_ptr)
+        self._state_data = np.asarray(state_data)
+
+    @classmethod
+    def load(cls, fpath, state_ptr, state_data):
+        with open(fpath, "rb") as file:
+            magic, version, num_nodes, bits = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{fpath} is not a state index (version {VERSION}).")
+
+        def memmap(dtype, offset, length):
+            if length == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(fpath, dtype=dtype, mode="r", offset=offset, shape=(length,))
+
+        offset = HEADER.size
+        directory = memmap(np.int64, offset, 2 ** bits + 1)
+        offset += directory.nbytes
+        fps = memmap(np.uint64, offset, num_nodes)
+        offset += fps.nbytes
+        nodes = memmap(np.int32, offset, num_nodes)
+        return cls(directory, fps, nodes, bits, state_ptr, state_data)
+
+    def __len__(self):
+        return len(self._fps)
+
+    def candidates(self, seq):
+        """ Returns node ids whose state has the fingerprint of the encoded state `seq`. """
+        fp = fingerprint(seq)
+        bucket = fp >> self._shift
+        fps, nodes = self._fps, self._nodes
+        return [nodes.item(idx) for idx in range(self._directory.item(bucket), self._directory.item(bucket + 1))
+                if fps.item(idx) == fp]
+
+    def lookup(self, seq):
+        """ Returns the node whose encoded state equals `seq`, or None. """
+        seq = list(seq)
+        for uid in self.candidates(seq):
+            if self._state_data[self._state_ptr.item(uid):self._state_ptr.item(uid + 1)].tolist() == seq:
+                return uid
+        return None
+
+
+def open_index(path, state_ptr, state_data):
+    """ Opens the index of the graph store at `path`, building (and, if possible, saving) it if missing. """
+    fpath = os.path.join(path, FILENAME)
+    if os.path.exists(fpath):
+        index = StateIndex.load(fpath, state_ptr, state_data)
+        if len(index) == len(state_ptr) - 1:
+            return index
+        logger.warning(f"State index {fpath} does not match the graph store. Rebuilding it.")
+    try:
+        return build(state_ptr, state_data, fpath)
+    except OSError:
+        return build(state_ptr, state_data)
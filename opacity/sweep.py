@@ -0,0 +1,241 @@
+"""
+Parameter sweeps of the UAV/UGV gridworld (`ex14_5x5_UAV_UGV.RndGridworld`) driven by a JSON config.
+
+The sweep is the Cartesian product of the lists in the config. Example:
+    {
+        "name": "sensor_sweep",
+        "directory": "out/sweep",
+        "dims": [[5, 5]],
+        "goal_sets": [[[0, 4], [1, 1], [3, 3]]],
+        "obstacles": [[]],
+        "sensor_ranges": [0, 1, 2],
+        "formulas": ["F((g0) & F(g1 | g2))"],
+        "p2_walkable": "ring",
+        "init_states": {"p1": "all", "p2": [0, 0], "turn": 1},
+        "max_workers": 4,
+        "config": {"tabular_arena": true}
+    }
+    - p2_walkable: "ring" (boundary cells of the grid) or a list of cells. P2 moves between adjacent walkable cells.
+    - init_states: list of states [p1r, p1c, p2r, p2c, turn], or {"p1": "all" | [[r, c], ...], "p2": [r, c],
+      "turn": 1}. Initial states with P1 on an obstacle or P2 outside the walkable cells are skipped.
+    - config: overrides of `run_experiment.DEFAULT_CONFIG` and `BASE_CONFIG` for every job.
+    - share_memory (optional, default false): give jobs without a "memory_budget" an equal share of memory.
+
+Identical jobs are run once. Sensor ranges beyond the grid diameter observe the same as the diameter, so they are
+clipped before deduplication. Every job writes to its own directory named after its parameters, so rerunning a
+sweep reuses existing belief graphs and solutions (see `run_experiment`).
+
+Jobs on the same arena (same dynamics, see `RndGridworld.dynamics_key`; only formula and initial state differ)
+are grouped into tasks that run in one worker one after the other, so that the arena tables and belief layer are
+built once per task (see `models.ArenaRegistry`). Groups are split into chunks of at most
+ceil(jobs / max_workers) jobs, so that a sweep over one arena still uses all workers.
+
+Tasks run in a process pool with at most `max_workers` processes and `2 * max_workers` tasks in flight.
+With "share_memory", each job gets an equal share of memory as its memory budget. Results are appended to
+`<name>_results.jsonl` as tasks finish, and collected into the table `<name>_results.csv`.
+
+Usage (from `opacity/`):
+    python sweep.py config.json [--max-workers 4] [--dry-run]
+"""
+import argparse
+import collections
+import concurrent.futures
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+
+import budget as mem_budget
+import dfa_cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Defaults of sweep jobs on top of `run_experiment.DEFAULT_CONFIG`: workers share translated formulas on disk.
+BASE_CONFIG = {
+    "dfa_cache": dfa_cache.DEFAULT_DIRECTORY,
+}
+
+
+def ring(dim):
+    rows, cols = dim
+    return [[r, c] for r, c in itertools.product(range(rows), range(cols))
+            if r in (0, rows - 1) or c in (0, cols - 1)]
+
+
+def p2_actions(walkable):
+    """ Enables the moves of P2 between adjacent walkable cells. """
+    import ggsolver.gridworld.util as gw_util
+
+    moves = [gw_util.GW_ACT_N, gw_util.GW_ACT_E, gw_util.GW_ACT_S, gw_util.GW_ACT_W]
+    cells = {tuple(cell) for cell in walkable}
+    return {cell: [act for act in moves if gw_util.move(cell, act) in cells] for cell in map(tuple, walkable)}
+
+
+def init_states(spec, dim, obstacles, walkable):
+    if isinstance(spec, list):
+        states = [tuple(state) for state in spec]
+    else:
+        p1_cells = itertools.product(range(dim[0]), range(dim[1])) if spec["p1"] == "all" else spec["p1"]
+        states = [(p1r, p1c, *spec["p2"], spec.get("turn", 1)) for p1r, p1c in p1_cells]
+
+    blocked = {tuple(cell) for cell in obstacles}
+    allowed = {tuple(cell) for cell in walkable}
+    return [state for state in states if state[0:2] not in blocked and state[2:4] in allowed]
+
+
+def job_name(params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:8]
+    dim = "x".join(map(str, params["dim"]))
+    return f"d{dim}_s{params['sensor_range']}_{'_'.join(map(str, params['init_state']))}_{digest}"
+
+
+def expand(sweep):
+    """ Returns the deduplicated list of jobs {"name", "params", "config"} of a sweep config. """
+    jobs = dict()
+    for dim, goals, obstacles, rng, formula in itertools.product(
+            sweep["dims"], sweep["goal_sets"], sweep.get("obstacles", [[]]), sweep["sensor_ranges"],
+            sweep["formulas"]):
+        walkable = ring(dim) if sweep.get("p2_walkable", "ring") == "ring" else sweep["p2_walkable"]
+        for s0 in init_states(sweep["init_states"], dim, obstacles, walkable):
+            params = {
+                "dim": list(dim),
+                "goals": [list(cell) for cell in goals],
+                "obstacles": sorted(list(cell) for cell in obstacles),
+                "sensor_range": min(rng, dim[0] + dim[1] - 2),
+                "formula": formula,
+                "p2_walkable": sorted(list(cell) for cell in walkable),
+                "init_state": list(s0),
+            }
+            name = job_name(params)
+            if name in jobs:
+                continue
+
+            config = {**copy.deepcopy(sweep.get("config", dict())), "filename": name,
+                      "directory": os.path.join(sweep["directory"], name)}
+            jobs[name] = {"name": name, "params": params, "config": config}
+    return list(jobs.values())
+
+
+def arena_key(params):
+    """ Parameters of a job that define its arena (all but formula and initial state). """
+    return json.dumps({key: value for key, value in params.items() if key not in ("formula", "init_state")},
+                      sort_keys=True)
+
+
+def tasks(jobs, max_workers):
+    """ Groups jobs by arena into lists of at most ceil(len(jobs) / max_workers) jobs. """
+    groups = collections.defaultdict(list)
+    for job in jobs:
+        groups[arena_key(job["params"])].append(job)
+    chunk_size = max(1, math.ceil(len(jobs) / max(max_workers, 1)))
+    return [group[start:start + chunk_size] for group in groups.values()
+            for start in range(0, len(group), chunk_size)]
+
+
+def run_task(task):
+    """ Runs the jobs of a task (same arena) one after the other in a worker process. Returns their records. """
+    return [run_job(job) for job in task]
+
+
+def run_job(job):
+    """ Runs one job in a worker process. Returns its metrics record with the job parameters. """
+    import ex14_5x5_UAV_UGV as ex14
+    import run_experiment as exp
+
+    params = job["params"]
+    config = {**exp.DEFAULT_CONFIG, **BASE_CONFIG, **job["config"]}
+    os.makedirs(config["directory"], exist_ok=True)
+    try:
+        game = ex14.RndGridworld(
+            dim=tuple(params["dim"]),
+            goal_cells=[tuple(cell) for cell in params["goals"]],
+            obs=[tuple(cell) for cell in params["obstacles"]],
+            sense_rng=params["sensor_range"],
+            formula=params["formula"],
+            p2_walkable=[tuple(cell) for cell in params["p2_walkable"]],
+            p2_acts=p2_actions(params["p2_walkable"]),
+        )
+        s0 = tuple(params["init_state"])
+        game.initialize(s0)
+        record = exp.run_experiment(game, {s0}, config, progress=None)
+    except Exception as err:
+        logger.exception(f"Job {job['name']} failed.")
+        record = {"name": job["name"], "status": f"error:{type(err).__name__}", "error": str(err)}
+    return {**record, "params": params}
+
+
+def flatten(record):
+    row = metrics.flatten({key: value for key, value in record.items() if key != "params"})
+    row.update({f"params.{key}": json.dumps(value) if isinstance(value, list) else value
+                for key, value in record["params"].items()})
+    return row
+
+
+def write_table(records, fpath):
+    rows = [flatten(record) for record in records]
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    with open(fpath, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run(sweep, max_workers=None):
+    """ Runs all jobs of a sweep config and returns their records. """
+    max_workers = max_workers or sweep.get("max_workers") or os.cpu_count()
+    jobs = expand(sweep)
+    job_tasks = tasks(jobs, max_workers)
+    logger.info(f"Sweep {sweep['name']}: {len(jobs)} jobs in {len(job_tasks)} tasks on {max_workers} workers.")
+
+    # Share memory among workers, if asked to and unless the config sets a budget.
+    if sweep.get("share_memory", False):
+        for job in jobs:
+            job["config"].setdefault("memory_budget", mem_budget.per_worker_budget(max_workers))
+
+    os.makedirs(sweep["directory"], exist_ok=True)
+    records = []
+    fpath = os.path.join(sweep["directory"], f"{sweep['name']}_results.jsonl")
+    with open(fpath, "a") as file, concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        def collect(done):
+            for future in done:
+                for record in future.result():
+                    records.append(record)
+                    file.write(json.dumps(record, default=str) + "\n")
+                    logger.info(f"[{len(records)}/{len(jobs)}] {record['name']}: {record['status']}")
+                file.flush()
+
+        pending = set()
+        for task in job_tasks:
+            if len(pending) >= 2 * max_workers:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(run_task, task))
+        collect(concurrent.futures.as_completed(pending))
+
+    write_table(records, os.path.join(sweep["directory"], f"{sweep['name']}_results.csv"))
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="Sweep config (JSON).")
+    parser.add_argument("--max-workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--dry-run", action="store_true", help="List jobs without running them.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(processName)s:: %(message)s")
+
+    with open(args.config, "r") as file:
+        sweep_config = json.load(file)
+    if args.dry_run:
+        for sweep_job in expand(sweep_config):
+            print(sweep_job["name"], json.dumps(sweep_job["params"]))
+        sys.exit(0)
+
+    results = run(sweep_config, args.max_workers)
+    sys.exit(0 if all(result["status"] == "done" for result in results) else 1)
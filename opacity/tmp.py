@@ -1,18 +1,14 @@
 import itertools
 
-import ggsolver.graph as ggraph
-import ggsolver.dtptb.pgsolver as dtptb
+import mmgraph
+import retarget
 
 if __name__ == '__main__':
     for i, j in itertools.product(range(5), range(5)):
-        graph = ggraph.Graph.load(f"out/ex14_5x5wumpus/{i}_{j}/ex14_5x5wumpus_{i}_{j}_p1.ggraph")
-        final = set()
-        for uid in graph.nodes():
-            if graph["state"][uid][1] == 0:
-                final.add(graph["state"][uid])
-        swin = dtptb.SWinReach(graph, final)
-        swin.solve()
+        view = mmgraph.GraphView(f"out/ex14_5x5wumpus/{i}_{j}/ex14_5x5wumpus_{i}_{j}.gstore")
+        solver = retarget.ReachSolver(view)
+        solver.solve(view.node_aut_states() == 0)
 
-        v0 = graph["init_state"]
+        v0 = view.init_node()
 
-        print((i, j), swin.state_winner(v0))
\ No newline at end of file
+        print((i, j), solver.node_winner(v0))
@@ -0,0 +1,152 @@
+"""
+Online tracking of the attacker's belief while executing a strategy.
+
+`BeliefTracker` follows the belief state (s, q, b) of `models.BeliefGame` from the actual moves, without the
+belief graph: each step applies `BeliefGame.delta` to the current state only, using the tables of a
+`models.TabularArena` (successors grouped by observation, see `models.BeliefLayer.post_ids`) and a table of
+automaton steps per (automaton state, label). Beliefs are kept as element ids s_b * num_aut_states + q_b in two
+preallocated buffers, so a step costs O(belief size * branching) and allocates nothing that grows with the run.
+
+With a solved graph store (`mmgraph.GraphView` with an attached solution), `winning_actions` answers P1's
+winning actions in the current belief state through a single index lookup.
+
+    tracker = BeliefTracker(game, aut, view=view)
+    tracker.reset()
+    tracker.winning_actions()
+    tracker.step(act, next_state)
+"""
+import logging
+
+import models as opac_models
+
+logger = logging.getLogger(__name__)
+
+
+class BeliefTracker:
+    def __init__(self, arena, aut, view=None):
+        """
+        :param arena: (Arena) Arena of the belief game. Tabulated if it is not a `models.TabularArena`.
+        :param aut: P1's automaton (`logic.automata.DFA` or `dfa_cache.CompiledDFA`).
+        :param view: (mmgraph.GraphView) Solved belief game for winning-action queries, or None.
+        """
+        self._arena = arena = opac_models.tabulate(arena)
+        self._layer = opac_models.BeliefLayer.of(arena)
+        self._aut = aut
+        self._view = view
+
+        # Automaton tables: step[qid][label id], final flag per qid. Missing transitions (None) lead to a rejecting
+        # sink with automaton state None, as in `models.BeliefGame.delta`.
+        self._aut_states = list(aut.states())
+        steps = [[aut.delta(q, label) for label in arena.labels] for q in self._aut_states]
+        if any(p is None for row in steps for p in row):
+            self._aut_states.append(None)
+            steps.append([None] * len(arena.labels))
+        self._qid = {q: qid for qid, q in enumerate(self._aut_states)}
+        self._aut_step = [[self._qid[p] for p in row] for row in steps]
+        self._aut_final = [q is not None and 0 in aut.final(q) for q in self._aut_states]
+        self._label_ids = [arena.label_id(sid) for sid in range(len(arena.states_list))]
+
+        # Belief buffers (current, next) and membership marks over all elements.
+        num_elements = len(arena.states_list) * len(self._aut_states)
+        self._cur = [0] * num_elements
+        self._nxt = [0] * num_elements
+        self._mark = bytearray(num_elements)
+        self._size = 0
+        self._sid = self._qid_cur = None
+        self.reset()
+
+    def reset(self, state=None):
+        """
+        Resets the tracker to a belief state (s, q, b) of the belief game. Default: its initial state.
+        """
+        if state is None:
+            s0, q0 = self._arena.init_state(), self._aut.init_state()
+            state = (s0, q0, ((s0, q0),))
+        s, q, b = state
+        num_q = len(self._aut_states)
+        self._sid, self._qid_cur = self._arena.state_id(s), self._qid[q]
+        self._size = 0
+        for s_b, q_b in b:
+            self._cur[self._size] = self._arena.state_id(s_b) * num_q + self._qid[q_b]
+            self._size += 1
+
+    def state(self):
+        """ Returns the current belief state as in `models.BeliefGame` (sorted belief tuple). """
+        states, aut_states, num_q = self._arena.states_list, self._aut_states, len(self._aut_states)
+        b = tuple(sorted(((states[e // num_q], aut_states[e % num_q]) for e in self._cur[:self._size]),
+                         key=opac_models.belief_key))
+        return states[self._sid], aut_states[self._qid_cur], b
+
+    def belief_size(self):
+        return self._size
+
+    def turn(self):
+        return int(self._arena.turn_table[self._sid])
+
+    def is_final(self):
+        """ P1's objective is met in the current state (the state is absorbing, as in `BeliefGame.delta`). """
+        return self._aut_final[self._qid_cur]
+
+    def step(self, act, next_state=None):
+        """
+        Updates the belief state with the transition of the arena under `act`.
+
+        :param act: Action played. None if only `next_state` is known (e.g. P2's move); the action is then inferred.
+        :param next_state: Observed next arena state, checked against the arena's transition.
+        :return: New arena state.
+        """
+        if self._aut_final[self._qid_cur]:
+            return self._arena.states_list[self._sid]
+
+        arena = self._arena
+        sid = self._sid
+        if act is None:
+            tid = arena.state_id(next_state)
+            aid = next((aid for aid, tid_, _ in arena.successors(sid) if tid_ == tid), None)
+            if aid is None:
+                raise ValueError(f"{next_state} is not a successor of {arena.states_list[sid]}.")
+        else:
+            aid = arena.act2id[act]
+            tid = arena.next_id(sid, aid)
+            if tid < 0:
+                raise ValueError(f"Action {act} is not enabled in {arena.states_list[sid]}.")
+            if next_state is not None and arena.states_list[tid] != next_state:
+                raise ValueError(f"Observed {next_state}, but {act} leads to {arena.states_list[tid]}.")
+
+        # Belief update: successors of belief elements with the same observation (see BeliefGame.delta).
+        o = arena.obs_id(sid, aid)
+        num_q, aut_step, label_ids = len(self._aut_states), self._aut_step, self._label_ids
+        post_ids, mark, nxt = self._layer.post_ids, self._mark, self._nxt
+        size = 0
+        for idx in range(self._size):
+            s_b, q_b = divmod(self._cur[idx], num_q)
+            row = aut_step[q_b]
+            for t_b in post_ids(s_b, o):
+                element = t_b * num_q + row[label_ids[t_b]]
+                if not mark[element]:
+                    mark[element] = 1
+                    nxt[size] = element
+                    size += 1
+        for idx in range(size):
+            mark[nxt[idx]] = 0
+
+        self._cur, self._nxt, self._size = nxt, self._cur, size
+        self._qid_cur = aut_step[self._qid_cur][label_ids[tid]]
+        self._sid = tid
+        return arena.states_list[tid]
+
+    # ============================================================================================
+    # Solution queries
+    # ============================================================================================
+    def node(self):
+        """ Returns the node of the current belief state in the solved graph store. """
+        if self._view is None:
+            raise ValueError("No solved graph store given to the tracker.")
+        return self._view.state2node(self.state())
+
+    def node_winner(self):
+        return self._view.node_winner(self.node())
+
+    def winning_actions(self):
+        """ Returns P1's winning actions in the current belief state (empty outside P1's winning region). """
+        return self._view.winning_actions(self.node())
@@ -0,0 +1,77 @@
+"""
+Shared helpers of the tests. Modules of `opacity/` are imported flat, as the experiment scripts do.
+"""
+import collections
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "opacity"))
+
+import mmgraph  # noqa: E402
+import retarget  # noqa: E402
+
+Solved = collections.namedtuple("Solved", ["view", "solver", "turn", "final", "edges"])
+
+
+def random_graph(num_nodes, seed=0, max_degree=3, final_rate=0.1):
+    """
+    Returns (states, turn, final, edges) of a random belief graph without dead ends.
+    Node states (s, q, b) are distinct; edges[uid] lists (vid, act) with distinct actions per node.
+    """
+    rng = random.Random(seed)
+    states, turn, final, edges = [], [], [], []
+    for uid in range(num_nodes):
+        s, q = (uid % 5, uid // 5), uid % 3
+        extra = {((rng.randrange(5), rng.randrange(4)), rng.randrange(3)) for _ in range(rng.randrange(3))}
+        states.append((s, q, tuple(sorted({(s, q)} | extra))))
+        turn.append(rng.choice([1, 2]))
+        final.append(rng.random() < final_rate)
+        edges.append([(rng.randrange(num_nodes), f"a{k}") for k in range(rng.randint(1, max_degree))])
+    return states, turn, final, edges
+
+
+def write_store(path, states, turn, final, edges, belief=True, init_node=0, buffer_size=16):
+    """ Writes a graph store node by node (small buffers, so that flushing is exercised) and opens it. """
+    with mmgraph.GraphStoreWriter(path, belief=belief, buffer_size=buffer_size) as writer:
+        for uid in range(len(states)):
+            writer.add_node(states[uid], turn[uid], final[uid], edges[uid])
+        writer.close(init_node=init_node)
+    return mmgraph.GraphView(path)
+
+
+def solve(view, fpath, target=None):
+    """ Solves P1's reachability game of a graph store, saves the solution to `fpath` and attaches it. """
+    solver = retarget.ReachSolver(view)
+    solver.solve(target)
+    solver.save(fpath)
+    view.attach_solution(fpath)
+    return solver
+
+
+@pytest.fixture
+def graph():
+    return random_graph(200, seed=1)
+
+
+@pytest.fixture
+def store(tmp_path, graph):
+    return write_store(str(tmp_path / "g.gstore"), *graph)
+
+
+@pytest.fixture
+def solved_graph():
+    """ Graph of the `solved` fixture. Test modules override it to vary the graph. """
+    return random_graph(300, seed=4, final_rate=0.05)
+
+
+@pytest.fixture
+def solved(tmp_path, solved_graph):
+    """ Graph store of `solved_graph` with P1's reachability solution attached. """
+    states, turn, final, edges = solved_graph
+    view = write_store(str(tmp_path / "g.gstore"), states, turn, final, edges)
+    solver = solve(view, str(tmp_path / "g_p1.wsol"))
+    return Solved(view, solver, turn, np.asarray(final, dtype=bool), edges)
@@ -0,0 +1,103 @@
+import array
+import random
+
+import pytest
+
+import beliefstore
+
+
+def _random_beliefs(count, seed=0):
+    rng = random.Random(seed)
+    return [tuple(sorted({((rng.randrange(6), rng.randrange(6)), rng.randrange(3)) for _ in range(rng.randrange(6))}))
+            for _ in range(count)]
+
+
+def test_varints():
+    values = [0, 1, 127, 128, 255, 300, 16383, 16384, 2 ** 31, 2 ** 40 + 5]
+    out = bytearray()
+    for value in values:
+        beliefstore._write_varint(out, value)
+    assert beliefstore.read_varints(out) == values
+
+    pos, decoded = 0, []
+    while pos < len(out):
+        value, pos = beliefstore._read_varint(out, pos)
+        decoded.append(value)
+    assert decoded == values
+    assert len(out) == 1 + 1 + 1 + 2 + 2 + 2 + 2 + 3 + 5 + 6
+
+
+def test_encode_ids():
+    ids = [0, 3, 4, 200, 201, 70000]
+    data = beliefstore.encode_ids(ids)
+    assert beliefstore.decode_ids(data) == ids
+    assert beliefstore.decode_ids(beliefstore.encode_ids([])) == []
+
+    # Appends to the given buffer.
+    out = bytearray(b"\x05")
+    beliefstore.encode_ids([1, 2], out)
+    assert beliefstore.read_varints(out) == [5, 1, 1]
+
+
+def test_state_keys():
+    keys = beliefstore.StateKeys()
+    states = [(s, q, b) for b in _random_beliefs(50) for s, q in [((0, 1), 2), ((5, 5), 0)]]
+    encoded = [keys.key(state) for state in states]
+    assert [keys.state(key) for key in encoded] == states
+    assert len(set(encoded)) == len(set(states))
+    assert keys.key(((0, 1), 2, ())) == keys.key(((0, 1), 2, ()))
+
+
+def test_store_dedup():
+    store = beliefstore.BeliefStore()
+    beliefs = _random_beliefs(300)
+    bids = [store.add(belief) for belief in beliefs]
+    assert len(store) == len(set(beliefs))
+    assert sorted(set(bids)) == list(range(len(store)))
+    for bid, belief in zip(bids, beliefs):
+        assert store.get(bid) == belief
+    # Element order within the given belief does not matter.
+    assert store.add(tuple(reversed(beliefs[1]))) == bids[1]
+
+
+@pytest.mark.parametrize("compression", ["zlib", "lzma", None])
+def test_save_load(tmp_path, compression):
+    store = beliefstore.BeliefStore(block_size=16)
+    beliefs = _random_beliefs(200, seed=1)
+    bids = [store.add(belief) for belief in beliefs]
+    extra = {"ids": array.array("q", bids), "raw": b"abc"}
+    fpath = str(tmp_path / "beliefs.blst")
+    assert store.save(fpath, compression=compression, extra=extra) > 0
+
+    loaded, loaded_extra = beliefstore.BeliefStore.load(fpath)
+    assert len(loaded) == len(store)
+    assert loaded_extra == extra
+    # Access blocks out of order, more than the block cache holds.
+    for bid in sorted(range(len(store)), key=lambda uid: (uid * 7) % len(store)):
+        assert loaded.get(bid) == store.get(bid)
+    assert len(loaded._cache) <= loaded._cache_size
+    with pytest.raises(ValueError):
+        loaded.add(beliefs[0])
+
+
+def test_empty_store(tmp_path):
+    fpath = str(tmp_path / "empty.blst")
+    beliefstore.BeliefStore().save(fpath)
+    loaded, extra = beliefstore.BeliefStore.load(fpath)
+    assert len(loaded) == 0 and extra == dict()
+
+
+def test_bad_file(tmp_path):
+    fpath = tmp_path / "bad.blst"
+    fpath.write_bytes(beliefstore.HEADER.pack(b"NOPE", beliefstore.VERSION, 0))
+    with pytest.raises(ValueError):
+        beliefstore.BeliefStore.load(str(fpath))
+
+
+def test_from_view(store):
+    belief_store, node_head, node_belief = beliefstore.from_view(store, block_size=8)
+    elements = belief_store.keys.elements
+    for uid in range(store.number_of_nodes()):
+        s, q, b = store.state(uid)
+        assert elements[node_head[uid]] == (s, q)
+        assert belief_store.get(node_belief[uid]) == b
@@ -0,0 +1,78 @@
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("ggsolver")
+
+import bench_scaling as bench  # noqa: E402
+
+
+def test_make_formula():
+    assert bench.make_formula("conj", 1) == "F(g0)"
+    assert bench.make_formula("conj", 3) == "F(g0) & F(g1) & F(g2)"
+    assert bench.make_formula("seq", 1) == "F(g0)"
+    assert bench.make_formula("seq", 3) == "F(g0 & F(g1 & F(g2)))"
+
+
+def test_gridworld_instances():
+    instances = list(bench.gridworld_instances([(3, 4)], [1], [1, 2], ["conj", "seq"]))
+
+    # One goal gives the same formula for both kinds.
+    assert [params["formula"] for params, _, _ in instances] == ["F(g0)", "F(g0) & F(g1)", "F(g0 & F(g1))"]
+    game = instances[-1][1]
+    assert game.init_state() == (2, 0, 0, 0, 1)
+    ring = set(game._p2_walkable)
+    assert len(ring) == 10 and (1, 1) not in ring
+    for (r, c), acts in game._p2_acts.items():
+        assert all((r + bench.MOVES[act][0], c + bench.MOVES[act][1]) in ring for act in acts)
+
+
+def test_run_instance(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # BeliefGame logs large beliefs to the working directory
+    params, game, formula = next(bench.toy_instances())
+    timings, sizes = bench.run_instance(game, formula, str(tmp_path))
+    assert set(timings) == {"translate", "graphify", "delta", "solve_p1", "solve_p2", "save_ggraph", "save_gstore",
+                            "save_solution"}
+    assert all(value >= 0 for value in timings.values())
+    assert sizes["nodes"] > 0 and sizes["edges"] > 0
+
+
+def test_compare():
+    previous = {"timings": {"graphify": 1.0, "solve_p1": 2.0, "delta": 0.0}}
+    record = {"timings": {"graphify": 1.2, "solve_p1": 3.0, "delta": 1.0, "save_gstore": 1.0}}
+    assert bench.compare(record, None, 1.25) == dict()
+    assert bench.compare(record, previous, 1.25) == {"solve_p1": 1.5}
+    assert bench.compare(record, previous, 1.1) == {"graphify": pytest.approx(1.2), "solve_p1": 1.5}
+
+
+def test_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging.root, "level", logging.root.level)     # main sets the root level
+    timings = {"graphify": 1.0, "solve_p1": 1.0}
+    monkeypatch.setattr(bench, "toy_instances", lambda: iter([({"arena": "fake", "dim": [2, 2]}, None, None)]))
+    monkeypatch.setattr(bench, "gridworld_instances", lambda *args: iter([]))
+    monkeypatch.setattr(bench, "run_instance", lambda game, formula, workdir: (dict(timings), {"nodes": 1}))
+    history = str(tmp_path / "bench" / "history.jsonl")
+
+    # Each run appends a record per instance and compares it with the last record of the instance.
+    assert bench.main(quick=True, history=history) == 0
+    timings["solve_p1"] = 2.0
+    assert bench.main(quick=True, history=history) == 1
+    assert bench.main(quick=True, history=history, threshold=2.5) == 0
+    with open(history, "r") as file:
+        records = [json.loads(line) for line in file]
+    assert len(records) == 3 and records[1]["timings"]["solve_p1"] == 2.0
+    assert bench.load_history(history) == {bench.instance_key({"dim": [2, 2], "arena": "fake"}): records[-1]}
+
+
+def test_time_delta_is_cold(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _, game, formula = next(bench.toy_instances())
+    aut = formula.translate()
+    graph = bench.opac_models.BeliefGame(game, aut).graphify(pointed=True)
+    warm = bench.opac_models.BeliefLayer.of(game)
+
+    # Timing starts from a new layer, not the one filled by graphify.
+    assert bench.time_delta(game, aut, graph) > 0
+    cold = bench.opac_models.BeliefLayer.of(game)
+    assert cold is not warm and cold.stats()["misses"] > 0
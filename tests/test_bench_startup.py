@@ -0,0 +1,48 @@
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import bench_startup
+
+# Modules that import without ggsolver; the rest are covered when it is installed.
+LIGHT_MODULES = ["mmgraph", "solution", "simulate", "retarget", "export", "dfa_cache", "explorer"]
+GGSOLVER_MODULES = [module for module in bench_startup.MODULES if module not in LIGHT_MODULES]
+needs_ggsolver = pytest.mark.skipif(importlib.util.find_spec("ggsolver") is None, reason="ggsolver not installed")
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES + [pytest.param(module, marks=needs_ggsolver)
+                                                    for module in GGSOLVER_MODULES])
+def test_import_is_clean(module):
+    result = bench_startup.measure(module, 1, 0.0)
+    assert "error" not in result
+    assert result["files"] == []
+    assert not set(result["heavy"]) & set(bench_startup.FORBIDDEN)
+
+
+@pytest.mark.parametrize("module", ["explorer", "dfa_cache"])
+def test_numpy_is_lazy(module):
+    assert "numpy" not in bench_startup.measure(module, 1, 0.0)["heavy"]
+
+
+@needs_ggsolver
+@pytest.mark.parametrize("module", ["models", "ex1_toy", "ex14_5x5_UAV_UGV"])
+def test_import_leaves_logging_alone(module, tmp_path):
+    # Logging is configured by the entry points, not at import.
+    code = f"import logging, {module}; print(len(logging.root.handlers), logging.root.level)"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(bench_startup.__file__),
+                                                                    os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split() == ["0", str(logging.WARNING)]
+    assert os.listdir(tmp_path) == []
+
+
+def test_main(capsys):
+    assert bench_startup.main(["mmgraph", "dfa_cache"], repeat=1, max_ms=float("inf")) == 0
+    assert bench_startup.main(["no_such_module"], repeat=1) == 1
+    assert bench_startup.main(["dfa_cache"], repeat=1, max_ms=-1.0) == 1
+    assert "slower than" in capsys.readouterr().out
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+import budget as mem_budget
+import metrics
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """ Fake resident set size (bytes), as measured by `metrics.current_rss`. """
+    value = {"rss": 100 * 2 ** 20}
+    monkeypatch.setattr(metrics, "current_rss", lambda: value["rss"])
+    return value
+
+
+def test_parse_size():
+    assert mem_budget.parse_size(None) is None
+    assert mem_budget.parse_size(4096) == 4096
+    assert mem_budget.parse_size("512M") == 512 * 2 ** 20
+    assert mem_budget.parse_size("1.5gb") == int(1.5 * 2 ** 30)
+    assert mem_budget.parse_size("100") == 100
+
+
+def test_policies():
+    with pytest.raises(ValueError):
+        mem_budget.MemoryBudget("1G", policy="swap")
+    with pytest.raises(ValueError):
+        mem_budget.MemoryBudget("1G", policy="checkpoint")
+    assert mem_budget.MemoryBudget.from_config({"memory_budget": None}) is None
+    budget = mem_budget.MemoryBudget.from_config({"memory_budget": "1G", "directory": "out", "filename": "g"})
+    assert budget.policy == "abort" and budget.checkpoint == os.path.join("out", "g.ckpt")
+
+
+def test_check(rss):
+    budget = mem_budget.MemoryBudget("150M")
+    budget.check()
+    rss["rss"] = 200 * 2 ** 20
+    with pytest.raises(mem_budget.MemoryBudgetExceeded) as err:
+        budget.check("here")
+    assert err.value.rss == rss["rss"]
+
+
+def test_rebased(rss):
+    budget = mem_budget.MemoryBudget("150M", policy="stream")
+
+    # Memory freed after an abort stays with the process: the rebased budget keeps the original headroom.
+    rss["rss"] = 400 * 2 ** 20
+    rebased = budget.rebased()
+    assert rebased.limit == 450 * 2 ** 20 and rebased.policy == "stream"
+    assert rebased.exceeded() is None
+    rss["rss"] = 460 * 2 ** 20
+    assert rebased.exceeded() == rss["rss"]
+
+    # RSS below the baseline does not lower the budget.
+    rss["rss"] = 50 * 2 ** 20
+    assert budget.rebased().limit == budget.limit
+
+
+def test_hard_limit():
+    assert mem_budget.apply_hard_limit(None) is None
+    previous = mem_budget.apply_hard_limit(2 ** 40)
+    try:
+        assert mem_budget.resource.getrlimit(mem_budget.resource.RLIMIT_AS)[0] <= 2 ** 40
+    finally:
+        mem_budget.restore_limit(previous)
+    assert mem_budget.resource.getrlimit(mem_budget.resource.RLIMIT_AS) == previous
+
+
+def test_stream_fallback(tmp_path, rss, monkeypatch):
+    pytest.importorskip("ggsolver")
+    import ex1_toy
+    import explorer
+    import run_experiment as exp
+
+    # The in-memory exploration exceeds the budget and leaves RSS high, as freed memory is not returned.
+    def graphify(self, init_set=None, resume=None):
+        rss["rss"] = 400 * 2 ** 20
+        raise mem_budget.MemoryBudgetExceeded("Memory budget exceeded during exploration.")
+
+    monkeypatch.setattr(explorer.BeliefExplorer, "graphify", graphify)
+    game = ex1_toy.MyGame()
+    game.initialize(0)
+    config = {**exp.DEFAULT_CONFIG, "directory": str(tmp_path), "filename": "toy", "formula": "F(p1) & F(p3)",
+              "memory_budget": "150M", "memory_policy": "stream"}
+    record = exp.run_experiment(game, {0}, config, progress=None)
+
+    assert record["status"] == "done"
+    assert "stream_fallback" in record
+    assert os.path.exists(tmp_path / "toy.gstore" / "meta.json")
+    assert os.path.exists(tmp_path / "toy_p1.wsol") and os.path.exists(tmp_path / "toy_p2.wsol")
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import dfa_cache
+
+
+class _DFA:
+    """ Counts the goals still to visit: q = set of pending goals. No transition from the sink "x". """
+    def __init__(self, goals):
+        self._goals = frozenset(goals)
+
+    def states(self):
+        return [frozenset(), self._goals, "x"]
+
+    def init_state(self):
+        return self._goals
+
+    def delta(self, q, label):
+        if q == "x" or "bad" in label:
+            return None if q == "x" else "x"
+        return frozenset() if self._goals <= set(label) or q == frozenset() else q
+
+    def final(self, q):
+        return [0] if q == frozenset() else [-1]
+
+
+class _Formula:
+    def __init__(self, text, atoms):
+        self.text = text
+        self._atoms = atoms
+        self.translations = 0
+
+    def __str__(self):
+        return self.text
+
+    def atoms(self):
+        return self._atoms
+
+    def translate(self):
+        self.translations += 1
+        return _DFA(["g0", "g1"])
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache(monkeypatch):
+    monkeypatch.setattr(dfa_cache, "_compiled", dict())
+
+
+def test_compiled_delta():
+    formula = _Formula("F(g0 & g1)", ["g0", "g1", "bad"])
+    aut, reference = dfa_cache.translate(formula), _DFA(["g0", "g1"])
+    assert aut.init_state() == reference.init_state()
+    assert aut.atoms() == sorted(formula.atoms())
+    for q in reference.states():
+        assert aut.final(q) == reference.final(q)
+        for label in [[], ["g0"], ["g0", "g1"], ["g1", "bad"], ["unknown"]]:
+            assert aut.delta(q, label) == reference.delta(q, [atom for atom in label if atom != "unknown"])
+
+
+def test_memory_cache():
+    formula = _Formula("F(g0 & g1)", ["g0", "g1"])
+    assert dfa_cache.translate(formula) is dfa_cache.translate(formula)
+    assert formula.translations == 1
+
+
+def test_warm_directory_skips_translation(tmp_path, monkeypatch):
+    directory = str(tmp_path / "dfa")
+    first = _Formula("F(g0 & g1)", ["g0", "g1"])
+    aut = dfa_cache.translate(first, directory=directory)
+    assert first.translations == 1
+    assert len(os.listdir(directory)) == 1
+
+    # A new process: nothing in memory, the translator must not be called.
+    monkeypatch.setattr(dfa_cache, "_compiled", dict())
+    second = _Formula("F(g0 & g1)", ["g1", "g0"])
+    loaded = dfa_cache.translate(second, directory=directory)
+    assert second.translations == 0
+    assert loaded.to_dict() == aut.to_dict()
+
+
+def test_unreadable_cache_file(tmp_path):
+    directory = tmp_path / "dfa"
+    directory.mkdir()
+    formula = _Formula("F(g0)", ["g0"])
+    (directory / f"{dfa_cache.cache_key(formula, formula.atoms())}.dfa").write_bytes(b"garbage")
+    aut = dfa_cache.translate(formula, directory=str(directory))
+    assert formula.translations == 1
+    assert aut.states() == _DFA(["g0", "g1"]).states()
+
+
+def test_too_many_atoms():
+    formula = _Formula("F(many)", [f"g{idx}" for idx in range(dfa_cache.MAX_ATOMS + 1)])
+    assert isinstance(dfa_cache.translate(formula), _DFA)
@@ -0,0 +1,78 @@
+import collections
+
+import pytest
+
+pytest.importorskip("ggsolver")
+
+import budget as mem_budget  # noqa: E402
+import dfa_cache  # noqa: E402
+import ex1_toy  # noqa: E402
+import explorer  # noqa: E402
+import metrics  # noqa: E402
+import mmgraph  # noqa: E402
+import models as opac_models  # noqa: E402
+
+
+@pytest.fixture
+def game(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # BeliefGame logs large beliefs to the working directory
+    arena = ex1_toy.MyGame()
+    arena.initialize(0)
+    return opac_models.BeliefGame(arena, dfa_cache.translate(arena.formula()))
+
+
+def _describe(game, graph):
+    """ Returns node states with their properties, edges with their properties, and graph properties. """
+    state = graph["state"]
+    nodes = {state[uid]: {name: graph[name][uid] for name in game.NODE_PROPERTY} for uid in graph.nodes()}
+    edges = collections.Counter(
+        (state[uid], graph["input"][uid, vid, key], state[vid],
+         tuple((name, graph[name][uid, vid, key]) for name in sorted(game.EDGE_PROPERTY)))
+        for uid, vid, key in graph.edges()
+    )
+    return nodes, edges, {name: graph[name] for name in game.GRAPH_PROPERTY}
+
+
+def test_graphify_matches_ggsolver(game):
+    graph = explorer.BeliefExplorer(game, progress=None).graphify()
+    expected = game.graphify(pointed=True)
+    assert graph.number_of_nodes() == expected.number_of_nodes()
+    assert graph.number_of_edges() == expected.number_of_edges()
+    assert _describe(game, graph) == _describe(game, expected)
+    assert graph["state"][0] == game.init_state()
+
+
+def test_checkpoint_resumes_to_same_graph(game, tmp_path, monkeypatch):
+    expected = _describe(game, explorer.BeliefExplorer(game, progress=None).graphify())
+
+    # The budget is exceeded at the first check, after 2 expansions.
+    monkeypatch.setattr(explorer, "CHECK_EVERY", 2)
+    monkeypatch.setattr(metrics, "current_rss", lambda: 2 ** 40)
+    checkpoint = str(tmp_path / "toy.ckpt")
+    budget = mem_budget.MemoryBudget("1G", policy="checkpoint", checkpoint=checkpoint)
+    with pytest.raises(mem_budget.MemoryBudgetExceeded) as err:
+        explorer.BeliefExplorer(game, progress=None, budget=budget).graphify()
+    assert err.value.checkpoint == checkpoint and err.value.partial["expanded"] == 2
+
+    graph = explorer.BeliefExplorer(game, progress=None).graphify(resume=checkpoint)
+    assert _describe(game, graph) == expected
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_write_store_matches_graphify(game, tmp_path, compact):
+    init_set = [game.init_state(), game.delta(game.init_state(), "a2")]
+    graph = explorer.BeliefExplorer(game, progress=None).graphify(init_set=init_set)
+    mmgraph.write_graph_store(graph, str(tmp_path / "graphify.gstore"))
+    expected = mmgraph.GraphView(str(tmp_path / "graphify.gstore"))
+
+    # Nodes are numbered in discovery order by both explorers.
+    view = explorer.BeliefExplorer(game, progress=None).write_store(str(tmp_path / "stream.gstore"),
+                                                                    init_set=init_set, buffer_size=3, compact=compact)
+    assert view.number_of_nodes() == expected.number_of_nodes()
+    assert view.number_of_edges() == expected.number_of_edges()
+    assert view.init_node() == expected.init_node() == 0
+    for uid in range(view.number_of_nodes()):
+        assert view.state(uid) == expected.state(uid) == graph["state"][uid]
+        assert view.node_turn(uid) == expected.node_turn(uid)
+        assert view.is_final(uid) == expected.is_final(uid)
+        assert [edge[1:] for edge in view.out_edges(uid)] == [edge[1:] for edge in expected.out_edges(uid)]
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pytest
+
+import export
+
+from conftest import random_graph
+
+
+def _normalize(value):
+    # JSON turns tuples into lists.
+    return json.loads(json.dumps(value))
+
+
+@pytest.fixture(params=[False, True], ids=["winners", "no-winners"])
+def solved_graph(request):
+    return random_graph(150, seed=3, final_rate=0.0 if request.param else 0.1)
+
+
+@pytest.mark.parametrize("chunk_size", [7, export.CHUNK_SIZE])
+def test_json_matches_vbin(solved, tmp_path, chunk_size):
+    view = solved.view
+    json_path, vbin_path = str(tmp_path / "s.json"), str(tmp_path / "s.vbin")
+    export.write_json(view, json_path, chunk_size=chunk_size)
+    export.write_vbin(view, vbin_path, chunk_size=chunk_size)
+    with open(json_path, "r") as file:
+        data = json.load(file)
+    vbin = export.read_vbin(vbin_path)
+
+    num_nodes = view.number_of_nodes()
+    arena, aut = vbin["symbols"]["arena_states"], vbin["symbols"]["aut_states"]
+    for uid in range(num_nodes):
+        seq = vbin["state_data"][vbin["state_ptr"][uid]:vbin["state_ptr"][uid + 1]].tolist()
+        b = [[arena[seq[i]], aut[seq[i + 1]]] for i in range(2, len(seq), 2)]
+        assert data["state"][str(uid)] == [arena[seq[0]], aut[seq[1]], b]
+    assert data["state"] == {str(uid): _normalize(view.state(uid)) for uid in range(num_nodes)}
+
+    actions = vbin["symbols"]["actions"]
+    transitions = dict()
+    for uid in range(num_nodes):
+        lo, hi = vbin["trans_ptr"][uid], vbin["trans_ptr"][uid + 1]
+        if hi > lo:
+            transitions[str(uid)] = {actions[act]: int(vid) for act, vid in vbin["trans"][lo:hi]}
+    assert data["transitions"] == transitions
+
+    assert data["win"] == np.flatnonzero(vbin["node_winner"] == 1).tolist()
+    assert data["init_state"] == vbin["init_node"] == view.init_node()
+
+
+def test_winning_transitions(solved):
+    view = solved.view
+    trans = dict(export.iter_winning_transitions(view, chunk_size=5))
+    for uid in range(view.number_of_nodes()):
+        expected = [(int(view.edge_act[eid]), int(view.succ_dst[eid]))
+                    for eid in range(*view.edge_range(uid)) if view.is_winning_edge(eid)]
+        assert trans.get(uid, []) == expected
+
+
+def test_bad_vbin(tmp_path):
+    fpath = tmp_path / "bad.vbin"
+    fpath.write_bytes(bytes(export.VBIN_HEADER.size))
+    with pytest.raises(ValueError):
+        export.read_vbin(str(fpath))
@@ -0,0 +1,156 @@
+import importlib.util
+import itertools
+
+import numpy as np
+import pytest
+
+import gridgen
+import sweep
+
+if importlib.util.find_spec("ggsolver") is not None:
+    import ex14_5x5_UAV_UGV as ex14
+    import models as opac_models
+
+# Moves of ggsolver.gridworld.util, with a diagonal that only P2 plays.
+MOVES = {"N": (1, 0), "E": (0, 1), "S": (-1, 0), "W": (0, -1), "NE": (1, 1)}
+
+
+class PlainGridworld:
+    """ `RndGridworld.states`, `enabled_acts`, `delta` and `label` written out without ggsolver. """
+
+    def __init__(self, dim, obstacles, p2_walkable, p2_acts, goal_cells):
+        self._dim, self._obs, self._goal_cells = dim, obstacles, goal_cells
+        self._p2_walkable, self._p2_acts = p2_walkable, p2_acts
+
+    def states(self):
+        states = itertools.product(range(self._dim[0]), range(self._dim[1]), self._p2_walkable, [1, 2])
+        return [(p1r, p1c, p2r, p2c, turn) for p1r, p1c, (p2r, p2c), turn in states]
+
+    def enabled_acts(self, state):
+        p1r, p1c, p2r, p2c, turn = state
+        if turn == 2:
+            return self._p2_acts[p2r, p2c]
+        actions = ["N", "E", "S", "W"]
+        if p1r == 0:
+            actions.remove("S")
+        if p1c == 0:
+            actions.remove("W")
+        if p1r == self._dim[0] - 1:
+            actions.remove("N")
+        if p1c == self._dim[1] - 1:
+            actions.remove("E")
+        return actions
+
+    def delta(self, state, act):
+        p1r, p1c, p2r, p2c, turn = state
+        if (p1r, p1c) == (p2r, p2c):
+            return state
+        dr, dc = MOVES[act]
+        if turn == 1:
+            cell = (p1r + dr, p1c + dc)
+            if cell in self._obs or not (0 <= cell[0] < self._dim[0] and 0 <= cell[1] < self._dim[1]):
+                cell = (p1r, p1c)
+            return cell + (p2r, p2c, 2)
+        cell = (p2r + dr, p2c + dc)
+        if cell in self._obs or cell not in self._p2_walkable:
+            cell = (p2r, p2c)
+        return (p1r, p1c) + cell + (1,)
+
+    def label(self, state):
+        if state[0:2] in self._goal_cells:
+            return [f"g{self._goal_cells.index(state[0:2])}"]
+        return []
+
+
+@pytest.mark.parametrize("actions", [None, ["NE", "W", "S", "E", "N"], ["N", "NE", "E"]])
+def test_tables_match_transcription(actions):
+    dim, obstacles = (3, 5), [(1, 2), (0, 3)]
+    walkable = [tuple(cell) for cell in sweep.ring(dim)]
+    p2_acts = {cell: [act for act, (dr, dc) in MOVES.items() if (cell[0] + dr, cell[1] + dc) in walkable] + ["NE"]
+               for cell in walkable}
+    goal_cells = [(0, 4), (2, 4)]
+    game = PlainGridworld(dim, obstacles, walkable, p2_acts, goal_cells)
+    actions_list = ["N", "E", "S", "W"] if actions is None else actions
+    p2_acts = {cell: [act for act in acts if act in actions_list] for cell, acts in p2_acts.items()}
+    tables = gridgen.grid_tables(dim, obstacles, walkable, p2_acts, goal_cells, actions=actions, moves=MOVES)
+
+    assert tables["states"] == game.states()
+    for sid, state in enumerate(game.states()):
+        # P1 plays the listed moves among N, E, S, W only.
+        expected = [act for act in game.enabled_acts(state) if act in actions_list] if state[4] == 1 \
+            else p2_acts[state[2:4]]
+        assert tables["enabled"][sid] == expected
+        assert tables["turn_table"][sid] == state[4]
+        assert tables["labels"][tables["label_table"][sid]] == game.label(state)
+        for aid, act in enumerate(actions_list):
+            next_sid = tables["delta_table"][sid, aid]
+            if act in expected:
+                assert tables["states"][next_sid] == game.delta(state, act)
+            else:
+                assert next_sid == -1
+
+
+def old_observation(game, state, next_state):
+    """ Attacker observation of `RndGridworld` before sensors, with scipy's `cityblock`. """
+    p1r, p1c, p2r, p2c, turn = state
+    p1r_prime, p1c_prime, p2r_prime, p2c_prime, _ = next_state
+    sensor_cell, cell = ((p2r, p2c), (p1r_prime, p1c_prime)) if turn == 1 else ((p2r_prime, p2c_prime), (p1r, p1c))
+    if abs(sensor_cell[0] - cell[0]) + abs(sensor_cell[1] - cell[1]) <= game._sense_rng:
+        return f"o1:{cell}" + f"o2:{sensor_cell}"
+    return f"o1:{(cell[0],)}" + f"o2:{sensor_cell}"
+
+
+def ring_game(dim, obstacles, actions=None, sense_rng=1):
+    walkable = [tuple(cell) for cell in sweep.ring(dim)]
+    return ex14.RndGridworld(dim=dim, goal_cells=[(0, dim[1] - 1), (dim[0] - 1, dim[1] - 1)], obs=obstacles,
+                             actions=actions, sense_rng=sense_rng, p2_walkable=walkable,
+                             p2_acts=sweep.p2_actions(walkable))
+
+
+GAMES = {
+    "ex14": lambda: ex14.RndGridworld(dim=ex14.DIM, goal_cells=ex14.GOAL_CELLS),
+    "ring": lambda: ring_game((4, 4), [(1, 1)]),
+    "ring-actions": lambda: ring_game((3, 5), [(1, 2), (0, 3)], actions=gridgen.p1_actions()[::-1], sense_rng=0),
+}
+
+
+@pytest.fixture(params=list(GAMES))
+def game(request):
+    pytest.importorskip("ggsolver")
+    return GAMES[request.param]()
+
+
+def test_tables_match_game(game):
+    arena = gridgen.tabulate(game)
+    assert arena.states_list[:len(list(game.states()))] == list(game.states())
+    assert arena.actions_list == list(game.actions())
+
+    for state in game.states():
+        assert arena.turn(state) == game.turn(state)
+        assert arena.label(state) == game.label(state)
+        assert arena.enabled_acts(state) == list(game.enabled_acts(state))
+        for act in game.actions():
+            if act in game.enabled_acts(state):
+                next_state = game.delta(state, act)
+                assert arena.delta(state, act) == next_state
+                assert arena.attacker_observation(state, act, next_state) == old_observation(game, state, next_state)
+            else:
+                assert arena.delta(state, act) is None
+
+
+def test_tables_match_enumeration(game):
+    arena, enumerated = gridgen.tabulate(game), opac_models.TabularArena(game)
+    assert arena.states_list == enumerated.states_list
+    assert arena._enabled == enumerated._enabled
+    assert np.array_equal(arena.delta_table, enumerated.delta_table)
+    assert np.array_equal(arena.enabled_table, enumerated.enabled_table)
+    assert np.array_equal(arena.turn_table, enumerated.turn_table)
+
+    # Observation and label ids may be numbered differently.
+    observed = np.where(arena.obs_table >= 0, arena.obs_table, 0)
+    enumerated_observed = np.where(enumerated.obs_table >= 0, enumerated.obs_table, 0)
+    assert np.array_equal(np.asarray(arena.observations, dtype=object)[observed][arena.delta_table >= 0],
+                          np.asarray(enumerated.observations, dtype=object)[enumerated_observed][
+                              enumerated.delta_table >= 0])
+    assert [arena.labels[lid] for lid in arena.label_table] == \
+        [enumerated.labels[lid] for lid in enumerated.label_table]
@@ -0,0 +1,90 @@
+import csv
+import json
+import time
+import tracemalloc
+
+import pytest
+
+import metrics
+
+
+def test_phases_accumulate():
+    run_metrics = metrics.RunMetrics("run")
+    for _ in range(2):
+        with run_metrics.phase("solve_p1") as stats:
+            time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with run_metrics.phase("save"):
+            raise ValueError("disk full")
+
+    phases = run_metrics.record["phases"]
+    assert stats is phases["solve_p1"]
+    assert stats["calls"] == 2 and stats["wall"] >= 0.02 and stats["cpu"] >= 0
+    assert "rss_delta" in stats and stats["max_rss_so_far"] > 0
+    assert "tracemalloc_peak" not in stats
+    assert phases["save"]["calls"] == 1
+
+    record = run_metrics.finish("error")
+    assert record["status"] == "error" and record["wall"] >= stats["wall"] and record["peak_rss"] > 0
+
+
+def test_trace_memory():
+    assert not tracemalloc.is_tracing()
+    run_metrics = metrics.RunMetrics("run", trace_memory=True)
+    assert tracemalloc.is_tracing()
+    with run_metrics.phase("belief_graphify"):
+        data = [bytes(2 ** 10) for _ in range(2 ** 10)]
+        del data
+    with run_metrics.phase("solve_p1"):
+        pass
+    phases = run_metrics.record["phases"]
+    assert phases["belief_graphify"]["tracemalloc_peak"] >= 2 ** 20
+    assert phases["solve_p1"]["tracemalloc_peak"] < 2 ** 20
+    run_metrics.finish()
+    assert not tracemalloc.is_tracing()
+
+    # Tracing started by the caller is left running.
+    tracemalloc.start()
+    try:
+        metrics.RunMetrics("run", trace_memory=True).finish()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_belief_size_stats():
+    assert metrics.belief_size_stats([]) == dict()
+    stats = metrics.belief_size_stats(range(10, 0, -1))
+    assert stats == {"min": 1, "max": 10, "mean": 5.5, "p50": 6, "p90": 10}
+
+
+def test_flatten():
+    record = {"name": "run", "belief_size": {"max": 3}, "phases": {"custom": {"wall": 3.0}, "save": {"wall": 2.0},
+                                                                   "translate": {"wall": 1.0}}}
+    assert list(metrics.flatten(record).items()) == [
+        ("name", "run"), ("belief_size.max", 3), ("translate.wall", 1.0), ("save.wall", 2.0), ("custom.wall", 3.0)]
+
+
+def test_save_and_append_csv(tmp_path):
+    first = metrics.RunMetrics("first")
+    with first.phase("translate"):
+        pass
+    first.finish()
+    first.save_json(str(tmp_path / "first.json"))
+    with open(tmp_path / "first.json", "r") as file:
+        assert json.load(file)["phases"]["translate"]["calls"] == 1
+
+    # A record with new columns extends the header and keeps earlier rows.
+    second = metrics.RunMetrics("second")
+    with second.phase("solve_p1"):
+        pass
+    second.set(nodes=10)
+    second.finish()
+    fpath = str(tmp_path / "runs.csv")
+    first.append_csv(fpath)
+    second.append_csv(fpath)
+    first.append_csv(fpath)
+    with open(fpath, "r", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["name"] for row in rows] == ["first", "second", "first"]
+    assert rows[0]["nodes"] == "" and rows[1]["nodes"] == "10" and rows[1]["translate.calls"] == ""
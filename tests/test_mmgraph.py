@@ -0,0 +1,100 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import mmgraph
+
+from conftest import random_graph, write_store
+
+
+def test_round_trip(store, graph):
+    states, turn, final, edges = graph
+    assert store.number_of_nodes() == len(states)
+    assert store.number_of_edges() == sum(len(out) for out in edges)
+    assert store.init_node() == 0
+    for uid, state in enumerate(states):
+        assert store.state(uid) == state
+        assert store.node_turn(uid) == turn[uid]
+        assert store.is_final(uid) == final[uid]
+        assert store.successors(uid) == [vid for vid, _ in edges[uid]]
+        assert [(vid, act) for _, vid, act in store.out_edges(uid)] == edges[uid]
+
+
+def test_csr_arrays(store, graph):
+    _, _, _, edges = graph
+    assert store.succ_ptr.dtype == np.int64 and store.succ_dst.dtype == np.int32
+    assert np.array_equal(np.diff(store.succ_ptr), [len(out) for out in edges])
+    start, stop = store.edge_range(3)
+    assert stop - start == len(edges[3])
+
+
+def test_node_aut_states(store, graph):
+    states = graph[0]
+    assert store.node_aut_states().tolist() == [q for _, q, _ in states]
+
+
+def test_state2node(store, graph):
+    states = graph[0]
+    for uid, state in enumerate(states):
+        assert store.state2node(state) == uid
+
+    # Known symbols, but not a node; unknown symbols.
+    s, q, b = states[0]
+    with pytest.raises(KeyError):
+        store.state2node((s, q, b + b))
+    with pytest.raises(KeyError):
+        store.state2node(((99, 99), q, b))
+
+
+def test_plain_states(tmp_path):
+    states = [f"s{uid}" for uid in range(10)]
+    edges = [[((uid + 1) % 10, "go")] for uid in range(10)]
+    view = write_store(str(tmp_path / "base.gstore"), states, [1] * 10, [False] * 10, edges, belief=False)
+    assert [view.state(uid) for uid in range(10)] == states
+    assert view.state2node("s7") == 7
+
+
+def test_empty_store(tmp_path):
+    view = write_store(str(tmp_path / "empty.gstore"), [], [], [], [], init_node=None)
+    assert view.number_of_nodes() == 0 and view.number_of_edges() == 0
+    assert view.init_node() is None
+    with pytest.raises(KeyError):
+        view.state2node(((0, 0), 0, ()))
+
+
+def test_overwrite(tmp_path, graph):
+    path = str(tmp_path / "g.gstore")
+    write_store(path, *graph)
+    with pytest.raises(FileExistsError):
+        mmgraph.GraphStoreWriter(path)
+    states, turn, final, edges = random_graph(20, seed=2)
+    with mmgraph.GraphStoreWriter(path, overwrite=True) as writer:
+        for uid in range(20):
+            writer.add_node(states[uid], turn[uid], final[uid], edges[uid])
+        writer.close()
+    assert mmgraph.GraphView(path).number_of_nodes() == 20
+
+
+def test_unclosed_store_cannot_be_opened(tmp_path, graph):
+    path = str(tmp_path / "g.gstore")
+    states, turn, final, edges = graph
+    with pytest.raises(RuntimeError):
+        with mmgraph.GraphStoreWriter(path) as writer:
+            writer.add_node(states[0], turn[0], final[0], edges[0])
+            raise RuntimeError("exploration failed")
+    assert not os.path.exists(os.path.join(path, "meta.json"))
+    with pytest.raises(FileNotFoundError):
+        mmgraph.GraphView(path)
+
+
+def test_version_check(store):
+    fpath = os.path.join(store.path(), "meta.json")
+    with open(fpath, "r") as file:
+        meta = json.load(file)
+    meta["version"] = mmgraph.STORE_VERSION + 1
+    with open(fpath, "w") as file:
+        json.dump(meta, file)
+    with pytest.raises(ValueError):
+        mmgraph.GraphView(store.path())
@@ -0,0 +1,197 @@
+import random
+
+import pytest
+
+pytest.importorskip("ggsolver")
+
+import dfa_cache  # noqa: E402
+import ex1_toy  # noqa: E402
+import models as opac_models  # noqa: E402
+
+
+@pytest.fixture
+def arena():
+    game = ex1_toy.MyGame()
+    game.initialize(0)
+    return game
+
+
+def _layer(arena, transitions):
+    """ Belief layer of the arena whose transitions come from `transitions` (a TransitionCache), or uncached. """
+    layer = opac_models.BeliefLayer(arena)
+    layer.next = arena.delta if transitions is None else transitions.get
+    return layer
+
+
+def _posts(layer, arena):
+    """ Returns {(s, act): (observation, post)} of all state-action pairs of the arena. """
+    return {(s, act): (layer.observation(s, act), layer.post(s, layer.observation(s, act)))
+            for s in arena.states() for act in arena.actions()}
+
+
+@pytest.mark.parametrize("mode", ["dense", "lru"])
+def test_transition_cache_parity(arena, mode):
+    if mode == "dense":
+        cache = opac_models.TransitionCache(arena)
+    else:
+        # Fewer entries than transitions: lookups evict each other.
+        cache = opac_models.TransitionCache(arena, dense_limit=0, maxsize=3)
+    assert cache.stats()["mode"] == mode
+    expected = _posts(_layer(arena, None), arena)
+
+    # Fresh layers share the cache, so that the second one reads transitions cached (or evicted) by the first.
+    for _ in range(2):
+        assert _posts(_layer(arena, cache), arena) == expected
+
+    pairs = [(s, act) for s in arena.states() for act in arena.actions()]
+    random.Random(0).shuffle(pairs)
+    for s, act in pairs + pairs[:5]:
+        assert cache.get(s, act) == arena.delta(s, act)
+
+    # The last lookups are cached in both modes.
+    hits = cache.stats()["hits"]
+    assert cache.get(*pairs[4]) == arena.delta(*pairs[4])
+    stats = cache.stats()
+    assert stats["hits"] == hits + 1
+    assert stats["size"] == (3 if mode == "lru" else stats["capacity"])
+
+
+def test_dense_cache_outside_arena(arena):
+    cache = opac_models.TransitionCache(arena)
+    misses = cache.stats()["misses"]
+    assert cache.get(99, "a1") is None and cache.get(0, "c1") is None
+    assert cache.stats()["misses"] == misses + 2
+
+
+def test_tabular_layer_has_no_cache(arena):
+    layer = opac_models.BeliefLayer(opac_models.tabulate(arena))
+    assert layer.next == layer.arena().delta
+    assert not any(key.startswith("transitions_") for key in layer.stats())
+
+
+def test_prefill_checks_size_first(arena, monkeypatch):
+    calls = []
+    delta = arena.delta
+    monkeypatch.setattr(arena, "delta", lambda s, act: calls.append((s, act)) or delta(s, act))
+
+    # 7 states x 5 actions do not fit: the arena is not enumerated.
+    cache = opac_models.TransitionCache(arena, dense_limit=34)
+    assert cache.stats()["mode"] == "lru" and calls == []
+    assert opac_models.TransitionCache(arena, dense_limit=35).stats()["mode"] == "dense"
+    assert len(calls) > 0
+
+
+class KeyedToy(ex1_toy.MyGame):
+    """ Toy arena with a dynamics key, so that its tables and belief layer are shared through the registry. """
+    def __init__(self, key="toy"):
+        super(KeyedToy, self).__init__()
+        self._key = key
+
+    def dynamics_key(self):
+        return self._key
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = opac_models.ArenaRegistry(maxsize=2)
+    monkeypatch.setattr(opac_models, "registry", registry)
+    return registry
+
+
+def test_registry_shares_equal_dynamics(registry):
+    first, second, other = KeyedToy(), KeyedToy(), KeyedToy("other")
+    first.initialize(0)
+    second.initialize(2)
+    tables = opac_models.tabulate(first)
+
+    # Same tables and layer, but each arena keeps its own initial state.
+    shared = opac_models.tabulate(second)
+    assert shared is not tables and shared.game() is second
+    assert shared.delta_table is tables.delta_table and shared.init_state() == 2
+    assert opac_models.BeliefLayer.of(shared) is opac_models.BeliefLayer.of(tables)
+    assert opac_models.tabulate(other).delta_table is not tables.delta_table
+
+    # Arenas without a dynamics key are not registered.
+    size = len(registry._entries)
+    arena = ex1_toy.MyGame()
+    assert opac_models.tabulate(arena) is opac_models.tabulate(arena)
+    assert len(registry._entries) == size
+
+
+def test_registry_evicts_least_recently_used(registry):
+    arenas = {key: KeyedToy(key) for key in ["a", "b", "c"]}
+    registry.put("tabular_arena", arenas["a"], "A")
+    registry.put("tabular_arena", arenas["b"], "B")
+    assert registry.get("tabular_arena", KeyedToy("a")) == "A"
+    registry.put("tabular_arena", arenas["c"], "C")
+    assert registry.get("tabular_arena", arenas["b"]) is None
+    assert registry.get("tabular_arena", arenas["a"]) == "A" and registry.get("tabular_arena", arenas["c"]) == "C"
+    assert registry.get("belief_layer", arenas["a"]) is None
+    registry.clear()
+    assert registry.get("tabular_arena", arenas["a"]) is None
+
+
+class OffArenaToy(ex1_toy.MyGame):
+    """ Toy arena whose state 6 leads to state 7, outside `states()`. """
+    def delta(self, state, act):
+        if state == 6 and act == "a1":
+            return 7
+        if state == 7:
+            return 3 if act == "a1" else None
+        return super(OffArenaToy, self).delta(state, act)
+
+    def attacker_observation(self, state, act, next_state):
+        if 7 in (state, next_state):
+            return "o7"
+        return super(OffArenaToy, self).attacker_observation(state, act, next_state)
+
+
+@pytest.mark.parametrize("toy", [ex1_toy.MyGame, OffArenaToy])
+def test_tabular_arena_matches_arena(toy):
+    game = toy()
+    game.initialize(0)
+    arena = opac_models.TabularArena(game)
+    assert arena.states_list[:7] == list(game.states())
+    assert len(arena.states_list) == (8 if toy is OffArenaToy else 7)
+    assert arena.actions() == list(game.actions()) and arena.init_state() == 0
+
+    for sid, state in enumerate(arena.states_list):
+        assert arena.turn(state) == game.turn(state) == arena.turn_table[sid]
+        assert arena.label(state) == game.label(state)
+        assert arena.enabled_acts(state) == list(game.enabled_acts(state))
+        successors = []
+        for aid, act in enumerate(arena.actions()):
+            next_state = game.delta(state, act)
+            assert arena.delta(state, act) == next_state
+            if next_state is not None:
+                obs = game.attacker_observation(state, act, next_state)
+                assert arena.attacker_observation(state, act, next_state) == obs
+                assert arena.observations[arena.obs_id(sid, aid)] == obs
+                successors.append((aid, arena.state_id(next_state), arena.obs_id(sid, aid)))
+            else:
+                assert arena.next_id(sid, aid) == -1 and arena.obs_id(sid, aid) == -1
+        assert arena.successors(sid) == successors
+
+    # Other attributes come from the wrapped arena.
+    assert arena.formula is not None and arena.game() is game
+
+
+def test_tabular_belief_game(arena, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)     # BeliefGame logs large beliefs to the working directory
+    aut = dfa_cache.translate(arena.formula())
+    game = opac_models.BeliefGame(arena, aut)
+    tabular = opac_models.BeliefGame(opac_models.tabulate(arena), aut)
+
+    # Same transitions from every reachable belief state.
+    stack, seen = [game.init_state()], {game.init_state()}
+    assert tabular.init_state() == game.init_state()
+    while stack:
+        state = stack.pop()
+        assert tabular.turn(state) == game.turn(state) and tabular.final(state) == game.final(state)
+        for act in game.actions():
+            next_state = game.delta(state, act)
+            assert tabular.delta(state, act) == next_state
+            if next_state is not None and next_state not in seen:
+                seen.add(next_state)
+                stack.append(next_state)
+    assert len(seen) > 7
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ggsolver")
+
+import dfa_cache  # noqa: E402
+import ex14_5x5_UAV_UGV as ex14  # noqa: E402
+import models as opac_models  # noqa: E402
+import refine  # noqa: E402
+import solution as sol  # noqa: E402
+import sweep  # noqa: E402
+
+DIM = (2, 3)
+INIT = (1, 0, 0, 0, 1)
+
+
+def _arena(sense_rng, goal_cells):
+    walkable = [tuple(cell) for cell in sweep.ring(DIM)]
+    game = ex14.RndGridworld(dim=DIM, goal_cells=goal_cells, obs=[], sense_rng=sense_rng,
+                             formula="F(g0) & F(g1)", p2_walkable=walkable, p2_acts=sweep.p2_actions(walkable))
+    game.initialize(INIT)
+    return opac_models.tabulate(game)
+
+
+def _solve(arena, aut, prefix, old=None):
+    belief_game = opac_models.BeliefGame(arena, aut)
+    targets = {"p1": belief_game.final, "p2": belief_game.final_p2}
+    if old is None:
+        return refine.solve(belief_game, prefix, targets)
+    return refine.refine(belief_game, old[0], old[1], prefix, targets)
+
+
+def _solution(view, prefix, name):
+    """ Returns {state: (winner, {(act, next state): winning})} of a solved graph store. """
+    node_winner, edge_bitmap = sol.read_arrays(f"{prefix}_{name}.wsol")
+    return {
+        view.state(uid): (int(node_winner[uid]), {(act, view.state(vid)): sol.is_set(edge_bitmap, eid)
+                                                  for eid, vid, act in view.out_edges(uid)})
+        for uid in range(view.number_of_nodes())
+    }
+
+
+@pytest.mark.parametrize("change", [
+    ((0, [(0, 2), (1, 2)]), (1, [(0, 2), (1, 2)])),     # finer sensor
+    ((2, [(0, 2), (1, 2)]), (0, [(0, 2), (1, 2)])),     # coarser sensor
+    ((1, [(0, 2), (1, 2)]), (1, [(0, 2), (1, 1)])),     # goal set
+], ids=["finer-sensor", "coarser-sensor", "goal-set"])
+def test_refine_matches_fresh_solve(tmp_path, monkeypatch, change):
+    monkeypatch.chdir(tmp_path)     # BeliefGame logs large beliefs to the working directory
+    (old_rng, old_goals), (new_rng, new_goals) = change
+    old_arena = _arena(old_rng, old_goals)
+    aut = dfa_cache.translate(old_arena.formula1())
+    old_prefix = str(tmp_path / "old")
+    _solve(old_arena, aut, old_prefix)
+
+    new_arena = _arena(new_rng, new_goals)
+    _, view, solvers, stats = _solve(new_arena, aut, str(tmp_path / "refined"), old=(old_arena, old_prefix))
+    _, fresh_view, fresh_solvers, fresh_stats = _solve(new_arena, aut, str(tmp_path / "fresh"))
+
+    assert stats["nodes"] == fresh_stats["nodes"] and stats["edges"] == fresh_stats["edges"]
+    assert 0 < stats["reused"] and stats["affected"] < stats["nodes"]
+    for name in ["p1", "p2"]:
+        assert _solution(view, str(tmp_path / "refined"), name) == \
+            _solution(fresh_view, str(tmp_path / "fresh"), name)
+        assert np.array_equal(np.sort(solvers[name].ranks()), np.sort(fresh_solvers[name].ranks()))
@@ -0,0 +1,150 @@
+import collections
+
+import numpy as np
+import pytest
+
+import retarget
+import solution as sol
+
+from conftest import random_graph
+
+
+def naive_attractor(edges, turn, target, player=1):
+    """ Fixed point of: target, player's nodes with an edge into the set, opponent's nodes with all edges. """
+    attr = set(np.flatnonzero(target).tolist())
+    changed = True
+    while changed:
+        changed = False
+        for uid, out in enumerate(edges):
+            if uid in attr or not out:
+                continue
+            inside = [vid in attr for vid, _ in out]
+            if any(inside) if turn[uid] == player else all(inside):
+                attr.add(uid)
+                changed = True
+    mask = np.zeros(len(edges), dtype=bool)
+    mask[list(attr)] = True
+    return mask
+
+
+def check_strategy(solver, view, target):
+    """ Outside the target, winning edges keep plays in the attractor and lead to the target (no cycles). """
+    attr = solver.winning_region()
+    src = np.repeat(np.arange(view.number_of_nodes()), np.diff(view.succ_ptr))
+    dst = np.asarray(view.succ_dst)
+    win = solver.edge_winners()
+    own = np.asarray(view.turn)[src] == 1
+
+    # Winning edges stay in the attractor; every player's node outside the target has one.
+    inside = attr[src] & ~target[src]
+    assert np.all(attr[dst[inside & win]])
+    player_nodes = np.flatnonzero(attr & ~target & (np.asarray(view.turn) == 1))
+    assert all(solver.winning_edges(uid) for uid in player_nodes)
+
+    # Strategy subgraph (player's winning edges, all opponent's edges) outside the target is acyclic.
+    keep = inside & (win | ~own)
+    indegree = collections.Counter(dst[keep].tolist())
+    succ = collections.defaultdict(list)
+    for u, v in zip(src[keep].tolist(), dst[keep].tolist()):
+        succ[u].append(v)
+    queue = [uid for uid in np.flatnonzero(attr).tolist() if indegree[uid] == 0]
+    seen = 0
+    while queue:
+        uid = queue.pop()
+        seen += 1
+        for vid in succ[uid]:
+            indegree[vid] -= 1
+            if indegree[vid] == 0:
+                queue.append(vid)
+    assert seen == np.count_nonzero(attr)
+
+
+@pytest.fixture(params=[0, 1, 2])
+def solved_graph(request):
+    return random_graph(300, seed=request.param, final_rate=0.05)
+
+
+def test_full_solve(solved):
+    view, _, turn, final, edges = solved
+    solver = retarget.ReachSolver(view)
+    attr = solver.solve()
+    assert np.array_equal(attr, naive_attractor(edges, turn, final))
+    assert solver.node_winners().tolist() == [1 if win else 2 for win in attr]
+    check_strategy(solver, view, final)
+
+
+def test_player2(solved):
+    view, _, turn, final, edges = solved
+    solver = retarget.ReachSolver(view, player=2)
+    target = np.zeros(view.number_of_nodes(), dtype=bool)
+    target[::7] = True
+    assert np.array_equal(solver.solve(target), naive_attractor(edges, turn, target, player=2))
+
+
+def test_target_kinds(solved):
+    view, _, turn, final, edges = solved
+    solver = retarget.ReachSolver(view)
+    ids = [0, 5, 9]
+    mask = solver.target_mask(ids)
+    assert np.flatnonzero(mask).tolist() == ids
+    assert np.array_equal(solver.target_mask(lambda state: state[1] == 2),
+                          [q == 2 for _, q, _ in (view.state(uid) for uid in range(view.number_of_nodes()))])
+    assert np.array_equal(retarget.ReachSolver(view).solve(ids), naive_attractor(edges, turn, mask))
+
+
+def test_incremental_solve(solved):
+    view, _, turn, final, edges = solved
+    bigger = final.copy()
+    bigger[::11] = True
+
+    solver = retarget.ReachSolver(view)
+    solver.solve(final)
+    attr = solver.solve(bigger)
+    assert np.array_equal(attr, naive_attractor(edges, turn, bigger))
+    assert np.array_equal(attr, retarget.ReachSolver(view).solve(bigger))
+    check_strategy(solver, view, bigger)
+
+    # A target that is not a superset is solved from scratch.
+    smaller = np.zeros_like(final)
+    smaller[::13] = True
+    assert np.array_equal(solver.solve(smaller), naive_attractor(edges, turn, smaller))
+
+
+def test_fixed_solve(solved):
+    view, _, turn, final, edges = solved
+    full = naive_attractor(edges, turn, final)
+
+    # Forward-closed part of the graph: its winners do not depend on the rest.
+    fixed = np.zeros(view.number_of_nodes(), dtype=bool)
+    stack = [0, 1, 2]
+    while stack:
+        uid = stack.pop()
+        if not fixed[uid]:
+            fixed[uid] = True
+            stack.extend(vid for vid, _ in edges[uid])
+    if fixed.all():
+        pytest.skip("The closure is the whole graph.")
+
+    solver = retarget.ReachSolver(view)
+    attr = solver.solve(final | (fixed & full), fixed=fixed)
+    assert np.array_equal(attr, full)
+
+    # With the ranks of the fixed nodes, ranks and winning edges are those of a full solve.
+    full_solver = retarget.ReachSolver(view)
+    full_solver.solve(final)
+    solver.solve(final | (fixed & full), fixed=fixed, rank=full_solver.ranks())
+    assert np.array_equal(solver.ranks(), full_solver.ranks())
+    assert np.array_equal(solver.edge_winners(), full_solver.edge_winners())
+
+
+def test_save(solved, tmp_path):
+    view, _, turn, final, edges = solved
+    solver = retarget.ReachSolver(view)
+    solver.solve()
+    fpath = str(tmp_path / "save_p1.wsol")
+    solver.save(fpath)
+    view.attach_solution(fpath)
+    assert np.array_equal(view.solution_arrays()[0], solver.node_winners())
+    assert all(view.is_winning_edge(eid) == win for eid, win in enumerate(solver.edge_winners()))
+    node_winner, _ = sol.read_arrays(fpath)
+    assert len(node_winner) == view.number_of_nodes()
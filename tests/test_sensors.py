@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import sensors
+
+
+def cityblock(u, v):
+    return sum(abs(a - b) for a, b in zip(u, v))
+
+
+def old_observation(sense_rng, sensor_cell, cell):
+    """ Observation of the attacker in `ex14_5x5_UAV_UGV` before sensors, with scipy's `cityblock`. """
+    if cityblock(sensor_cell, cell) <= sense_rng:
+        return f"o1:{tuple(cell)}" + f"o2:{tuple(sensor_cell)}"
+    return f"o1:{(cell[0],)}" + f"o2:{tuple(sensor_cell)}"
+
+
+def cells(dim):
+    return list(itertools.product(range(dim[0]), range(dim[1])))
+
+
+@pytest.mark.parametrize("dim", [(1, 1), (3, 4), (5, 5)])
+@pytest.mark.parametrize("rng", [0, 1, 2, 3])
+def test_range_sensor(dim, rng):
+    sensor = sensors.RangeSensor(dim, rng)
+    for sensor_cell, cell in itertools.product(cells(dim), repeat=2):
+        assert sensor.observation(sensor_cell, cell) == old_observation(rng, sensor_cell, cell)
+        assert sensor.covers(sensor_cell, cell) == (cityblock(sensor_cell, cell) <= rng)
+        assert sensor.observations[sensor.observation_id(sensor_cell, cell)] == sensor.observation(sensor_cell, cell)
+
+    # Observation ids number distinct observations.
+    assert len(sensor.observations) == len(set(sensor.observations))
+    obs_ids = sensor.obs_ids(range(dim[0] * dim[1]))
+    assert set(np.unique(obs_ids).tolist()) == set(range(len(sensor.observations)))
+
+
+def test_area_sensor():
+    dim, area = (4, 5), [(0, 0), (2, 3), (3, 4)]
+    sensor = sensors.AreaSensor(dim, area)
+    for sensor_cell, cell in itertools.product(cells(dim), repeat=2):
+        assert sensor.covers(sensor_cell, cell) == (cell in area)
+        assert sensor.observation(sensor_cell, cell) == sensors.format_observation(sensor_cell, cell, cell in area)
+
+
+@pytest.mark.parametrize("rng", [0, 1])
+def test_multi_cell_sensor(rng):
+    dim, offsets = (5, 4), [(0, 0), (1, 0), (-2, 1)]
+    sensor = sensors.MultiCellSensor(dim, offsets, rng=rng)
+    for (sr, sc), cell in itertools.product(cells(dim), repeat=2):
+        # Sensing cells off the grid still cover the grid cells within range.
+        expected = any(cityblock((sr + dr, sc + dc), cell) <= rng for dr, dc in offsets)
+        assert sensor.covers((sr, sc), cell) == expected
+
+
+def test_custom_format():
+    calls = []
+
+    def fmt(sensor_cell, cell, covered):
+        calls.append((sensor_cell, cell))
+        return "seen" if covered else f"row {cell[0]}"
+
+    # Rows are formatted on first use of their sensor cell, once.
+    sensor = sensors.RangeSensor((2, 3), 1, fmt=fmt)
+    assert len(calls) == 0
+    assert sensor.observation((0, 0), (0, 1)) == "seen"
+    assert sensor.observation((0, 0), (1, 2)) == "row 1"
+    assert len(calls) == 6
+    assert sensor.observations == ["seen", "row 0", "row 1"]
+
+
+def test_rows_built_on_demand():
+    dim = (6, 7)
+    sensor, reference = sensors.RangeSensor(dim, 2), sensors.RangeSensor(dim, 2)
+    sidx = [40, 3, 40, 17]
+    obs_ids = sensor.obs_ids(sidx)
+    assert obs_ids.shape == (4, 42) and obs_ids.dtype == np.int32
+    assert sorted(sensor._obs_rows) == [3, 17, 40]
+
+    # Same observations as cell by cell lookups, whatever the order rows are built in.
+    for row, idx in zip(obs_ids, sidx):
+        sensor_cell = divmod(idx, dim[1])
+        assert [sensor.observations[oid] for oid in row] == \
+            [reference.observation(sensor_cell, cell) for cell in cells(dim)]
+        assert np.array_equal(sensor.mask(sensor_cell), [reference.covers(sensor_cell, cell) for cell in cells(dim)])
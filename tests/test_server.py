@@ -0,0 +1,70 @@
+import json
+import threading
+
+import pytest
+
+import server
+
+
+def _normalize(value):
+    # JSON turns tuples into lists.
+    return json.loads(json.dumps(value))
+
+
+def _ask(service, request):
+    return json.loads(service.handle_line(json.dumps(request).encode()))
+
+
+@pytest.fixture
+def service(solved, tmp_path):
+    return server.StrategyService({"g": (str(tmp_path / "g.gstore"), str(tmp_path / "g_p1.wsol"))}, lru_size=8)
+
+
+def test_queries(service, solved):
+    view = solved.view
+    for uid in range(0, view.number_of_nodes(), 7):
+        state = _normalize(view.state(uid))
+        assert _ask(service, {"id": uid, "op": "winner", "state": state}) == \
+            {"id": uid, "result": view.node_winner(uid)}
+        assert sorted(_ask(service, {"op": "actions", "game": "g", "state": state})["result"]) == \
+            sorted(view.winning_actions(uid))
+        successors = _ask(service, {"op": "successors", "state": state})["result"]
+        assert successors == [[act, _normalize(view.state(vid)), view.is_winning_edge(eid)]
+                              for eid, vid, act in view.out_edges(uid)]
+        for act, next_state, _ in successors:
+            assert _ask(service, {"op": "next", "state": state, "act": act})["result"] == next_state
+
+
+def test_batch(service, solved):
+    state = _normalize(solved.view.state(0))
+    responses = _ask(service, [{"id": 1, "op": "winner", "state": state}, {"id": 2, "op": "jump", "state": state},
+                               3, {"id": 4, "op": "winner", "state": [0]}])
+    assert [response["id"] for response in responses] == [1, 2, None, 4]
+    assert responses[0]["result"] == solved.view.node_winner(0)
+    assert responses[1]["error"].startswith("ValueError") and responses[2]["error"].startswith("TypeError")
+    assert "error" in responses[3]
+
+
+@pytest.mark.parametrize("line", [b"3", b'"x"', b"null", b"true", b"{bad", b"\xff\n"])
+def test_malformed_lines(service, line):
+    response = json.loads(service.handle_line(line))
+    assert response["id"] is None and "error" in response
+
+
+def test_connection_survives_errors(service, solved, tmp_path):
+    address = {"unix": str(tmp_path / "s.sock")}
+    strategy_server = server.make_server(service, **address)
+    threading.Thread(target=strategy_server.serve_forever, daemon=True).start()
+    client = server.StrategyClient(**address)
+    try:
+        state = _normalize(solved.view.state(0))
+        for line in [b"null\n", b"{bad\n", b"3\n"]:
+            client._sock.sendall(line)
+            assert "error" in json.loads(client._rfile.readline())
+        assert client.query("winner", state) == solved.view.node_winner(0)
+        with pytest.raises(RuntimeError):
+            client.query("next", state, act="no such action")
+    finally:
+        client.close()
+        strategy_server.shutdown()
+        strategy_server.server_close()
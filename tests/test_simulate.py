@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import simulate
+
+from conftest import solve, write_store
+
+
+def _first_edge(view, nodes, rng):
+    return np.asarray(view.succ_ptr)[nodes]
+
+
+@pytest.mark.parametrize("policy", ["random", "adversarial", _first_edge])
+def test_winning_plays_reach_target(solved, policy):
+    view, attr = solved.view, solved.solver.winning_region()
+    winning = np.flatnonzero(attr)
+    tables = simulate.StrategyTables(view)
+    result = simulate.simulate(tables, winning, num_plays=500, p2_policy=policy,
+                               max_steps=view.number_of_nodes(), seed=0)
+    assert len(result) == 500
+    assert result.outcome_counts() == {"reached": 500, "deadlock": 0, "timeout": 0}
+    assert result.summary()["reach_rate"] == 1.0
+    assert result.length_histogram().sum() == 500
+
+
+def test_adversary_avoids_winning_region(solved):
+    view, attr = solved.view, solved.solver.winning_region()
+    losing = np.flatnonzero(~attr & ~np.asarray(view.final, dtype=bool))
+    if len(losing) == 0:
+        pytest.skip("P1 wins everywhere.")
+    tables = simulate.StrategyTables(view)
+    result = simulate.simulate(tables, losing, num_plays=200, p2_policy="adversarial", max_steps=50, seed=1,
+                               record=True)
+    assert result.outcome_counts()["reached"] == 0
+    assert not attr[result.plays[result.plays >= 0]].any()
+
+
+def test_record_follows_edges(solved):
+    view, attr = solved.view, solved.solver.winning_region()
+    tables = simulate.StrategyTables(view)
+    result = simulate.simulate(tables, [0, 1, 2], num_plays=30, max_steps=20, seed=2, record=True)
+    assert result.plays[:, 0].tolist() == [0, 1, 2] * 10
+    for play, length in zip(result.plays, result.lengths):
+        assert np.all(play[length + 1:] == -1)
+        for uid, vid in zip(play[:length], play[1:length + 1]):
+            assert vid in view.successors(uid)
+
+
+def test_seed_is_reproducible(solved):
+    view = solved.view
+    tables = simulate.StrategyTables(view)
+    first = simulate.simulate(tables, 0, num_plays=50, max_steps=30, seed=3, record=True)
+    second = simulate.simulate(tables, 0, num_plays=50, max_steps=30, seed=3, record=True)
+    assert np.array_equal(first.plays, second.plays)
+
+
+def test_deadlock_and_timeout(tmp_path):
+    # 0 -> 1 (dead end), 2 <-> 3 (cycle), 4 final.
+    states = [f"s{uid}" for uid in range(5)]
+    edges = [[(1, "a")], [], [(3, "a")], [(2, "a")], [(4, "a")]]
+    view = write_store(str(tmp_path / "g.gstore"), states, [1, 2, 1, 2, 1], [False] * 4 + [True], edges,
+                       belief=False)
+    solve(view, str(tmp_path / "g_p1.wsol"))
+    tables = simulate.StrategyTables(view)
+    result = simulate.simulate(tables, [0, 2, 4], num_plays=3, max_steps=10, seed=0)
+    assert result.outcomes.tolist() == [simulate.OUTCOME_DEADLOCK, simulate.OUTCOME_TIMEOUT,
+                                        simulate.OUTCOME_REACHED]
+    assert result.lengths.tolist() == [1, 10, 0]
+    summary = result.summary()
+    assert summary["outcomes"] == {"reached": 1, "deadlock": 1, "timeout": 1}
+    assert summary["length"]["max"] == 0
+
+
+def test_unknown_policy(solved):
+    view = solved.view
+    with pytest.raises(ValueError):
+        simulate.simulate(simulate.StrategyTables(view), 0, num_plays=1, p2_policy="greedy")
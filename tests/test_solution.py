@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import solution as sol
+
+
+class _Graph:
+    """ Minimal graph with the ggsolver queries used by `solution`. """
+    def __init__(self, states, edges):
+        self._states = states
+        self._edges = edges     # uid -> [(vid, act)]
+        self._props = {
+            "state": dict(enumerate(states)),
+            "input": {(uid, vid, key): act for uid, out in enumerate(edges) for key, (vid, act) in enumerate(out)},
+        }
+
+    def __getitem__(self, name):
+        return self._props[name]
+
+    def number_of_nodes(self):
+        return len(self._states)
+
+    def nodes(self):
+        return range(len(self._states))
+
+    def out_edges(self, uid):
+        return [(uid, vid, key) for key, (vid, _) in enumerate(self._edges[uid])]
+
+
+def test_arrays_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    node_winner = rng.integers(0, 3, size=37).astype(np.int8)
+    edge_winner = rng.random(101) < 0.5
+    fpath = str(tmp_path / "g.wsol")
+    sol.write_arrays(fpath, node_winner, edge_winner)
+
+    nodes, bitmap = sol.read_arrays(fpath)
+    assert np.array_equal(nodes, node_winner)
+    assert len(bitmap) == (101 + 7) // 8
+    assert [sol.is_set(bitmap, eid) for eid in range(101)] == edge_winner.tolist()
+
+
+def test_empty_arrays(tmp_path):
+    fpath = str(tmp_path / "empty.wsol")
+    sol.write_arrays(fpath, np.zeros(0, dtype=np.int8), np.zeros(0, dtype=bool))
+    nodes, bitmap = sol.read_arrays(fpath)
+    assert len(nodes) == 0 and len(bitmap) == 0
+
+
+def test_bad_file(tmp_path):
+    fpath = tmp_path / "bad.wsol"
+    fpath.write_bytes(b"NOPE" + bytes(sol.HEADER.size))
+    with pytest.raises(ValueError):
+        sol.read_arrays(str(fpath))
+
+
+def test_solution_queries(tmp_path):
+    graph = _Graph(["a", "b", "c"], [[(1, "x"), (2, "y")], [(2, "x")], [(2, "z")]])
+    fpath = str(tmp_path / "g.wsol")
+    sol.write_arrays(fpath, np.array([1, 2, 0], dtype=np.int8), np.array([False, True, True, False]))
+
+    solution = sol.load_solution(graph, fpath)
+    assert solution.state_winner("a") == 1 and solution.state_winner("b") == 2
+    assert solution.state_winner("c") is None
+    assert solution.winning_nodes(1) == [0] and solution.winning_states(2) == ["b"]
+    assert solution.winning_edges(0) == [(0, 2, 1)]
+    assert solution.winning_edges(1) == [(1, 2, 0)]
+    assert solution.winning_edges(2) == []
+    assert solution.winning_actions("a") == ["y"]
+
+
+def test_save_solution_round_trip(tmp_path):
+    graph = _Graph(["a", "b", "c"], [[(1, "x"), (2, "y")], [(2, "x")], [(2, "z")]])
+    fpath = str(tmp_path / "a.wsol")
+    sol.write_arrays(fpath, np.array([1, 1, 2], dtype=np.int8), np.array([True, False, True, True]))
+
+    # A loaded solution answers the queries of a solver, so it can be saved again unchanged.
+    copy = str(tmp_path / "b.wsol")
+    sol.save_solution(sol.load_solution(graph, fpath), copy)
+    with open(fpath, "rb") as file_a, open(copy, "rb") as file_b:
+        assert file_a.read() == file_b.read()
+
+
+def test_size_mismatch(tmp_path):
+    graph = _Graph(["a"], [[(0, "x")]])
+    fpath = str(tmp_path / "g.wsol")
+    sol.write_arrays(fpath, np.array([1, 1], dtype=np.int8), np.array([True]))
+    with pytest.raises(ValueError):
+        sol.Solution(graph, fpath)
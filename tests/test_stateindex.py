@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+import stateindex
+
+from conftest import random_graph, write_store
+
+
+def _encoded(view):
+    return [view.state_data[view.state_ptr[uid]:view.state_ptr[uid + 1]].tolist()
+            for uid in range(view.number_of_nodes())]
+
+
+@pytest.mark.parametrize("chunk_size", [3, stateindex.CHUNK_SIZE])
+def test_fingerprints(store, monkeypatch, chunk_size):
+    monkeypatch.setattr(stateindex, "CHUNK_SIZE", chunk_size)
+    fps = stateindex.fingerprints(store.state_ptr, store.state_data)
+    assert fps.dtype == np.uint64
+    assert fps.tolist() == [stateindex.fingerprint(seq) for seq in _encoded(store)]
+
+
+def test_fingerprints_edge_cases():
+    # Empty states (first, inner and last) and large ids.
+    seqs = [[], [2 ** 31 - 1, 0], [], [7], []]
+    state_ptr = np.cumsum([0] + [len(seq) for seq in seqs])
+    state_data = np.array([value for seq in seqs for value in seq], dtype=np.int32)
+    fps = stateindex.fingerprints(state_ptr, state_data)
+    assert fps.tolist() == [stateindex.fingerprint(seq) for seq in seqs]
+    assert len(stateindex.fingerprints(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32))) == 0
+
+
+@pytest.mark.parametrize("to_file", [False, True])
+def test_lookup(store, tmp_path, to_file):
+    fpath = str(tmp_path / stateindex.FILENAME) if to_file else None
+    index = stateindex.build(store.state_ptr, store.state_data, fpath)
+    assert len(index) == store.number_of_nodes()
+    for uid, seq in enumerate(_encoded(store)):
+        assert index.lookup(seq) == uid
+    assert index.lookup(_encoded(store)[0] + [0, 0]) is None
+    assert index.lookup([]) is None
+
+
+def test_collisions(store, monkeypatch):
+    # All states share one fingerprint: lookups compare the stored encodings.
+    monkeypatch.setattr(stateindex, "fingerprint", lambda seq: 0)
+    monkeypatch.setattr(stateindex, "fingerprints",
+                        lambda state_ptr, state_data: np.zeros(len(state_ptr) - 1, dtype=np.uint64))
+    index = stateindex.build(store.state_ptr, store.state_data)
+    assert len(index.candidates([1, 2])) == store.number_of_nodes()
+    for uid, seq in enumerate(_encoded(store)):
+        assert index.lookup(seq) == uid
+    assert index.lookup([1, 2, 3]) is None
+
+
+def test_open_index_rebuilds(tmp_path, graph, caplog):
+    path = str(tmp_path / "g.gstore")
+    write_store(path, *graph)
+    fpath = os.path.join(path, stateindex.FILENAME)
+
+    # Replace the index by the index of a smaller store.
+    small = write_store(str(tmp_path / "small.gstore"), *random_graph(10, seed=5))
+    stateindex.build(small.state_ptr, small.state_data, fpath)
+
+    view = write_store(str(tmp_path / "check.gstore"), *graph)
+    index = stateindex.open_index(path, view.state_ptr, view.state_data)
+    assert "Rebuilding" in caplog.text
+    assert len(index) == view.number_of_nodes()
+    assert stateindex.StateIndex.load(fpath, view.state_ptr, view.state_data).lookup(_encoded(view)[5]) == 5
+
+
+def test_bad_file(tmp_path, store):
+    fpath = tmp_path / "bad.bin"
+    fpath.write_bytes(stateindex.HEADER.pack(b"NOPE", stateindex.VERSION, 0, 1))
+    with pytest.raises(ValueError):
+        stateindex.StateIndex.load(str(fpath), store.state_ptr, store.state_data)
@@ -0,0 +1,81 @@
+import csv
+import json
+import os
+
+import pytest
+
+import sweep
+
+
+def _sweep(tmp_path, **kwargs):
+    return {
+        "name": "test",
+        "directory": str(tmp_path / "sweep"),
+        "dims": [[3, 3]],
+        "goal_sets": [[[0, 2]]],
+        "obstacles": [[], [[1, 1]]],
+        "sensor_ranges": [0, 4, 9],
+        "formulas": ["F(g0)", "F(g0) & F(g0)"],
+        "init_states": {"p1": "all", "p2": [0, 0], "turn": 1},
+        **kwargs,
+    }
+
+
+def _fake_task(task):
+    # Runs in the worker processes instead of `run_task`.
+    return [{"name": job["name"], "status": "done", "memory_budget": job["config"].get("memory_budget"),
+             "params": job["params"]} for job in task]
+
+
+def test_ring():
+    assert sorted(map(tuple, sweep.ring((3, 3)))) == sorted({(r, c) for r in range(3) for c in range(3)} - {(1, 1)})
+    assert len(sweep.ring((1, 4))) == 4
+
+
+def test_init_states():
+    walkable = sweep.ring((3, 3))
+    states = sweep.init_states({"p1": "all", "p2": [0, 0]}, (3, 3), [[1, 1]], walkable)
+    assert len(states) == 8 and (1, 1, 0, 0, 1) not in states
+    assert sweep.init_states([[0, 0, 1, 1, 2]], (3, 3), [], walkable) == []
+    assert sweep.init_states([[0, 0, 0, 1, 2]], (3, 3), [], walkable) == [(0, 0, 0, 1, 2)]
+
+
+def test_expand(tmp_path):
+    jobs = sweep.expand(_sweep(tmp_path))
+
+    # Ranges 4 and 9 both reach every cell of a 3x3 grid; obstacle (1, 1) removes one initial state.
+    assert len(jobs) == 2 * 2 * (9 + 8)
+    assert {job["params"]["sensor_range"] for job in jobs} == {0, 4}
+    assert len({job["name"] for job in jobs}) == len(jobs)
+    for job in jobs:
+        assert job["config"]["directory"] == os.path.join(str(tmp_path / "sweep"), job["name"])
+
+
+def test_tasks(tmp_path):
+    jobs = sweep.expand(_sweep(tmp_path))
+    tasks = sweep.tasks(jobs, max_workers=4)
+    assert sorted(job["name"] for task in tasks for job in task) == sorted(job["name"] for job in jobs)
+    for task in tasks:
+        assert len({sweep.arena_key(job["params"]) for job in task}) == 1
+        assert len(task) <= -(-len(jobs) // 4)
+
+    # One worker: one task per arena (2 obstacle sets x 2 sensor ranges).
+    assert len(sweep.tasks(jobs, max_workers=1)) == 4
+
+
+@pytest.mark.parametrize("share_memory", [False, True])
+def test_run(tmp_path, monkeypatch, share_memory):
+    monkeypatch.setattr(sweep, "run_task", _fake_task)
+    config = _sweep(tmp_path, sensor_ranges=[1], obstacles=[[]], formulas=["F(g0)"], share_memory=share_memory)
+    records = sweep.run(config, max_workers=2)
+    assert len(records) == 9 and all(record["status"] == "done" for record in records)
+
+    # The memory budget is opt-in.
+    budgets = {record["memory_budget"] for record in records}
+    assert budgets == ({sweep.mem_budget.per_worker_budget(2)} if share_memory else {None})
+
+    with open(os.path.join(config["directory"], "test_results.jsonl"), "r") as file:
+        assert len([json.loads(line) for line in file]) == 9
+    with open(os.path.join(config["directory"], "test_results.csv"), "r") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 9 and json.loads(rows[0]["params.dim"]) == [3, 3]
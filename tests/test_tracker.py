@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("ggsolver")
+
+import dfa_cache  # noqa: E402
+import ex1_toy  # noqa: E402
+import models as opac_models  # noqa: E402
+import tracker  # noqa: E402
+
+ATOMS = ["p1", "p2", "p3"]
+
+
+def _dfa(missing):
+    """
+    DFA of F(p3) over the toy's atoms (bit i of a label mask stands for ATOMS[i]).
+    With `missing`, labels with p2 and without p3 have no transition from the initial state.
+    """
+    row = []
+    for mask in range(2 ** len(ATOMS)):
+        if mask & 4:
+            row.append(1)
+        else:
+            row.append(-1 if missing and mask & 2 else 0)
+    return dfa_cache.CompiledDFA("F(p3)", ATOMS, [0, 1], 0, [[-1], [0]], [row, [1] * len(row)])
+
+
+def _plays(game, depth):
+    """ Yields the plays (list of (action, state)) of the belief game of at most `depth` steps from its init state. """
+    stack = [[]]
+    while stack:
+        play = stack.pop()
+        yield play
+        if len(play) < depth:
+            state = play[-1][1] if play else game.init_state()
+            for act in game.actions():
+                next_state = game.delta(state, act)
+                if next_state is not None:
+                    stack.append(play + [(act, next_state)])
+
+
+@pytest.mark.parametrize("missing", [False, True], ids=["complete", "missing-transitions"])
+@pytest.mark.parametrize("tabular", [False, True])
+def test_tracker_follows_belief_game(missing, tabular):
+    arena = ex1_toy.MyGame()
+    arena.initialize(0)
+    aut = _dfa(missing)
+    game = opac_models.BeliefGame(opac_models.tabulate(arena) if tabular else arena, aut)
+    belief_tracker = tracker.BeliefTracker(arena, aut)
+
+    sink_seen = False
+    for play in _plays(game, depth=4):
+        belief_tracker.reset()
+        assert belief_tracker.state() == game.init_state()
+        for act, state in play:
+            assert belief_tracker.step(act) == state[0]
+            assert belief_tracker.state() == state
+            assert belief_tracker.is_final() == (state[1] is not None and 0 in aut.final(state[1]))
+            sink_seen |= None in [q for _, q in state[2]]
+    assert sink_seen == missing
+
+
+def test_step_errors():
+    arena = ex1_toy.MyGame()
+    arena.initialize(0)
+    belief_tracker = tracker.BeliefTracker(arena, _dfa(missing=True))
+    with pytest.raises(ValueError):
+        belief_tracker.step("b1")
+    with pytest.raises(ValueError):
+        belief_tracker.step("a1", next_state=1)
+
+    # P2's move is inferred from the observed state.
+    belief_tracker.step("a2")
+    assert belief_tracker.step(None, next_state=6) == 6
+    assert belief_tracker.state()[1] is None